@@ -1,34 +1,58 @@
 import os
 import logging
 import json
-import time
 import streamlit as st
 from openai import AzureOpenAI
 from dotenv import load_dotenv
 import uuid
-import asyncio
-import tempfile
-import aiohttp
 import base64
+import functools
+import requests
 
-from netbox_tools.netbox_sites import netbox_sites
-from netbox_tools.netbox_device_details import netbox_device_details   
-from netbox_tools.netbox_prefixes import netbox_prefixes
-from netbox_tools.netbox_child_prefixes import netbox_child_prefixes
-from netbox_tools.netbox_ipaddresses import netbox_ipaddresses
-from netbox_tools.netbox_interfaces import netbox_interfaces
-from netbox_tools.netbox_search_roles import netbox_search_roles, netbox_get_all_roles
+from netbox_tools.netbox_chat_service import LocalChatService
+from netbox_tools.netbox_client import get_netbox_client
+from netbox_tools.netbox_cache import get_query_cache
+from netbox_tools.netbox_query_registry import warm_query_registry
+from netbox_tools.netbox_uploads import start_upload, get_upload_job
+from netbox_tools.netbox_export import export_path, EXPORT_MIME_TYPES
 
 # Set up Streamlit page
 st.set_page_config(page_title="Netbox AI Assistant", page_icon=":speech_balloon:")
 
-# Load environment variables from .env file
-load_dotenv()
-
+# Streamlit re-runs this script on every interaction; everything below that is built once per
+# server process (clients, connection pools, static assets, query documents) is cached as a
+# resource and shared by all sessions.
+@st.cache_resource
+def init_process_resources():
+    # Load environment variables from .env file
+    load_dotenv()
+    # Build and hash every tool query document, and open the shared NetBox client and cache
+    warm_query_registry()
+    get_netbox_client()
+    get_query_cache()
+    return True
+
+@st.cache_resource
 def get_image_base64(image_path):
     with open(image_path, "rb") as img_file:
         return base64.b64encode(img_file.read()).decode('utf-8')
 
+@st.cache_resource
+def get_image_bytes(image_path):
+    with open(image_path, "rb") as img_file:
+        return img_file.read()
+
+# Initialize Azure OpenAI client; one client (and HTTP connection pool) per process
+@st.cache_resource
+def get_openai_client():
+    return AzureOpenAI(
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        api_version="2024-05-01-preview"
+    )
+
+init_process_resources()
+
 # Assuming your script is in the root of your project
 image_path = os.path.join("assets", "netbox_ai_avatar_64x64.png")
 avatar_base64 = get_image_base64(image_path)
@@ -38,12 +62,7 @@ avatar_url = f"data:image/png;base64,{avatar_base64}"
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Azure OpenAI client
-client = AzureOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version="2024-05-01-preview"
-)
+client = get_openai_client()
 
 # Custom CSS to center the title
 st.markdown("""
@@ -61,9 +80,6 @@ st.markdown("""
 st.markdown("<h1 class='centered-title'>Netbox AI Assistant</h1>", unsafe_allow_html=True)
 
 
-# Declare the Assistant's ID
-assistant_id = os.environ.get('AZURE_OPENAI_ASSISTANT_ID')
-
 # Initialize session state variables
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
@@ -75,66 +91,116 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "tool_results" not in st.session_state:
     st.session_state.tool_results = {}
+# Files written by netbox_export during the current turn, offered for download under its answer
+if "pending_exports" not in st.session_state:
+    st.session_state.pending_exports = []
 if "last_poll_run_status" not in st.session_state:
     st.session_state.last_poll_run_status = "Not started"
 
-# Function to poll run status
-async def poll_run(client, thread_id, run_id, timeout=300):
-    start_time = time.time()
-    status_placeholder = st.empty()
-    while time.time() - start_time < timeout:
-        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
-        st.session_state.current_run_status = run.status
-        st.session_state.last_poll_run_status = run.status
-        status_placeholder.text(f"Current status: {run.status}")
-        print(f"Poll Run Status: {run.status}")  # Debug statement
-        
-        # Update the sidebar status
-        if 'last_poll_status' in st.session_state:
-            st.session_state.last_poll_status.text(f"Last Poll Run: {run.status}")
-        
-        if run.status in ['completed', 'requires_action', 'failed']:
-            return run
-        await asyncio.sleep(1)
-    raise TimeoutError("Run polling timed out")
-
-# Asynchronous function to handle tool execution
-async def execute_tool(tool_call):
-    tool_name = tool_call.function.name
-    arguments = json.loads(tool_call.function.arguments)
-    logger.info(f"Processing tool: {tool_name} with args: {arguments}")
-    try:
-        if tool_name == "netbox_sites":
-            result = await netbox_sites(arguments)
-        elif tool_name == "netbox_device_details":
-            result = await netbox_device_details(arguments)
-        elif tool_name == "netbox_prefixes":
-            result = await netbox_prefixes(arguments)
-        elif tool_name == "netbox_child_prefixes":
-            result = await netbox_child_prefixes(arguments)
-        elif tool_name == "netbox_ipaddresses":
-            result = await netbox_ipaddresses(arguments)
-        elif tool_name == "netbox_interfaces":
-            result = await netbox_interfaces(arguments)
-        elif tool_name == "netbox_search_roles":
-            result = await netbox_search_roles(arguments)
-        elif tool_name == "netbox_get_all_roles":
-            result = await netbox_get_all_roles()
+def update_run_status(status):
+    st.session_state.current_run_status = status
+    st.session_state.last_poll_run_status = status
+    # Update the sidebar status
+    if 'last_poll_status' in st.session_state:
+        st.session_state.last_poll_status.text(f"Last Poll Run: {status}")
+
+# Turns are run by netbox_tools.netbox_chat_service. When NETBOX_CHAT_SERVICE_URL is set this
+# script is a thin client of a separate service process; otherwise the same ChatService runs
+# in-process on its own event loop. Either way this script only renders the turn's events.
+chat_service_url = (os.getenv("NETBOX_CHAT_SERVICE_URL") or "").rstrip("/")
+
+@st.cache_resource
+def get_chat_service_session():
+    session = requests.Session()
+    if os.getenv("NETBOX_SERVICE_API_KEY"):
+        session.headers["Authorization"] = f"Bearer {os.getenv('NETBOX_SERVICE_API_KEY')}"
+    return session
+
+# Cached per model: a cached resource is shared by every session, so it must not read session state
+@st.cache_resource
+def get_local_chat_service(model):
+    return LocalChatService(model=model)
+
+def iter_sse_events(response):
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data: "):
+            yield json.loads(line[len("data: "):])
+
+def create_chat_thread():
+    if not chat_service_url:
+        return get_local_chat_service(st.session_state.openai_model).create_thread()
+    response = get_chat_service_session().post(f"{chat_service_url}/threads", timeout=30)
+    response.raise_for_status()
+    return response.json()["thread_id"]
+
+def iter_turn_events(thread_id, prompt):
+    if not chat_service_url:
+        yield from get_local_chat_service(st.session_state.openai_model).chat(thread_id, prompt)
+        return
+    with get_chat_service_session().post(f"{chat_service_url}/threads/{thread_id}/messages",
+                                         json={"content": prompt}, stream=True, timeout=(10, 600)) as response:
+        response.raise_for_status()
+        yield from iter_sse_events(response)
+
+# Returns (status, contents, trace rows) for one turn, streaming its text into the placeholder
+def run_turn(thread_id, prompt, text_placeholder):
+    message_texts = {}
+    for event in iter_turn_events(thread_id, prompt):
+        if event["type"] == "delta":
+            message_texts[event["message_id"]] = message_texts.get(event["message_id"], "") + event["text"]
+            text_placeholder.markdown("\n\n".join(message_texts.values()) + " ▌")
+        elif event["type"] == "status":
+            update_run_status(event["status"])
+        elif event["type"] == "tool_result":
+            st.session_state.tool_results[event["name"]] = event["ok"]
+        elif event["type"] == "export":
+            st.session_state.pending_exports.append(event["export"])
+        elif event["type"] == "done":
+            return event["status"], event["contents"], event["trace"]
+        elif event["type"] == "error":
+            raise RuntimeError(event["error"])
+    raise RuntimeError("Chat service closed the stream before the turn finished")
+
+def show_turn_result(status, contents, text_placeholder):
+    exports, st.session_state.pending_exports = st.session_state.pending_exports, []
+    if status == 'completed':
+        # Process and display assistant messages
+        for content in contents:
+            st.session_state.messages.append({"role": "assistant", "content": content, "avatar": avatar_url})
+        text_placeholder.markdown("\n\n".join(contents))
+    else:
+        logger.error(f"Run ended with unexpected status: {status}")
+        st.error(f"An error occurred: {status}")
+    if exports:
+        # Download links go under the turn's answer (or on their own if the run did not complete)
+        if status == 'completed' and contents:
+            st.session_state.messages[-1]["exports"] = exports
         else:
-            raise ValueError(f"Unknown tool: {tool_name}")
-        
-        output = json.dumps(result)  # Convert the JSON object to a string
-        # Store tool result
-        st.session_state.tool_results[tool_name] = True
-        return {"tool_call_id": tool_call.id, "output": output}
-    except Exception as e:
-        logger.error(f"Error executing tool {tool_name}: {str(e)}")
-        st.session_state.tool_results[tool_name] = False
-        return {"tool_call_id": tool_call.id, "output": f"Error: {str(e)}"}
-
+            st.session_state.messages.append({"role": "assistant", "content": "", "avatar": avatar_url,
+                                              "exports": exports})
+
+def read_export(export):
+    if chat_service_url:
+        response = get_chat_service_session().get(f"{chat_service_url}/exports/{export['file']}", timeout=(10, 600))
+        response.raise_for_status()
+        return response.content
+    with open(export_path(export["file"]), "rb") as f:
+        return f.read()
+
+def render_exports(exports):
+    for export in exports:
+        # The file is only read when the button is clicked, not on every rerun
+        st.download_button(
+            f"Download {export['file']} ({export['rows']} rows)",
+            data=functools.partial(read_export, export),
+            file_name=export["file"],
+            mime=EXPORT_MIME_TYPES.get(export["format"]),
+            key=f"export-{export['file']}",
+            on_click="ignore",
+        )
 
 # Sidebar - Avatar at the top
-st.sidebar.image("./assets/netbox_ai_avatar_sidebar-cropped.png", width=128)
+st.sidebar.image(get_image_bytes("./assets/netbox_ai_avatar_sidebar-cropped.png"), width=128)
 st.sidebar.title("Settings and Status")
 
 # Restart Session button
@@ -143,6 +209,7 @@ if st.sidebar.button("Restart Session"):
     st.session_state.thread_id = None
     st.session_state.messages = []
     st.session_state.tool_results = {}
+    st.session_state.pending_exports = []
     st.session_state.last_poll_run_status = "Not started"
     st.rerun()
 
@@ -159,6 +226,27 @@ st.sidebar.markdown("### Tool Results")
 for tool, result in st.session_state.tool_results.items():
     st.sidebar.text(f"{tool}: {'Success' if result else 'Failed'}")
 
+# Display NetBox query cache statistics
+query_cache = get_query_cache()
+if query_cache is not None:
+    cache_stats = query_cache.stats()
+    st.sidebar.markdown("### NetBox Cache")
+    st.sidebar.text(f"Hits: {cache_stats['hits']}  Misses: {cache_stats['misses']}  Hit rate: {cache_stats['hit_rate']:.0%}")
+    st.sidebar.text(f"Entries: {cache_stats['entries']} ({cache_stats['bytes'] // 1024} KiB)")
+
+# Display the per-stage waterfall of the last chat turn
+if st.session_state.get("last_trace"):
+    st.sidebar.markdown("### Last Turn Trace")
+    trace_rows = st.session_state.last_trace
+    turn_ms = max(trace_rows[0]["duration_ms"], 1.0)
+    lines = []
+    for row in trace_rows:
+        offset = int(row["start_ms"] / turn_ms * 20)
+        width = max(1, int(row["duration_ms"] / turn_ms * 20))
+        name = ("  " * row["depth"] + row["name"])[:28]
+        lines.append(f"{name:<28} {row['duration_ms']:>8.0f}ms |{' ' * offset}{'█' * width}")
+    st.sidebar.code("\n".join(lines), language=None)
+
 # Display poll run status
 st.sidebar.markdown("### Poll Run Status")
 st.session_state.last_poll_status = st.sidebar.empty()
@@ -170,53 +258,46 @@ uploaded_files = st.sidebar.file_uploader("Choose files", accept_multiple_files=
 
 if st.sidebar.button("Upload"):
     if uploaded_files:
-        vector_store_id = os.getenv('AZURE_VECTORSTORE_ID')
-        file_objects = []
-
-        try:
-            for uploaded_file in uploaded_files:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    # Use the original filename instead of the temporary filename
-                    file_objects.append((uploaded_file.name, open(tmp_file.name, "rb")))
-
-            # Use the upload_and_poll method to upload files and wait for processing
-            file_batch = client.beta.vector_stores.file_batches.upload_and_poll(
-                vector_store_id=vector_store_id,
-                files=file_objects
-            )
-
-            # Check the status of the upload
-            if file_batch.status == "complete":
-                st.sidebar.success(f"Files uploaded successfully! Status: {file_batch.status}")
-                if hasattr(file_batch, 'file_counts'):
-                    st.sidebar.info(f"File counts: {file_batch.file_counts}")
-                else:
-                    st.sidebar.info("Files processed, but count information is not available.")
-            else:
-                st.sidebar.warning(f"Upload status: {file_batch.status}")
-                if hasattr(file_batch, 'file_counts'):
-                    st.sidebar.info(f"File counts: {file_batch.file_counts}")
-                else:
-                    st.sidebar.info("File count information is not available.")
-
-        except Exception as e:
-            st.sidebar.error(f"An error occurred during file upload: {str(e)}")
-            print(f"Detailed error: {str(e)}")  # This will print to your console for debugging
-
-        finally:
-            # Close and remove temporary files
-            for _, file_obj in file_objects:
-                file_obj.close()
-                os.unlink(file_obj.name)
-
+        # Uploaded straight from memory in a background job; the chat stays usable while files are indexed
+        files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+        job = start_upload(client, os.getenv('AZURE_VECTORSTORE_ID'), files)
+        st.session_state.upload_job_id = job.id
     else:
         st.sidebar.warning("Please upload at least one file.")
 
+def render_upload_status(job):
+    status = job.snapshot()
+    summary = f"{status['uploaded']} uploaded, {status['skipped']} unchanged, {status['indexed']} indexed"
+    if not job.done:
+        st.progress(status["progress"], text=f"Uploading {status['total']} file(s): {summary}")
+    elif status["status"] == "completed":
+        st.success(f"Files uploaded successfully! {summary} in {status['seconds']:.0f}s")
+    else:
+        st.error(f"Upload finished with errors: {summary}")
+        for name, error in status["failed"].items():
+            st.caption(f"{name}: {error}")
+        if status["error"]:
+            st.caption(status["error"])
+
+# Refreshes only the progress display every 2s until the job finishes
+@st.fragment(run_every=2)
+def upload_progress(job_id):
+    job = get_upload_job(job_id)
+    render_upload_status(job)
+    if job.done:
+        st.rerun()
+
+upload_job = get_upload_job(st.session_state.get("upload_job_id") or "")
+if upload_job is not None:
+    with st.sidebar:
+        if upload_job.done:
+            render_upload_status(upload_job)
+        else:
+            upload_progress(upload_job.id)
+
 # Main chat area
 if not st.session_state.thread_id:
-    thread = client.beta.threads.create()
-    st.session_state.thread_id = thread.id
+    st.session_state.thread_id = create_chat_thread()
     intro_message = "Hello! I'm your Netbox AI Assistant. You can ask me about IP addresses, devices, interfaces, locations and more. Ask me about my Netbox tools."
     st.session_state.messages.append({"role": "assistant", "content": intro_message, "avatar": avatar_url})
 
@@ -224,7 +305,9 @@ if not st.session_state.thread_id:
 for message in st.session_state.messages:
     if message["role"] == "assistant":
         with st.chat_message("assistant", avatar=avatar_url):
-            st.markdown(message["content"])
+            if message["content"]:
+                st.markdown(message["content"])
+            render_exports(message.get("exports") or [])
     else:
         with st.chat_message("user"):
             st.markdown(message["content"])
@@ -235,59 +318,28 @@ if prompt := st.chat_input("Enter your message"):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # Create message in the thread
-    client.beta.threads.messages.create(
-        thread_id=st.session_state.thread_id,
-        role="user",
-        content=prompt
-    )
-
-    # Create and poll the run
-    run = client.beta.threads.runs.create(
-        thread_id=st.session_state.thread_id,
-        assistant_id=assistant_id,
-        model=st.session_state.openai_model
-    )
-    run = asyncio.run(poll_run(client, st.session_state.thread_id, run.id))
-
-    # Handle different run statuses
-    while run.status == 'requires_action':
-        tool_calls = run.required_action.submit_tool_outputs.tool_calls
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        tasks = [execute_tool(tool_call) for tool_call in tool_calls]
-        tool_outputs = loop.run_until_complete(asyncio.gather(*tasks))
-
-        # Submit tool outputs and poll again
-        run = client.beta.threads.runs.submit_tool_outputs(
-            thread_id=st.session_state.thread_id,
-            run_id=run.id,
-            tool_outputs=tool_outputs
-        )
-        run = loop.run_until_complete(poll_run(client, st.session_state.thread_id, run.id))
-
-    if run.status == 'completed':
-        messages = client.beta.threads.messages.list(
-            thread_id=st.session_state.thread_id
-        )
-
-        # Process and display assistant messages
-        assistant_messages = [
-            message for message in messages 
-            if message.run_id == run.id and message.role == "assistant"
-        ]
-        for message in assistant_messages:
-            content = message.content[0].text.value
-            st.session_state.messages.append({"role": "assistant", "content": content, "avatar": avatar_url})
-            with st.chat_message("assistant", avatar=avatar_url) as message:
-                st.markdown(content)
-    else:
-        logger.error(f"Run ended with unexpected status: {run.status}")
-        st.error(f"An error occurred: {run.status}")
+    # Stream the turn into the assistant bubble; the service traces it so the sidebar can
+    # show where the time went (LLM vs NetBox)
+    with st.chat_message("assistant", avatar=avatar_url):
+        text_placeholder = st.empty()
+        try:
+            status, contents, st.session_state.last_trace = run_turn(st.session_state.thread_id, prompt,
+                                                                     text_placeholder)
+        except (RuntimeError, requests.RequestException) as e:
+            # Report the failed turn in place; the thread and session stay usable for the next prompt
+            logger.error(f"Chat turn failed: {e}")
+            text_placeholder.empty()
+            st.error(f"An error occurred: {e}")
+            st.session_state.pending_exports = []
+            turn_failed = True
+        else:
+            show_turn_result(status, contents, text_placeholder)
+            turn_failed = False
 
     # Update the sidebar status one last time after completion
     if 'last_poll_status' in st.session_state:
         st.session_state.last_poll_status.text(f"Last Poll Run: {st.session_state.last_poll_run_status}")
 
-    # Force a rerun to update the UI
-    st.rerun()
\ No newline at end of file
+    # Force a rerun to update the UI (after a failure, keep the error on screen instead)
+    if not turn_failed:
+        st.rerun()
\ No newline at end of file
@@ -0,0 +1,506 @@
+"""Local NetBox GraphQL stand-in serving a synthetic inventory, for benchmarks.
+
+Only the GraphQL subset the netbox_* tools send is implemented: selections,
+aliases, fragments (named and inline), @include/@skip, variables, list-field filters
+(exact/regex/i_regex/i_contains/in_list/gte/is_null lookups, nested filters on
+related objects, prefix 'within'/'contains') and offset/limit pagination.
+
+    python -m benchmarks.netbox_mock_server --devices 10000 --port 8765
+"""
+import argparse
+import asyncio
+import ipaddress
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+# ---------------------------------------------------------------------------
+# GraphQL parsing
+# ---------------------------------------------------------------------------
+
+_token = re.compile(r'\s*(?:(\.\.\.)|("(?:[^"\\]|\\.)*")|(-?\d+(?:\.\d+)?)|([A-Za-z_]\w*)|([{}()\[\]:!$@=,])|(#[^\n]*))', re.S)
+
+
+class Variable:
+    def __init__(self, name):
+        self.name = name
+
+
+class Field:
+    def __init__(self, alias, name, arguments, directives, selections):
+        self.alias = alias
+        self.name = name
+        self.arguments = arguments
+        self.directives = directives
+        self.selections = selections
+
+
+class FragmentSpread:
+    def __init__(self, name, directives):
+        self.name = name
+        self.directives = directives
+
+
+class InlineFragment:
+    def __init__(self, type_condition, directives, selections):
+        self.type_condition = type_condition
+        self.directives = directives
+        self.selections = selections
+
+
+class Parser:
+    def __init__(self, text: str):
+        self.tokens = []
+        position = 0
+        while position < len(text):
+            match = _token.match(text, position)
+            if match is None:
+                if text[position:].strip():
+                    raise SyntaxError(f"Unexpected character at {position}: {text[position]!r}")
+                break
+            position = match.end()
+            if match.group(6) or match.group(0).strip() in ("", ","):
+                continue
+            self.tokens.append(match.group(0).strip())
+        self.index = 0
+
+    def peek(self):
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if expected is not None and token != expected:
+            raise SyntaxError(f"Expected {expected!r}, got {token!r}")
+        self.index += 1
+        return token
+
+    def document(self):
+        operations, fragments = [], {}
+        while self.peek() is not None:
+            if self.peek() == "fragment":
+                self.take()
+                name = self.take()
+                self.take("on")
+                self.take()
+                fragments[name] = self.selection_set()
+            else:
+                if self.peek() in ("query", "mutation"):
+                    self.take()
+                    if self.peek() not in ("(", "{"):
+                        self.take()
+                    if self.peek() == "(":
+                        self.variable_definitions()
+                operations.append(self.selection_set())
+        return operations, fragments
+
+    def variable_definitions(self):
+        depth = 0
+        while True:
+            token = self.take()
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def selection_set(self):
+        self.take("{")
+        selections = []
+        while self.peek() != "}":
+            if self.peek() == "...":
+                self.take()
+                if self.peek() == "on":
+                    self.take()
+                    type_condition = self.take()
+                    directives = self.directives()
+                    selections.append(InlineFragment(type_condition, directives, self.selection_set()))
+                else:
+                    selections.append(FragmentSpread(self.take(), self.directives()))
+                continue
+            alias = name = self.take()
+            if self.peek() == ":":
+                self.take()
+                name = self.take()
+            arguments = self.arguments() if self.peek() == "(" else {}
+            directives = self.directives()
+            children = self.selection_set() if self.peek() == "{" else None
+            selections.append(Field(alias, name, arguments, directives, children))
+        self.take("}")
+        return selections
+
+    def arguments(self):
+        self.take("(")
+        arguments = {}
+        while self.peek() != ")":
+            name = self.take()
+            self.take(":")
+            arguments[name] = self.value()
+        self.take(")")
+        return arguments
+
+    def directives(self):
+        directives = {}
+        while self.peek() == "@":
+            self.take()
+            name = self.take()
+            directives[name] = self.arguments() if self.peek() == "(" else {}
+        return directives
+
+    def value(self):
+        token = self.take()
+        if token == "$":
+            return Variable(self.take())
+        if token == "{":
+            value = {}
+            while self.peek() != "}":
+                key = self.take()
+                self.take(":")
+                value[key] = self.value()
+            self.take("}")
+            return value
+        if token == "[":
+            items = []
+            while self.peek() != "]":
+                items.append(self.value())
+            self.take("]")
+            return items
+        if token.startswith('"'):
+            return json.loads(token)
+        if token in ("true", "false"):
+            return token == "true"
+        if token == "null":
+            return None
+        if re.fullmatch(r"-?\d+", token):
+            return int(token)
+        if re.fullmatch(r"-?\d+\.\d+", token):
+            return float(token)
+        return token
+
+
+@lru_cache(maxsize=256)
+def parse_document(text: str):
+    return Parser(text).document()
+
+
+def resolve_value(value, variables):
+    if isinstance(value, Variable):
+        return variables.get(value.name)
+    if isinstance(value, dict):
+        return {key: resolve_value(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_value(item, variables) for item in value]
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Execution
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=1024)
+def _compile(pattern, flags):
+    return re.compile(pattern, flags)
+
+
+LOOKUPS = {"exact", "i_exact", "regex", "i_regex", "i_contains", "in_list", "gte", "is_null"}
+
+
+def _lookup_matches(value, lookups: Dict[str, Any]) -> bool:
+    for lookup, expected in lookups.items():
+        if expected is None:
+            continue
+        if lookup == "is_null":
+            if (value is None) != bool(expected):
+                return False
+            continue
+        text = "" if value is None else str(value)
+        if lookup == "exact" and text != str(expected):
+            return False
+        if lookup == "i_exact" and text.casefold() != str(expected).casefold():
+            return False
+        if lookup == "regex" and not _compile(expected, 0).search(text):
+            return False
+        if lookup == "i_regex" and not _compile(expected, re.IGNORECASE).search(text):
+            return False
+        if lookup == "i_contains" and str(expected).casefold() not in text.casefold():
+            return False
+        if lookup == "in_list" and text not in expected:
+            return False
+        if lookup == "gte" and text < str(expected):
+            return False
+    return True
+
+
+def _within(prefix, parent) -> bool:
+    network = ipaddress.ip_network(prefix, strict=False)
+    parent_network = ipaddress.ip_network(parent, strict=False)
+    return network.version == parent_network.version and network != parent_network and \
+        network.subnet_of(parent_network)
+
+
+def _contains(prefix, inner) -> bool:
+    network = ipaddress.ip_network(prefix, strict=False)
+    inner_network = ipaddress.ip_network(inner, strict=False)
+    return network.version == inner_network.version and inner_network.subnet_of(network)
+
+
+def _is_unset(condition) -> bool:
+    # Null variables leave a filter out, however deeply it is nested
+    if isinstance(condition, dict):
+        return all(_is_unset(item) for item in condition.values())
+    return condition is None
+
+
+def _related_matches(value, filters: Dict[str, Any]) -> bool:
+    # A to-many relation matches when any related object does, like the SQL join NetBox runs
+    if isinstance(value, list):
+        return bool(apply_filters(value, filters))
+    return value is not None and bool(apply_filters([value], filters))
+
+
+def apply_filters(objects: List[Dict[str, Any]], filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if not filters:
+        return objects
+    checks = []
+    for name, condition in filters.items():
+        if condition is None:
+            continue
+        if name == "within":
+            checks.append(lambda obj, parent=condition: _within(obj["prefix"], parent))
+        elif name == "contains":
+            checks.append(lambda obj, inner=condition: _contains(obj["prefix"], inner))
+        elif isinstance(condition, dict):
+            if _is_unset(condition):
+                continue
+            if not set(condition) <= LOOKUPS:
+                checks.append(lambda obj, name=name, condition=condition: _related_matches(obj.get(name), condition))
+                continue
+            if condition.get("in_list") is not None:
+                condition = {**condition, "in_list": {str(item) for item in condition["in_list"]}}
+            checks.append(lambda obj, name=name, condition=condition: _lookup_matches(obj.get(name), condition))
+        else:
+            checks.append(lambda obj, name=name, condition=condition: str(obj.get(name)) == str(condition))
+    return [obj for obj in objects if all(check(obj) for check in checks)]
+
+
+class Executor:
+    def __init__(self, dataset: "Dataset"):
+        self.dataset = dataset
+
+    def execute(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            operations, fragments = parse_document(query)
+        except SyntaxError as e:
+            return {"errors": [{"message": f"Syntax Error: {e}"}]}
+        data = {}
+        errors = []
+        for field in self._fields(operations[0], fragments, variables):
+            try:
+                data[field.alias] = self._root(field, fragments, variables)
+            except Exception as e:
+                data[field.alias] = None
+                errors.append({"message": str(e), "path": [field.alias]})
+        result = {"data": data}
+        if errors:
+            result["errors"] = errors
+        return result
+
+    def _included(self, directives, variables) -> bool:
+        if "include" in directives and not resolve_value(directives["include"].get("if"), variables):
+            return False
+        if "skip" in directives and resolve_value(directives["skip"].get("if"), variables):
+            return False
+        return True
+
+    def _fields(self, selections, fragments, variables, typename=None):
+        for selection in selections:
+            if not self._included(selection.directives, variables):
+                continue
+            if isinstance(selection, FragmentSpread):
+                yield from self._fields(fragments[selection.name], fragments, variables, typename)
+            elif isinstance(selection, InlineFragment):
+                if selection.type_condition == typename:
+                    yield from self._fields(selection.selections, fragments, variables, typename)
+            else:
+                yield selection
+
+    def _root(self, field, fragments, variables):
+        if not field.name.endswith("_list") or field.name[:-5] not in self.dataset.tables:
+            raise ValueError(f"Cannot query field '{field.name}' on type 'Query'.")
+        arguments = resolve_value(field.arguments, variables)
+        objects = apply_filters(self.dataset.tables[field.name[:-5]], arguments.get("filters"))
+        pagination = arguments.get("pagination") or {}
+        offset = pagination.get("offset") or 0
+        limit = pagination.get("limit")
+        objects = objects[offset:offset + limit] if limit is not None else objects[offset:]
+        return [self._object(obj, field.selections, fragments, variables) for obj in objects]
+
+    def _object(self, obj, selections, fragments, variables):
+        if obj is None:
+            return None
+        result = {}
+        for field in self._fields(selections, fragments, variables, obj.get("__typename")):
+            if field.name == "__typename":
+                result[field.alias] = obj.get("__typename")
+                continue
+            value = obj.get(field.name)
+            if callable(value):
+                value = value()
+            if field.selections is None:
+                result[field.alias] = value
+            elif isinstance(value, list):
+                result[field.alias] = [self._object(item, field.selections, fragments, variables) for item in value]
+            else:
+                result[field.alias] = self._object(value, field.selections, fragments, variables)
+        return result
+
+
+# ---------------------------------------------------------------------------
+# Synthetic inventory
+# ---------------------------------------------------------------------------
+
+class Dataset:
+    """A NetBox-shaped object graph: sites, racks, roles, devices, interfaces, VRFs, prefixes, IPs.
+
+    Every device gets interfaces_per_device interfaces, each with one IP
+    address. Interfaces are spread over VRFs of vrf_size interfaces each, and
+    every site owns a /16 split into /24 prefixes.
+    """
+
+    def __init__(self, devices: int = 1000, interfaces_per_device: int = 4, vrf_size: int = 500,
+                 devices_per_site: int = 100, last_updated: str = "2024-01-01T00:00:00+00:00"):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {
+            name: [] for name in ("site", "location", "rack", "device_role", "device", "interface",
+                                  "vrf", "prefix", "ip_address")
+        }
+        self.scale = {"devices": devices, "interfaces_per_device": interfaces_per_device, "vrf_size": vrf_size}
+        counter = iter(range(1, 10 ** 9))
+        stamp = last_updated
+
+        def make(table, **fields):
+            obj = {"id": str(next(counter)), "last_updated": stamp, **fields}
+            obj.setdefault("display", fields.get("name") or fields.get("prefix") or fields.get("address"))
+            self.tables[table].append(obj)
+            return obj
+
+        tenant = {"name": "tenant-a"}
+        roles = [make("device_role", name=name, description=f"{name} devices", devices=[])
+                 for name in ("core", "edge", "access", "wan", "firewall", "load-balancer", "oob", "server")]
+        manufacturer = {"name": "Acme"}
+        device_type = {"model": "ax-9000", "manufacturer": manufacturer}
+        sites_count = max(1, (devices + devices_per_site - 1) // devices_per_site)
+        vrfs: List[Dict[str, Any]] = []
+        for site_number in range(sites_count):
+            site = make("site", name=f"site-{site_number:04d}", status="active", facility=f"DC{site_number}",
+                        time_zone="UTC", physical_address=f"{site_number} Example Street", description="",
+                        comments="", contacts=[], region={"name": "region-1"}, group={"name": "group-1"},
+                        tenant=tenant, locations=[], racks=[], devices=[])
+            for location_number in range(2):
+                site["locations"].append(make("location", name=f"{site['name']}-l{location_number}", site=site,
+                                              facility=site["facility"], devices=[], tenant=tenant))
+            for rack_number in range(4):
+                site["racks"].append(make("rack", name=f"{site['name']}-r{rack_number}", starting_unit=1, site=site,
+                                          location=site["locations"][rack_number % 2], devices=[]))
+            # One /16 per site, counting up from 10.0.0.0/16
+            network = ipaddress.ip_network((int(ipaddress.ip_address("10.0.0.0")) + (site_number << 16), 16))
+            make("prefix", prefix=str(network), status="container", description=f"{site['name']} aggregate",
+                 role=None, vrf=None, site=site, vlan=None, _children=0)
+            site["_network"] = network
+
+        interface_total = 0
+        for device_number in range(devices):
+            site = self.tables["site"][device_number // devices_per_site]
+            location = site["locations"][device_number % 2]
+            role = roles[device_number % len(roles)]
+            rack = site["racks"][device_number % 4]
+            device = make("device", name=f"dev-{device_number:06d}", status="active", role=role,
+                          device_type=device_type, location=location, site=site, rack=rack,
+                          consoleports=[{"name": "console0"}], interfaces=[], primary_ip4=None, primary_ip6=None,
+                          oob_ip=None, description="")
+            for owner in (role, location, rack, site):
+                owner["devices"].append(device)
+            for interface_number in range(interfaces_per_device):
+                vrf_index = interface_total // max(1, vrf_size)
+                while vrf_index >= len(vrfs):
+                    vrfs.append(make("vrf", name=f"vrf-{len(vrfs):04d}", interfaces=[]))
+                vrf = vrfs[vrf_index]
+                interface = make("interface", __typename="InterfaceType",
+                                 name=f"ethernet1/{interface_number}", device=device, type="1000base-t",
+                                 enabled=True, mgmt_only=False, mtu=1500, mode=None, speed=1000000,
+                                 duplex="full", description="", tags=[], tagged_vlans=[], untagged_vlan=None,
+                                 child_interfaces=[], ip_addresses=[], connected_endpoints=[], cable=None,
+                                 lag=None, bridge=None, parent=None, wwn=None, mac_address=None)
+                host_number = (device_number % devices_per_site) * interfaces_per_device + interface_number
+                address = f"{site['_network'].network_address + 256 + host_number}/24"
+                ip = make("ip_address", address=address, status="active", dns_name=f"{device['name']}-{interface_number}.example.net",
+                          description="", role=None, tenant=tenant, vrf=vrf, nat_inside=None, nat_outside=None,
+                          services=[], assigned_object=interface)
+                interface["ip_addresses"].append(ip)
+                vrf["interfaces"].append(interface)
+                device["interfaces"].append(interface)
+                if interface_number == 0:
+                    device["primary_ip4"] = ip
+                interface_total += 1
+        subnets = (devices_per_site * interfaces_per_device + 255) // 256
+        for site in self.tables["site"]:
+            network = site.pop("_network")
+            for subnet_number in range(1, subnets + 1):
+                subnet = ipaddress.ip_network((int(network.network_address) + (subnet_number << 8), 24))
+                make("prefix", prefix=str(subnet), status="active", description="", role={"name": "servers"},
+                     vrf=None, site=site, vlan=None, _children=0)
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+def build_app(dataset: Dataset, latency: float = 0.0) -> web.Application:
+    executor = Executor(dataset)
+    stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0}
+
+    async def graphql(request: web.Request) -> web.Response:
+        body = await request.read()
+        payload = json.loads(body)
+        if latency:
+            await asyncio.sleep(latency)
+        result = executor.execute(payload.get("query") or "", payload.get("variables") or {})
+        response = json.dumps(result, separators=(",", ":")).encode()
+        stats["requests"] += 1
+        stats["bytes_in"] += len(body)
+        stats["bytes_out"] += len(response)
+        return web.Response(body=response, content_type="application/json")
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response({**stats, "scale": dataset.scale})
+
+    async def reset_stats(request: web.Request) -> web.Response:
+        for key in stats:
+            stats[key] = 0
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/graphql/", graphql)
+    app.router.add_get("/stats", get_stats)
+    app.router.add_post("/stats/reset", reset_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--interfaces-per-device", type=int, default=4)
+    parser.add_argument("--vrf-size", type=int, default=500, help="interfaces per VRF")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added server-side latency per request")
+    args = parser.parse_args()
+    dataset = Dataset(args.devices, args.interfaces_per_device, args.vrf_size)
+    print(f"Serving {args.devices} devices on http://{args.host}:{args.port}/graphql/", flush=True)
+    web.run_app(build_app(dataset, args.latency_ms / 1000), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Benchmark the netbox_* tools and the tool execution pipeline against the local NetBox stand-in.
+
+    python -m benchmarks.run_benchmarks --devices 1000 10000 --iterations 50 --concurrency 4
+    python -m benchmarks.run_benchmarks --json after.json --compare before.json
+
+Each dataset scale starts its own netbox_mock_server subprocess, so the
+reported peak RSS is the tool process alone.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+from netbox_tools.netbox_executor import run_tool_calls
+from netbox_tools.netbox_tool_registry import execute_tool_call, get_tool, tool_concurrency_class
+from netbox_tools import netbox_prefix_trie, netbox_name_index
+
+# Arguments per tool, chosen to hit a realistic slice of the synthetic inventory
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "netbox_sites": {"site_name": "site-0001"},
+    "netbox_device_details": {"device_name_contains": "dev-00001", "detail_level": "standard"},
+    "netbox_prefixes": {"prefix_regex": "^10\\.0\\."},
+    "netbox_child_prefixes": {"parent_prefix": "10.0.0.0/16"},
+    "netbox_prefix_lookup": {"operation": "contains", "address": "10.0.1.5"},
+    "netbox_ipaddresses": {"ipaddress_regex": "^10\\.0\\.1\\.", "dns_name_regex": "dev-000001", "filter_logic": "or"},
+    "netbox_interfaces": {"interface_regex": "ethernet1/0$", "max_results": 50},
+    "netbox_search_roles": {"role_name_contains": "core"},
+    "netbox_get_all_roles": {},
+    "netbox_export": {"kind": "interfaces", "site_regex": "^site-0001$", "with_ip_only": True},
+    "netbox_aggregate": {"kind": "devices", "group_by": ["site", "role"]},
+    # The handle is filled in per scale from a netbox_sites answer (see resolve_scenarios)
+    "netbox_site_expand": {"handle": "site-handle", "section": "racks"},
+}
+
+TURN_SCENARIO = "execute_tool (all tools, one turn)"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class MockServer:
+    def __init__(self, devices: int, interfaces_per_device: int, vrf_size: int, latency_ms: float):
+        self.port = free_port()
+        self.base = f"http://127.0.0.1:{self.port}"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.netbox_mock_server", "--port", str(self.port),
+             "--devices", str(devices), "--interfaces-per-device", str(interfaces_per_device),
+             "--vrf-size", str(vrf_size), "--latency-ms", str(latency_ms)],
+            stdout=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 600
+        while time.time() < deadline:
+            try:
+                self.stats()
+                return
+            except OSError:
+                if self.process.poll() is not None:
+                    raise RuntimeError("netbox_mock_server exited during startup")
+                time.sleep(0.2)
+        raise RuntimeError("netbox_mock_server did not start")
+
+    def stats(self) -> Dict[str, Any]:
+        with urllib.request.urlopen(f"{self.base}/stats", timeout=5) as response:
+            return json.load(response)
+
+    def reset_stats(self):
+        urllib.request.urlopen(urllib.request.Request(f"{self.base}/stats/reset", method="POST"), timeout=5).read()
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+async def execute_tool(tool_call) -> Dict[str, Any]:
+    output, _ = await execute_tool_call(tool_call)
+    return output
+
+
+def tool_call(tool_name: str, arguments: Dict[str, Any], call_id: int):
+    return SimpleNamespace(id=f"call_{call_id}", function=SimpleNamespace(name=tool_name, arguments=json.dumps(arguments)))
+
+
+def resolve_scenarios() -> Dict[str, Dict[str, Any]]:
+    """SCENARIOS with arguments that depend on an earlier tool's answer filled in."""
+    sites = asyncio.run(get_tool("netbox_sites")(dict(SCENARIOS["netbox_sites"])))
+    return {**SCENARIOS, "netbox_site_expand": {**SCENARIOS["netbox_site_expand"],
+                                                "handle": sites["data"]["sites"][0]["handle"]}}
+
+
+async def run_turn(scenarios: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    calls = [tool_call(name, arguments, i) for i, (name, arguments) in enumerate(scenarios.items())]
+    outputs = await run_tool_calls(calls, execute_tool, concurrency_class=tool_concurrency_class)
+    failed = [output for output in outputs if output["output"].startswith("Error") or '"error"' in output["output"]]
+    return {"error": failed[0]["output"]} if failed else {}
+
+
+async def measure(call: Callable, iterations: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            result = await call()
+            latencies.append(time.perf_counter() - start)
+            if isinstance(result, dict) and result.get("error"):
+                errors.append(str(result["error"]))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(iterations)])
+    return latencies, errors, time.perf_counter() - start
+
+
+def run_scenario(server: MockServer, name: str, call: Callable, iterations: int, concurrency: int) -> Dict[str, Any]:
+    asyncio.run(call())  # warm-up: pools, indexes, query registry
+    server.reset_stats()
+    latencies, errors, wall = asyncio.run(measure(call, iterations, concurrency))
+    stats = server.stats()
+    return {
+        "scenario": name,
+        "calls": iterations,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "throughput_per_s": iterations / wall if wall else 0.0,
+        "requests": stats["requests"],
+        "bytes_sent": stats["bytes_in"],
+        "bytes_received": stats["bytes_out"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def reset_process_state():
+    # Each scale gets fresh in-memory indexes
+    netbox_prefix_trie._index = None
+    netbox_name_index._index = None
+
+
+def run_scale(args, devices: int) -> List[Dict[str, Any]]:
+    server = MockServer(devices, args.interfaces_per_device, args.vrf_size, args.latency_ms)
+    try:
+        os.environ["NETBOX_URL"] = f"{server.base}/graphql/"
+        # A distinct token per scale keeps cached responses from leaking between datasets
+        os.environ["NETBOX_TOKEN"] = f"benchmark-{devices}"
+        reset_process_state()
+        scenarios = resolve_scenarios()
+        results = []
+        selected = args.tools or list(SCENARIOS)
+        for tool_name in selected:
+            arguments = scenarios[tool_name]
+            result = run_scenario(server, tool_name, lambda: get_tool(tool_name)(dict(arguments)),
+                                  args.iterations, args.concurrency)
+            results.append({"devices": devices, **result})
+            print_row(results[-1])
+        if not args.tools:
+            results.append({"devices": devices, **run_scenario(server, TURN_SCENARIO, lambda: run_turn(scenarios),
+                                                               args.iterations, args.concurrency)})
+            print_row(results[-1])
+        return results
+    finally:
+        server.close()
+
+
+HEADER = f"{'devices':>8} {'scenario':<36} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'calls/s':>9} " \
+         f"{'reqs':>6} {'KiB out':>9} {'KiB in':>10} {'RSS MB':>8} {'err':>4}"
+
+
+def print_row(row: Dict[str, Any]):
+    print(f"{row['devices']:>8} {row['scenario'][:36]:<36} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+          f"{row['p99_ms']:>9.2f} {row['throughput_per_s']:>9.1f} {row['requests']:>6} "
+          f"{row['bytes_sent'] / 1024:>9.1f} {row['bytes_received'] / 1024:>10.1f} {row['peak_rss_mb']:>8.1f} "
+          f"{row['errors']:>4}", flush=True)
+
+
+def print_comparison(results: List[Dict[str, Any]], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(row["devices"], row["scenario"]): row for row in json.load(f)["results"]}
+    print(f"\nChange vs {baseline_path} (negative is faster / smaller)")
+    print(f"{'devices':>8} {'scenario':<36} {'p50':>8} {'p95':>8} {'bytes in':>9}")
+    for row in results:
+        before = baseline.get((row["devices"], row["scenario"]))
+        if before is None:
+            continue
+        change = lambda key: (row[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+        print(f"{row['devices']:>8} {row['scenario'][:36]:<36} {change('p50_ms'):>+7.1f}% {change('p95_ms'):>+7.1f}% "
+              f"{change('bytes_received'):>+8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the netbox_* tools against a local NetBox stand-in.")
+    parser.add_argument("--devices", type=int, nargs="+", default=[1000], help="dataset scales, e.g. 1000 10000 100000")
+    parser.add_argument("--interfaces-per-device", type=int, default=4)
+    parser.add_argument("--vrf-size", type=int, default=500, help="interfaces per VRF")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="added server-side latency per request")
+    parser.add_argument("--iterations", type=int, default=30, help="calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent calls per scenario")
+    parser.add_argument("--tools", nargs="+", choices=list(SCENARIOS), help="only benchmark these tools")
+    parser.add_argument("--cache", action="store_true", help="keep the NetBox response cache enabled")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="print the change against a previous --json file")
+    args = parser.parse_args()
+
+    if not args.cache:
+        os.environ["NETBOX_CACHE_DISABLED"] = "true"
+    print(HEADER)
+    results = []
+    # netbox_export writes a file per call; keep them out of the real export directory
+    with tempfile.TemporaryDirectory(prefix="netbox-bench-exports-") as export_dir:
+        os.environ["NETBOX_EXPORT_DIR"] = export_dir
+        for devices in args.devices:
+            results.extend(run_scale(args, devices))
+    if args.json:
+        config = {key: value for key, value in vars(args).items() if key not in ("json", "compare")}
+        with open(args.json, "w") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
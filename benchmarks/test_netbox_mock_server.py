@@ -0,0 +1,31 @@
+from benchmarks.netbox_mock_server import Dataset, Executor
+from netbox_tools.netbox_batching import merge_queries
+from netbox_tools.netbox_device_details import build_device_query
+from netbox_tools.netbox_ipaddresses import IP_ADDRESS_OR_QUERY
+from netbox_tools.netbox_search_roles import SEARCH_ROLES_QUERY
+
+
+def test_executor_filters_paginates_and_projects():
+    executor = Executor(Dataset(devices=50, interfaces_per_device=2, devices_per_site=25))
+    query, variables = build_device_query("dev-00001", ["name", "role"])
+    variables.update(device_list_pagination_offset=0, device_list_pagination_limit=3)
+    devices = executor.execute(query, variables)["data"]["device_list"]
+    assert [device["name"] for device in devices] == ["dev-000010", "dev-000011", "dev-000012"]
+    assert set(devices[0]) == {"name", "role"}
+
+
+def test_executor_handles_fragments_directives_and_aliases():
+    executor = Executor(Dataset(devices=10, interfaces_per_device=1))
+    result = executor.execute(IP_ADDRESS_OR_QUERY, {
+        "ipaddressRegex": "^10\\.0\\.1\\.0/", "dnsNameRegex": None,
+        "withAddress": True, "withDnsName": False, "offset": 0, "limit": 10,
+    })
+    assert "by_dns_name" not in result["data"]
+    assert [ip["display"] for ip in result["data"]["by_address"]] == ["10.0.1.0/24"]
+
+    merged, merged_variables, _ = merge_queries([
+        (SEARCH_ROLES_QUERY, {"nameContains": "core"}), (SEARCH_ROLES_QUERY, {"nameContains": "edge"}),
+    ])
+    data = executor.execute(merged, merged_variables)["data"]
+    assert data["q0_device_role_list"][0]["display"] == "core"
+    assert data["q1_device_role_list"][0]["display"] == "edge"
@@ -1,46 +1,40 @@
 import requests
 import json
 
-class NetboxGraphQLClient:
-    def __init__(self, url, token):
-        self.url = url
-        self.headers = {
-            "Authorization": f"Token {token}",
-            "Content-Type": "application/json",
-        }
+# Correctly map Python types to GraphQL types
+GRAPHQL_TYPE_MAP = {
+    int: "Int",
+    str: "String",
+    bool: "Boolean",
+    float: "Float",
+}
 
-    def execute_query(self, query, variables=None):
-        payload = {
-            "query": query,
-            "variables": variables or {}
-        }
-        response = requests.post(self.url, json=payload, headers=self.headers)
-        
-        try:
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.HTTPError as e:
-            print(f"HTTP Error: {e}")
-            print(f"Response Content: {response.text}")
-            raise
-
-    def build_query(self, query_structure):
+class NetboxQueryBuilder:
+    @staticmethod
+    def build_query(query_structure, operation_name=""):
         query_lines = []
         variables = {}
 
-        def build_field(name, value, indent=""):
+        def build_arg_value(var_prefix, value):
+            # Nested dicts become GraphQL input objects (e.g. filters); scalar leaves become variables
+            if isinstance(value, dict):
+                items = [f"{key}: {build_arg_value(f'{var_prefix}_{key}', sub_value)}" for key, sub_value in value.items()]
+                return "{" + ", ".join(items) + "}"
+            var_name = var_prefix.replace(".", "_")
+            variables[var_name] = value
+            return f"${var_name}"
+
+        def build_field(name, value, indent="  "):
             if isinstance(value, dict):
                 args = []
                 sub_fields = []
                 for sub_name, sub_value in value.items():
                     if (sub_name == "__args"):
                         for arg_name, arg_value in sub_value.items():
-                            var_name = f"{name}_{arg_name}".replace(".", "_")
-                            variables[var_name] = arg_value
-                            args.append(f"{arg_name}: ${var_name}")
+                            args.append(f"{arg_name}: {build_arg_value(f'{name}_{arg_name}', arg_value)}")
                     else:
                         sub_fields.extend(build_field(sub_name, sub_value, indent + "  "))
-                
+
                 arg_string = f"({', '.join(args)})" if args else ""
                 field_string = f"{indent}{name}{arg_string}"
                 if sub_fields:
@@ -53,21 +47,37 @@ class NetboxGraphQLClient:
         for top_level_name, top_level_value in query_structure.items():
             query_lines.extend(build_field(top_level_name, top_level_value))
 
-        # Correctly map Python types to GraphQL types
-        type_map = {
-            int: "Int",
-            str: "String",
-            bool: "Boolean",
-            float: "Float",
-        }
-
-        var_declarations = ", ".join(f"${name}: {type_map[type(value)]}!" for name, value in variables.items())
-        query_string = f"query ({var_declarations}) {{\n" + "\n".join(query_lines) + "\n}"
+        var_declarations = ", ".join(f"${name}: {GRAPHQL_TYPE_MAP[type(value)]}!" for name, value in variables.items())
+        signature = f"{operation_name}({var_declarations})" if var_declarations else operation_name
+        header = f"query {signature}" if signature else "query"
+        query_string = f"{header} {{\n" + "\n".join(query_lines) + "\n}"
         return query_string, variables
 
+class NetboxGraphQLClient:
+    def __init__(self, url, token):
+        self.url = url
+        self.headers = {
+            "Authorization": f"Token {token}",
+            "Content-Type": "application/json",
+        }
+
+    def execute_query(self, query, variables=None):
+        payload = {
+            "query": query,
+            "variables": variables or {}
+        }
+        response = requests.post(self.url, json=payload, headers=self.headers)
+        
+        try:
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.HTTPError as e:
+            print(f"HTTP Error: {e}")
+            print(f"Response Content: {response.text}")
+            raise
 
     def execute_advanced_query(self, query_structure):
-        query, variables = self.build_query(query_structure)
+        query, variables = NetboxQueryBuilder.build_query(query_structure)
         print("Generated Query:")
         print(query)
         print("\nVariables:")
@@ -0,0 +1,93 @@
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from netbox_tools.netbox_client import get_netbox_client
+from netbox_tools.netbox_executor import run_blocking
+from netbox_tools.netbox_export import EXPORT_SPECS, iter_row_batches
+
+DEFAULT_TOP_GROUPS = 50
+MAX_GROUP_BY = 3
+# Group label for objects with no value in a grouping column (e.g. a device without a role)
+NONE_LABEL = "(none)"
+
+
+def _frame(batch: List[List[Any]], names: List[str], columns: List[str]) -> pd.DataFrame:
+    frame = pd.DataFrame(batch, columns=names, dtype=object)[columns]
+    return frame.where(frame.notna(), NONE_LABEL).astype(str)
+
+
+def partial_counts(batch: List[List[Any]], names: List[str], group_by: List[str]) -> pd.Series:
+    return _frame(batch, names, group_by).groupby(group_by).size()
+
+
+def partial_distinct(batch: List[List[Any]], names: List[str], group_by: List[str], distinct: str) -> pd.DataFrame:
+    return _frame(batch, names, group_by + [distinct]).drop_duplicates()
+
+
+def merge_counts(counts: Optional[pd.Series], partial: pd.Series) -> pd.Series:
+    return partial if counts is None else counts.add(partial, fill_value=0)
+
+
+def merge_distinct(pairs: Optional[pd.DataFrame], partial: pd.DataFrame) -> pd.DataFrame:
+    return partial if pairs is None else pd.concat([pairs, partial], ignore_index=True).drop_duplicates()
+
+
+def summarize(counts: Optional[pd.Series], group_by: List[str], metric: str, top: int) -> Dict[str, Any]:
+    """The top groups by metric, largest first, as records."""
+    if counts is None or counts.empty:
+        return {"groups": 0, "truncated": False, "rows": []}
+    counts = counts.astype("int64").sort_values(ascending=False, kind="stable")
+    table = counts.head(top).rename(metric).reset_index()
+    return {"groups": len(counts), "truncated": len(counts) > top, "rows": table.to_dict("records")}
+
+
+async def aggregate_rows(client, kind: str, group_by: List[str], distinct: Optional[str] = None,
+                         name_regex: Optional[str] = None, site_regex: Optional[str] = None,
+                         with_ip_only: bool = False, top: int = DEFAULT_TOP_GROUPS) -> Dict[str, Any]:
+    """Group kind's objects page by page, keeping only the per-group partial results between pages."""
+    names = [column for column, _ in EXPORT_SPECS[kind]["columns"]]
+    metric = f"distinct_{distinct}" if distinct else "count"
+    counts = None
+    pairs = None
+    total = 0
+    async for batch in iter_row_batches(client, kind, name_regex, site_regex, with_ip_only):
+        total += len(batch)
+        if distinct:
+            pairs = merge_distinct(pairs, await run_blocking(partial_distinct, batch, names, group_by, distinct))
+        else:
+            counts = merge_counts(counts, await run_blocking(partial_counts, batch, names, group_by))
+    if pairs is not None:
+        counts = pairs.groupby(group_by).size()
+    return {"total_rows": total, "metric": metric, **summarize(counts, group_by, metric, top)}
+
+
+async def netbox_aggregate(arguments):
+    client = get_netbox_client()
+
+    kind = arguments.get("kind")
+    group_by = arguments.get("group_by") or []
+    distinct = arguments.get("count_distinct")
+    top = arguments.get("top") or DEFAULT_TOP_GROUPS
+
+    if kind not in EXPORT_SPECS:
+        return {"error": f"Invalid kind. Must be one of: {', '.join(EXPORT_SPECS)}."}
+    columns = [column for column, _ in EXPORT_SPECS[kind]["columns"] if column != "id"]
+    unknown = [column for column in group_by + ([distinct] if distinct else []) if column not in columns]
+    if unknown:
+        return {"error": f"Unknown field(s) for {kind}: {', '.join(unknown)}. Choose from: {', '.join(columns)}."}
+    if not group_by or len(group_by) > MAX_GROUP_BY or len(set(group_by)) != len(group_by):
+        return {"error": f"group_by must list 1 to {MAX_GROUP_BY} different fields."}
+    if distinct in group_by:
+        return {"error": "count_distinct must not be one of the group_by fields."}
+    if top < 1:
+        return {"error": "top must be at least 1."}
+
+    try:
+        summary = await aggregate_rows(client, kind, group_by, distinct, arguments.get("name_regex") or None,
+                                       arguments.get("site_regex") or None, bool(arguments.get("with_ip_only")),
+                                       top)
+    except Exception as e:
+        return {"error": f"Aggregation failed: {str(e)}"}
+
+    return {"data": {"aggregate": {"kind": kind, "group_by": group_by, **summary}}}
@@ -0,0 +1,297 @@
+import asyncio
+import contextvars
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from netbox_tools.netbox_resilience import NetboxUnavailableError
+from netbox_tools.netbox_tracing import current_span, record_span, Span
+
+DEFAULT_BATCH_WINDOW = 0.005
+DEFAULT_MAX_BATCH_SIZE = 20
+
+# The batcher for the current turn; set by netbox_executor.run_tool_calls
+current_batcher: contextvars.ContextVar[Optional["QueryBatcher"]] = contextvars.ContextVar(
+    "current_batcher", default=None
+)
+
+_operation_header = re.compile(r"^\s*query\b\s*(\w+)?\s*(?:\(([^)]*)\))?\s*\{", re.S)
+_fragment_header = re.compile(r"\s*fragment\s+(\w+)\s+on\s+\w+\s*\{", re.S)
+_root_field = re.compile(r"^\s*(?:(\w+)\s*:\s*)?(\w+)", re.S)
+_variable = re.compile(r"\$(\w+)")
+
+
+def _block_end(text: str, start: int) -> int:
+    """Index just past the brace block opening at text[start]."""
+    depth = 0
+    for index in range(start, len(text)):
+        char = text[index]
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    raise ValueError("Unbalanced braces in GraphQL document")
+
+
+def _split_root_selections(body: str) -> Optional[List[str]]:
+    """Split an operation body into root selections; None if any has no selection set."""
+    selections = []
+    index = 0
+    while index < len(body):
+        if body[index].isspace() or body[index] == ",":
+            index += 1
+            continue
+        start = index
+        paren_depth = 0
+        while index < len(body):
+            char = body[index]
+            if char == "(":
+                paren_depth += 1
+            elif char == ")":
+                paren_depth -= 1
+            elif char == "{" and paren_depth == 0:
+                break
+            index += 1
+        if index >= len(body):
+            return None
+        index = _block_end(body, index)
+        selections.append(body[start:index])
+    return selections
+
+
+class ParsedQuery:
+    """A single query operation split into variable definitions, root selections and fragments."""
+
+    def __init__(self, variable_definitions: str, selections: List[str], fragments: Dict[str, str]):
+        self.variable_definitions = variable_definitions
+        self.selections = selections
+        self.fragments = fragments
+
+
+@lru_cache(maxsize=512)
+def parse_query(query: str) -> Optional[ParsedQuery]:
+    """Parse the query shapes the netbox_* tools send; None when the document cannot be batched."""
+    header = _operation_header.match(query)
+    if header is None:
+        return None
+    body_start = header.end() - 1
+    body_end = _block_end(query, body_start)
+    selections = _split_root_selections(query[body_start + 1:body_end - 1])
+    if not selections:
+        return None
+    fragments = {}
+    rest = query[body_end:]
+    while rest.strip():
+        fragment = _fragment_header.match(rest)
+        if fragment is None:
+            return None
+        end = _block_end(rest, fragment.end() - 1)
+        text = rest[:end].strip()
+        if "$" in text:
+            return None
+        fragments[fragment.group(1)] = text
+        rest = rest[end:]
+    return ParsedQuery(header.group(2) or "", selections, fragments)
+
+
+def rewrite_list_query(query: str, operation_name: str, variable_definitions: str, arguments: str,
+                       extra_fields: str = "") -> str:
+    """Reuse a list query's selection set under new variables and list-field arguments."""
+    parsed = parse_query(query)
+    selection = parsed.selections[0]
+    root = _root_field.match(selection)
+    paren_depth = 0
+    for index in range(root.end(), len(selection)):
+        char = selection[index]
+        if char == "(":
+            paren_depth += 1
+        elif char == ")":
+            paren_depth -= 1
+        elif char == "{" and paren_depth == 0:
+            break
+    body = selection[index + 1:_block_end(selection, index) - 1]
+    fragments = "\n".join(parsed.fragments.values())
+    return (f"query {operation_name}({variable_definitions}) {{\n"
+            f"    {root.group(2)}({arguments}) {{\n{extra_fields}\n{body}\n    }}\n}}\n{fragments}")
+
+
+def merge_queries(queries: List[Tuple[str, Dict[str, Any]]]) -> Tuple[str, Dict[str, Any], List[Dict[str, str]]]:
+    """Merge queries into one document with prefixed aliases and variables.
+
+    Returns the merged query, its variables and, per input query, the mapping
+    from aliased response key back to the original key.
+    """
+    definitions = []
+    selections = []
+    fragments: Dict[str, str] = {}
+    variables: Dict[str, Any] = {}
+    alias_maps = []
+    for position, (query, query_variables) in enumerate(queries):
+        parsed = parse_query(query)
+        prefix = f"q{position}_"
+        rename = lambda match: f"${prefix}{match.group(1)}"
+        if parsed.variable_definitions.strip():
+            definitions.append(_variable.sub(rename, parsed.variable_definitions.strip()))
+        alias_map = {}
+        for selection in parsed.selections:
+            root = _root_field.match(selection)
+            key = root.group(1) or root.group(2)
+            alias_map[f"{prefix}{key}"] = key
+            aliased = f"{prefix}{key}: {root.group(2)}" + selection[root.end():]
+            selections.append(_variable.sub(rename, aliased))
+        alias_maps.append(alias_map)
+        fragments.update(parsed.fragments)
+        for name, value in (query_variables or {}).items():
+            variables[f"{prefix}{name}"] = value
+    signature = f"({', '.join(definitions)})" if definitions else ""
+    merged = f"query Batched{signature} {{\n" + "\n".join(selections) + "\n}\n" + "\n".join(fragments.values())
+    return merged, variables, alias_maps
+
+
+def split_result(result: Dict[str, Any], alias_maps: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Split a merged response back into one response per original query."""
+    data = result.get("data") or {}
+    errors = result.get("errors") or []
+    results = []
+    for alias_map in alias_maps:
+        part: Dict[str, Any] = {"data": {key: data.get(alias) for alias, key in alias_map.items()}}
+        part_errors = []
+        for error in errors:
+            path = error.get("path") or []
+            if not path:
+                # Validation/parse errors name no field, so every query in the batch may be affected
+                part_errors.append(dict(error))
+            elif path[0] in alias_map:
+                part_errors.append({**error, "path": [alias_map[path[0]]] + list(path[1:])})
+        if part_errors:
+            part["errors"] = part_errors
+        results.append(part)
+    return results
+
+
+def is_batchable(query: str, fragments_seen: Dict[str, str]) -> bool:
+    parsed = parse_query(query)
+    if parsed is None:
+        return False
+    # Fragments with the same name must be identical to share one document
+    return all(fragments_seen.get(name, text) == text for name, text in parsed.fragments.items())
+
+
+class QueryBatcher:
+    """Collects the queries a turn's tool calls issue within a short window and sends them as one request.
+
+    Identical queries in the same batch share a single aliased selection.
+    """
+
+    def __init__(self, window: float = None, max_batch_size: int = None):
+        self.window = window if window is not None else float(os.getenv("NETBOX_BATCH_WINDOW") or DEFAULT_BATCH_WINDOW)
+        self.max_batch_size = max_batch_size or int(os.getenv("NETBOX_MAX_BATCH_SIZE") or DEFAULT_MAX_BATCH_SIZE)
+        self._pending: Dict[Any, List[Tuple[str, Dict[str, Any], asyncio.Future, Optional[Span]]]] = {}
+        self._timers: Dict[Any, asyncio.TimerHandle] = {}
+        # The turn's loop; _pending/_timers are only touched from it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.requests_sent = 0
+        self.queries_batched = 0
+
+    async def submit(self, client, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+        if parse_query(query) is None or loop is not self._loop:
+            return await client.send_query(query, variables)
+        future = loop.create_future()
+        pending = self._pending.setdefault(client, [])
+        # The waiter's span travels with its query: the flush runs in whichever context armed the timer
+        pending.append((query, variables, future, current_span.get()))
+        if len(pending) >= self.max_batch_size:
+            self._flush(client)
+        elif client not in self._timers:
+            self._timers[client] = loop.call_later(self.window, self._flush, client)
+        return await future
+
+    def _flush(self, client):
+        timer = self._timers.pop(client, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(client, [])
+        if pending:
+            # A fresh context, so nothing the send records lands in the first submitter's span
+            contextvars.Context().run(asyncio.ensure_future, self._send(client, pending))
+
+    async def _send(self, client, pending):
+        # Identical (query, variables) pairs are sent once
+        unique: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        waiters: Dict[str, List[Tuple[asyncio.Future, Optional[Span]]]] = {}
+        fragments_seen: Dict[str, str] = {}
+        solo = []
+        for query, variables, future, waiter_span in pending:
+            key = json.dumps([query, variables or {}], sort_keys=True, default=str)
+            if key in unique:
+                waiters[key].append((future, waiter_span))
+            elif is_batchable(query, fragments_seen):
+                unique[key] = (query, variables)
+                waiters[key] = [(future, waiter_span)]
+                fragments_seen.update(parse_query(query).fragments)
+            else:
+                solo.append((query, variables, [(future, waiter_span)]))
+
+        for query, variables, solo_waiters in solo:
+            asyncio.ensure_future(self._send_single(client, query, variables, solo_waiters))
+
+        keys = list(unique)
+        if len(keys) == 1:
+            query, variables = unique[keys[0]]
+            await self._send_single(client, query, variables, waiters[keys[0]])
+            return
+        if not keys:
+            return
+
+        merged, merged_variables, alias_maps = merge_queries([unique[key] for key in keys])
+        self.requests_sent += 1
+        self.queries_batched += len(keys)
+        try:
+            result, timings = await client.post_query(merged, merged_variables)
+        except NetboxUnavailableError as e:
+            # Retrying each query on its own would only add load to a NetBox that is already failing
+            for key in keys:
+                for future, _ in waiters[key]:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        except Exception:
+            result = None
+        if result is None or ("errors" in result and not result.get("data")):
+            # Whole-document failure (e.g. a validation error): fall back to one request per query
+            await asyncio.gather(*[
+                self._send_single(client, *unique[key], waiters[key]) for key in keys
+            ])
+            return
+        for key, part in zip(keys, split_result(result, alias_maps)):
+            self._resolve(waiters[key], part, timings, batched=len(keys))
+
+    async def _send_single(self, client, query, variables, waiters):
+        self.requests_sent += 1
+        try:
+            result, timings = await client.post_query(query, variables)
+        except Exception as e:
+            for future, _ in waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self._resolve(waiters, result, timings)
+
+    @staticmethod
+    def _resolve(waiters, result, timings, **request_attributes):
+        for future, waiter_span in waiters:
+            # Every waiter sees the shared request under its own tool span
+            if waiter_span is not None:
+                (name, start, end, attributes), *children = timings
+                request = record_span(name, start, end, parent=waiter_span, **attributes, **request_attributes)
+                for name, start, end, attributes in children:
+                    record_span(name, start, end, parent=request, **attributes)
+            if not future.done():
+                future.set_result(result)
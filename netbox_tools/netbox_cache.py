@@ -0,0 +1,299 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_TTL = 60.0
+# How long past expiry an entry may still be served while NetBox is unavailable
+DEFAULT_CACHE_MAX_STALE = 3600.0
+DEFAULT_CACHE_DISK_MAX_BYTES = 256 * 1024 * 1024
+# How often DiskCacheBackend.set sweeps out rows past their stale window
+DISK_PURGE_INTERVAL = 300.0
+# Drill-down handles: how long a stored result stays expandable, and the store's size bound
+DEFAULT_RESULT_TTL = 900.0
+DEFAULT_RESULT_STORE_MAX_BYTES = 32 * 1024 * 1024
+
+# Per-tool TTLs in seconds. Reference data changes rarely, device/IP data more often.
+CACHE_TTLS: Dict[str, float] = {
+    "netbox_get_all_roles": 3600.0,
+    "netbox_search_roles": 300.0,
+    "netbox_sites": 600.0,
+    "netbox_device_details": 120.0,
+    "netbox_interfaces": 120.0,
+    "netbox_prefixes": 300.0,
+    "netbox_child_prefixes": 300.0,
+    "netbox_prefix_lookup": 300.0,
+    "netbox_ipaddresses": 120.0,
+}
+
+_whitespace = re.compile(r"\s+")
+_punctuation_space = re.compile(r"\s*([{}():,!$\[\]])\s*")
+
+
+@lru_cache(maxsize=1024)
+def normalize_query(query: str) -> str:
+    """Collapse formatting-only differences so equivalent queries share a key."""
+    query = _whitespace.sub(" ", query).strip()
+    return _punctuation_space.sub(r"\1", query)
+
+
+def make_cache_key(query: str, variables: Optional[Dict[str, Any]], token: str) -> str:
+    token_id = hashlib.sha256((token or "").encode()).hexdigest()[:16]
+    material = json.dumps(
+        [normalize_query(query), variables or {}, token_id],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def get_cache_ttl(tool_name: str) -> float:
+    return CACHE_TTLS.get(tool_name, float(os.getenv("NETBOX_CACHE_TTL") or DEFAULT_CACHE_TTL))
+
+
+class DiskCacheBackend:
+    """SQLite store so warm entries survive Streamlit restarts.
+
+    Bounded like the memory tier: rows past their stale window are swept out every
+    DISK_PURGE_INTERVAL seconds, and once the stored JSON exceeds max_bytes the rows
+    closest to expiry are evicted first.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_CACHE_DISK_MAX_BYTES,
+                 grace: float = DEFAULT_CACHE_MAX_STALE):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.grace = grace
+        self.evictions = 0
+        self._bytes = 0
+        self._purged_at = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_cache (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS query_cache_expires_at ON query_cache (expires_at)")
+        self._conn.commit()
+        self.purge_expired(grace)
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM query_cache WHERE key = ?", (key,)
+            ).fetchone()
+        return row
+
+    def set(self, key: str, expires_at: float, value: str):
+        if len(value) > self.max_bytes:
+            return
+        if time.time() - self._purged_at >= DISK_PURGE_INTERVAL:
+            self.purge_expired(self.grace)
+        with self._lock:
+            row = self._conn.execute("SELECT LENGTH(value) FROM query_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_cache (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, value),
+            )
+            self._bytes += len(value) - (row[0] if row else 0)
+            while self._bytes > self.max_bytes:
+                victims = self._conn.execute(
+                    "SELECT key, LENGTH(value) FROM query_cache WHERE key != ? ORDER BY expires_at LIMIT 64", (key,)
+                ).fetchall()
+                if not victims:
+                    break
+                for victim, size in victims:
+                    if self._bytes <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM query_cache WHERE key = ?", (victim,))
+                    self._bytes -= size
+                    self.evictions += 1
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT LENGTH(value) FROM query_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+            self._conn.commit()
+            self._bytes -= row[0] if row else 0
+
+    def purge_expired(self, grace: float = 0.0):
+        with self._lock:
+            self._conn.execute("DELETE FROM query_cache WHERE expires_at <= ?", (time.time() - grace,))
+            self._conn.commit()
+            self._bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM query_cache").fetchone()[0]
+            self._purged_at = time.time()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM query_cache")
+            self._conn.commit()
+            self._bytes = 0
+
+
+class QueryCache:
+    """TTL + LRU cache for GraphQL responses, bounded by the size of the stored JSON."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_MAX_BYTES, disk: DiskCacheBackend = None,
+                 max_stale: float = DEFAULT_CACHE_MAX_STALE):
+        self.max_bytes = max_bytes
+        self.disk = disk
+        # Expired entries are kept (still LRU-bounded) for max_stale seconds for get_stale
+        self.max_stale = max_stale
+        # Entries hold the serialised JSON so callers always get a private copy
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, raw = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(raw)
+                if expires_at + self.max_stale <= now:
+                    self._remove(key)
+        if self.disk is not None:
+            row = self.disk.get(key)
+            if row is not None:
+                expires_at, raw = row
+                if expires_at > now:
+                    with self._lock:
+                        self._store(key, expires_at, raw)
+                        self.hits += 1
+                    return json.loads(raw)
+                if expires_at + self.max_stale <= now:
+                    self.disk.delete(key)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get_stale(self, key: str) -> Optional[Any]:
+        """An entry up to max_stale seconds past its expiry, for when NetBox cannot be reached."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+        if entry is None or entry[0] + self.max_stale <= now:
+            return None
+        with self._lock:
+            self.stale_hits += 1
+        return json.loads(entry[1])
+
+    def set(self, key: str, value: Any, ttl: float):
+        if ttl <= 0:
+            return
+        raw = json.dumps(value, separators=(",", ":"))
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._store(key, expires_at, raw)
+        if self.disk is not None:
+            self.disk.set(key, expires_at, raw)
+
+    def _store(self, key: str, expires_at: float, raw: str):
+        if len(raw) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, raw)
+        self._bytes += len(raw)
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, raw = self._entries.pop(key)
+        self._bytes -= len(raw)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "stale_hits": self.stale_hits,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+_query_cache = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> Optional[QueryCache]:
+    """Return the process-wide cache, or None when NETBOX_CACHE_DISABLED is set."""
+    global _query_cache
+    if (os.getenv("NETBOX_CACHE_DISABLED") or "").lower() in ("1", "true", "yes"):
+        return None
+    with _query_cache_lock:
+        if _query_cache is None:
+            cache_dir = os.getenv("NETBOX_CACHE_DIR")
+            max_stale = float(os.getenv("NETBOX_CACHE_MAX_STALE") or DEFAULT_CACHE_MAX_STALE)
+            disk = None
+            if cache_dir:
+                disk_max_bytes = int(os.getenv("NETBOX_CACHE_DISK_MAX_BYTES") or DEFAULT_CACHE_DISK_MAX_BYTES)
+                disk = DiskCacheBackend(os.path.join(cache_dir, "netbox_query_cache.sqlite3"),
+                                        max_bytes=disk_max_bytes, grace=max_stale)
+            max_bytes = int(os.getenv("NETBOX_CACHE_MAX_BYTES") or DEFAULT_CACHE_MAX_BYTES)
+            _query_cache = QueryCache(max_bytes=max_bytes, disk=disk, max_stale=max_stale)
+        return _query_cache
+
+
+_result_store = None
+
+
+def get_result_store() -> QueryCache:
+    """Process-wide short-lived store for full results behind drill-down handles (never disabled)."""
+    global _result_store
+    with _query_cache_lock:
+        if _result_store is None:
+            max_bytes = int(os.getenv("NETBOX_RESULT_STORE_MAX_BYTES") or DEFAULT_RESULT_STORE_MAX_BYTES)
+            _result_store = QueryCache(max_bytes=max_bytes, max_stale=0)
+        return _result_store
+
+
+def store_result(value: Any, prefix: str = "") -> str:
+    """Keep value for NETBOX_RESULT_TTL seconds; returns the opaque handle to load it with.
+
+    Raises ValueError for a value the store could never hold, instead of handing out a dead handle.
+    """
+    store = get_result_store()
+    size = len(json.dumps(value, separators=(",", ":")))
+    if size > store.max_bytes:
+        raise ValueError(f"Result of {size} bytes exceeds NETBOX_RESULT_STORE_MAX_BYTES ({store.max_bytes})")
+    handle = f"{prefix}{uuid.uuid4().hex[:16]}"
+    store.set(handle, value, float(os.getenv("NETBOX_RESULT_TTL") or DEFAULT_RESULT_TTL))
+    return handle
+
+
+def load_result(handle: str) -> Optional[Any]:
+    return get_result_store().get(handle)
@@ -0,0 +1,350 @@
+"""Assistant orchestration as a long-lived asyncio service with an HTTP + SSE chat API.
+
+    python -m netbox_tools.netbox_chat_service --port 8765
+
+    POST /threads                          -> {"thread_id": ...}
+    POST /threads/{thread_id}/messages     {"content": "..."} -> text/event-stream of turn events
+    POST /threads/{thread_id}/messages?stream=false           -> the final "done" event as JSON
+    GET  /exports/{file}                   -> a file written by the netbox_export tool
+    GET  /healthz
+
+Every conversation shares one event loop, one AsyncAzureOpenAI client and the
+pooled NetBox client, so a process can hold many concurrent conversations.
+Set NETBOX_CHAT_SERVICE_URL for the Streamlit app to act as a thin client;
+otherwise it runs the same ChatService in-process through LocalChatService.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+
+import openai
+from aiohttp import web
+from dotenv import load_dotenv
+
+from netbox_tools.netbox_executor import run_tool_calls
+from netbox_tools.netbox_export import find_export, export_path
+from netbox_tools.netbox_query_registry import warm_query_registry
+from netbox_tools.netbox_tool_registry import execute_tool_call, tool_concurrency_class
+from netbox_tools.netbox_tracing import start_trace, span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_MAX_RUNS = 200
+DEFAULT_RUN_TIMEOUT = 300.0
+API_VERSION = "2024-05-01-preview"
+
+RUN_STATUS_EVENTS = {
+    'thread.run.requires_action',
+    'thread.run.completed',
+    'thread.run.failed',
+    'thread.run.cancelled',
+    'thread.run.expired',
+    'thread.run.incomplete',
+}
+RUN_TERMINAL_STATUSES = ['completed', 'requires_action', 'failed', 'cancelled', 'expired', 'incomplete']
+# Errors raised when the endpoint/api-version does not support streamed runs
+STREAM_UNAVAILABLE_ERRORS = (openai.BadRequestError, openai.NotFoundError, openai.UnprocessableEntityError)
+
+
+class ChatService:
+    """Runs Assistant turns as tasks on one event loop; turn progress is published as events.
+
+    Events: {"type": "status"}, {"type": "delta", "text"}, {"type": "tool_result", "name", "ok"},
+    {"type": "export", "export"}, {"type": "done", "status", "contents", "trace"} and {"type": "error", "error"}.
+    """
+
+    def __init__(self, client=None, assistant_id: str = None, model: str = None, max_runs: int = None):
+        self.client = client or openai.AsyncAzureOpenAI(
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=API_VERSION,
+        )
+        self.assistant_id = assistant_id or os.getenv("AZURE_OPENAI_ASSISTANT_ID")
+        self.model = model or os.getenv("NETBOX_SERVICE_MODEL") or DEFAULT_MODEL
+        self.streaming = (os.getenv("ASSISTANT_STREAMING") or "true").lower() != "false"
+        self._runs = asyncio.Semaphore(max_runs or int(os.getenv("NETBOX_SERVICE_MAX_RUNS") or DEFAULT_MAX_RUNS))
+        # A thread can only have one active run, so turns on the same thread are serialized
+        self._thread_locks: Dict[str, asyncio.Lock] = {}
+        self._thread_turns: Dict[str, int] = {}
+        self.active_turns = 0
+
+    async def create_thread(self) -> str:
+        thread = await self.client.beta.threads.create()
+        return thread.id
+
+    async def chat(self, thread_id: str, prompt: str) -> AsyncIterator[Dict[str, Any]]:
+        """Start a turn and yield its events. The turn runs to completion even if the caller stops listening."""
+        queue: asyncio.Queue = asyncio.Queue()
+        task = asyncio.ensure_future(self._turn(thread_id, prompt, queue.put_nowait))
+        while True:
+            event = await queue.get()
+            yield event
+            if event["type"] in ("done", "error"):
+                break
+        await task
+
+    async def _turn(self, thread_id: str, prompt: str, emit: Callable[[Dict[str, Any]], None]):
+        lock = self._thread_locks.setdefault(thread_id, asyncio.Lock())
+        self._thread_turns[thread_id] = self._thread_turns.get(thread_id, 0) + 1
+        self.active_turns += 1
+        try:
+            async with lock, self._runs:
+                with start_trace("chat.turn", thread_id=thread_id) as trace:
+                    run, contents = await self._run_turn(thread_id, prompt, emit)
+                emit({"type": "done", "status": run.status, "contents": contents, "trace": trace.waterfall()})
+        except Exception as e:
+            logger.error(f"Turn on thread {thread_id} failed: {e}")
+            emit({"type": "error", "error": str(e)})
+        finally:
+            self.active_turns -= 1
+            self._thread_turns[thread_id] -= 1
+            if not self._thread_turns[thread_id]:
+                del self._thread_turns[thread_id]
+                del self._thread_locks[thread_id]
+
+    async def _run_turn(self, thread_id: str, prompt: str, emit):
+        with span("openai.message_create"):
+            user_message = await self.client.beta.threads.messages.create(thread_id=thread_id, role="user",
+                                                                          content=prompt)
+
+        async def execute(tool_call):
+            output, ok = await execute_tool_call(tool_call)
+            emit({"type": "tool_result", "name": tool_call.function.name, "ok": ok})
+            export = find_export(tool_call.function.name, output["output"]) if ok else None
+            if export is not None:
+                # Clients download the file from /exports; the local path stays on the server
+                emit({"type": "export", "export": {key: value for key, value in export.items() if key != "path"}})
+            return output
+
+        message_texts: Dict[str, str] = {}
+        run = None
+        if self.streaming:
+            try:
+                run = await self._consume_stream(
+                    self.client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=self.assistant_id,
+                                                         model=self.model),
+                    message_texts, emit)
+            except STREAM_UNAVAILABLE_ERRORS as e:
+                logger.warning(f"Streaming runs unavailable, falling back to polling: {str(e)}")
+                self.streaming = False
+        streamed = run is not None
+        if not streamed:
+            with span("openai.run_create"):
+                run = await self.client.beta.threads.runs.create(thread_id=thread_id, assistant_id=self.assistant_id,
+                                                                 model=self.model)
+            with span("openai.run_wait"):
+                run = await self._poll(thread_id, run.id, emit)
+
+        while run is not None and run.status == 'requires_action':
+            tool_calls = run.required_action.submit_tool_outputs.tool_calls
+            with span("tools.run", tool_calls=len(tool_calls)):
+                tool_outputs = await run_tool_calls(tool_calls, execute, concurrency_class=tool_concurrency_class)
+            if streamed:
+                run = await self._consume_stream(
+                    self.client.beta.threads.runs.submit_tool_outputs_stream(
+                        thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs),
+                    message_texts, emit, span_name="openai.submit_tool_outputs_stream")
+            else:
+                with span("openai.submit_tool_outputs"):
+                    run = await self.client.beta.threads.runs.submit_tool_outputs(
+                        thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs)
+                with span("openai.run_wait"):
+                    run = await self._poll(thread_id, run.id, emit)
+        if run is None:
+            raise RuntimeError("Run stream ended without a run status")
+
+        if streamed or run.status != 'completed':
+            return run, list(message_texts.values())
+        with span("openai.messages_list"):
+            messages = await self.client.beta.threads.messages.list(thread_id=thread_id, run_id=run.id, order="asc",
+                                                                    limit=100, after=user_message.id)
+        return run, [message.content[0].text.value for message in messages.data if message.role == "assistant"]
+
+    async def _consume_stream(self, stream_manager, message_texts: Dict[str, str], emit,
+                              span_name: str = "openai.run_stream"):
+        run = None
+        with span(span_name) as stream_span:
+            async with stream_manager as stream:
+                async for event in stream:
+                    if event.event == 'thread.message.delta':
+                        if stream_span is not None and "first_token_ms" not in stream_span.attributes:
+                            stream_span.set(first_token_ms=(time.time_ns() - stream_span.start_ns) / 1e6)
+                        message_id = event.data.id
+                        for part in event.data.delta.content or []:
+                            if part.type == 'text' and part.text and part.text.value:
+                                message_texts[message_id] = message_texts.get(message_id, "") + part.text.value
+                                emit({"type": "delta", "message_id": message_id, "text": part.text.value})
+                    elif event.event == 'thread.message.completed':
+                        texts = [part.text.value for part in event.data.content if part.type == 'text']
+                        message_texts[event.data.id] = "\n\n".join(texts)
+                    elif event.event.startswith('thread.run.') and not event.event.startswith('thread.run.step'):
+                        run = event.data
+                        emit({"type": "status", "status": run.status})
+                        if event.event in RUN_STATUS_EVENTS:
+                            if stream_span is not None:
+                                stream_span.set(status=run.status)
+                            break
+        return run
+
+    # Backs off while the status is unchanged and resets the interval on every state change
+    async def _poll(self, thread_id: str, run_id: str, emit, initial_interval: float = 0.25,
+                    max_interval: float = 2.0):
+        timeout = float(os.getenv("NETBOX_SERVICE_RUN_TIMEOUT") or DEFAULT_RUN_TIMEOUT)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        interval = initial_interval
+        last_status = None
+        while True:
+            with span("openai.poll") as poll_span:
+                run = await self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+                if poll_span is not None:
+                    poll_span.set(status=run.status)
+            if run.status != last_status:
+                emit({"type": "status", "status": run.status})
+                last_status = run.status
+                interval = initial_interval
+            else:
+                interval = min(interval * 2, max_interval)
+            if run.status in RUN_TERMINAL_STATUSES:
+                return run
+            if loop.time() >= deadline:
+                raise TimeoutError(f"Run {run_id} did not finish within {timeout} seconds")
+            await asyncio.sleep(interval)
+
+
+class LocalChatService:
+    """A ChatService on its own event-loop thread, for synchronous callers such as the Streamlit app."""
+
+    def __init__(self, **service_kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="chat-service-loop", daemon=True)
+        self._thread.start()
+        self.service = self._run(self._create(service_kwargs))
+
+    @staticmethod
+    async def _create(service_kwargs) -> ChatService:
+        # Created on the service loop so the async OpenAI client binds to it
+        return ChatService(**service_kwargs)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def create_thread(self) -> str:
+        return self._run(self.service.create_thread())
+
+    def chat(self, thread_id: str, prompt: str) -> Iterator[Dict[str, Any]]:
+        """Run a turn on the service loop and yield its events in the calling thread."""
+        events: queue.Queue = queue.Queue()
+
+        async def pump():
+            async for event in self.service.chat(thread_id, prompt):
+                events.put(event)
+
+        def on_done(future):
+            # chat() reports turn failures as events; this only catches the pump itself failing
+            if future.cancelled():
+                events.put({"type": "error", "error": "turn cancelled"})
+            elif future.exception() is not None:
+                events.put({"type": "error", "error": str(future.exception())})
+
+        asyncio.run_coroutine_threadsafe(pump(), self._loop).add_done_callback(on_done)
+        while True:
+            event = events.get()
+            yield event
+            if event["type"] in ("done", "error"):
+                return
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def sse_event(event: Dict[str, Any]) -> bytes:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n".encode()
+
+
+SERVICE_KEY = web.AppKey("service", ChatService)
+
+
+@web.middleware
+async def api_key_middleware(request: web.Request, handler):
+    # Optional shared secret; the service is otherwise open to anything that can reach it
+    api_key = os.getenv("NETBOX_SERVICE_API_KEY")
+    if api_key and request.path != "/healthz" and request.headers.get("Authorization") != f"Bearer {api_key}":
+        return web.json_response({"error": "unauthorized"}, status=401)
+    return await handler(request)
+
+
+def create_app(service: ChatService = None) -> web.Application:
+    app = web.Application(middlewares=[api_key_middleware])
+
+    async def on_startup(app):
+        # Created on the server's loop so the async OpenAI client binds to it
+        app[SERVICE_KEY] = service or ChatService()
+
+    async def create_thread(request: web.Request):
+        return web.json_response({"thread_id": await request.app[SERVICE_KEY].create_thread()})
+
+    async def post_message(request: web.Request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"error": "expected a JSON body"}, status=400)
+        content = body.get("content") if isinstance(body, dict) else None
+        if not isinstance(content, str) or not content.strip():
+            return web.json_response({"error": "'content' is required"}, status=400)
+        events = request.app[SERVICE_KEY].chat(request.match_info["thread_id"], content)
+        if request.query.get("stream", "true").lower() == "false":
+            final = None
+            async for event in events:
+                final = event
+            return web.json_response(final, status=200 if final["type"] == "done" else 502, dumps=_dumps)
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        async for event in events:
+            await response.write(sse_event(event))
+        await response.write_eof()
+        return response
+
+    async def download_export(request: web.Request):
+        path = export_path(request.match_info["file"])
+        if path is None:
+            return web.json_response({"error": "export not found"}, status=404)
+        return web.FileResponse(path, headers={"Content-Disposition": f'attachment; filename="{os.path.basename(path)}"'})
+
+    async def health(request: web.Request):
+        return web.json_response({"status": "ok", "active_turns": request.app[SERVICE_KEY].active_turns})
+
+    app.on_startup.append(on_startup)
+    app.router.add_post("/threads", create_thread)
+    app.router.add_post("/threads/{thread_id}/messages", post_message)
+    app.router.add_get("/exports/{file}", download_export)
+    app.router.add_get("/healthz", health)
+    return app
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the NetBox AI Assistant chat API.")
+    parser.add_argument("--host", default=os.getenv("NETBOX_SERVICE_HOST") or "127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("NETBOX_SERVICE_PORT") or 8765))
+    args = parser.parse_args()
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    warm_query_registry()
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
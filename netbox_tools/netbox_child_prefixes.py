@@ -1,62 +1,43 @@
-import requests
-import os
+from netbox_tools.netbox_client import get_netbox_client, get_max_results, collect_list, DEFAULT_MAX_RESULTS
+from netbox_tools.netbox_cache import get_cache_ttl
+from netbox_tools.netbox_mirror import get_fresh_mirror
+from netbox_tools.netbox_prefix_trie import get_prefix_index, prefix_index_enabled
+from netbox_tools.netbox_executor import run_blocking
 
-class NetboxGraphQLClient:
-    def __init__(self, url, token):
-        self.url = url
-        self.headers = {
-            "Authorization": f"Token {token}",
-            "Content-Type": "application/json",
-        }
+CHILD_PREFIX_LIST_QUERY = """
+query getChildPrefixes($parentPrefix: String!, $offset: Int!, $limit: Int!) {
+  prefix_list(filters: {
+    within: $parentPrefix
+  }, pagination: {offset: $offset, limit: $limit}) {
+    description
+    status
+    role {
+      name
+    }
+    prefix
+    vrf {
+      name
+    }
+    site {
+      name
+    }
+    vlan {
+      name
+      tenant {
+        name
+      }
+    }
+  }
+}
+"""
 
-    def execute_query(self, query, variables=None):
-        payload = {
-            "query": query,
-            "variables": variables or {}
-        }
-        response = requests.post(self.url, json=payload, headers=self.headers)
-        
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            raise
-
-        return response.json()
-
-    def get_child_prefixes(self, parent_prefix):
-        query = """
-        query getChildPrefixes($parentPrefix: String!) {
-          prefix_list(filters: {
-            within: $parentPrefix
-          }) {
-            description
-            status
-            role {
-              name
-            }
-            prefix
-            vrf {
-              name
-            }
-            site {
-              name
-            }
-            vlan {
-              name
-              tenant {
-                name
-              }
-            }
-          }
-        }
-        """
-        variables = {"parentPrefix": parent_prefix}
-        return self.execute_query(query, variables)
+async def get_child_prefixes(client, parent_prefix, max_items=DEFAULT_MAX_RESULTS):
+    variables = {"parentPrefix": parent_prefix}
+    return await client.fetch_list(CHILD_PREFIX_LIST_QUERY, variables, "prefix_list", max_items,
+                                   cache_ttl=get_cache_ttl("netbox_child_prefixes"))
 
 async def netbox_child_prefixes(arguments):
-    netbox_url = os.getenv("NETBOX_URL")
-    netbox_token = os.getenv("NETBOX_TOKEN")
-    client = NetboxGraphQLClient(netbox_url, netbox_token)
+    client = get_netbox_client()
     
     parent_prefix = arguments.get("parent_prefix")
     
@@ -64,19 +45,28 @@ async def netbox_child_prefixes(arguments):
         return {"error": "'parent_prefix' is a required parameter."}
     
     try:
-        result = client.get_child_prefixes(parent_prefix)
+        index = get_prefix_index() if prefix_index_enabled() else None
+        if index is not None and not index.loaded:
+            # The live 'within' query answers while the index loads in the background
+            index.start_refresh(client)
+            index = None
+        mirror = None if index is not None else get_fresh_mirror("prefixes", arguments)
+        if index is not None:
+            # Containment is answered from the in-memory prefix trie
+            await index.ensure_fresh(client)
+            prefixes, pagination = collect_list(index.within(parent_prefix), get_max_results(arguments))
+        elif mirror is not None:
+            prefixes, pagination = await run_blocking(mirror.find, "prefixes", get_max_results(arguments), "within(name, ?)", (parent_prefix,))
+            prefixes = [{k: v for k, v in prefix.items() if k != "_children"} for prefix in prefixes]
+        else:
+            prefixes, pagination = await get_child_prefixes(client, parent_prefix, get_max_results(arguments))
         response = {"data": {}}
         
-        if 'errors' in result:
-            response['error'] = result['errors'][0]['message']
-        elif 'data' in result:
-            prefixes = result['data'].get('prefix_list', [])
-            if not prefixes:
-                response['error'] = f"No prefixes found within: {parent_prefix}"
-            else:
-                response['data'] = {"prefixes": prefixes}
+        if not prefixes:
+            response['error'] = f"No prefixes found within: {parent_prefix}"
         else:
-            response['error'] = "Unexpected response structure."
+            response['data'] = {"prefixes": prefixes}
+            response['pagination'] = pagination
         
         return response
     
@@ -0,0 +1,315 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+
+import aiohttp
+
+from netbox_tools.netbox_cache import get_query_cache, make_cache_key
+from netbox_tools.netbox_batching import current_batcher
+from netbox_tools.netbox_tracing import span, record_span
+from netbox_tools.netbox_query_registry import (
+    QueryDocument, get_query_registry, persisted_queries_enabled, is_persisted_query_miss
+)
+from netbox_tools.netbox_resilience import NetboxResilience, NetboxUnavailableError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 20
+DEFAULT_POOL_PER_HOST = 10
+DEFAULT_KEEPALIVE_TIMEOUT = 30.0
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MAX_RESULTS = 200
+
+
+class NetboxQueryError(Exception):
+    """A GraphQL response carried an 'errors' entry."""
+
+
+def get_max_results(arguments: Dict[str, Any]) -> int:
+    """Result cap for list tools: the tool's 'max_results' argument, else NETBOX_MAX_RESULTS."""
+    default = int(os.getenv("NETBOX_MAX_RESULTS") or DEFAULT_MAX_RESULTS)
+    try:
+        return max(1, int(arguments.get("max_results") or default))
+    except (TypeError, ValueError):
+        return default
+
+
+async def collect_items(items: AsyncIterator[Dict[str, Any]], max_items: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Collect up to max_items from an async iterator plus {returned, truncated, total} metadata."""
+    collected = []
+    try:
+        async for item in items:
+            collected.append(item)
+            if len(collected) > max_items:
+                break
+    finally:
+        # Stop the producer (and any further page requests) as soon as the cap is hit
+        if hasattr(items, "aclose"):
+            await items.aclose()
+    truncated = len(collected) > max_items
+    collected = collected[:max_items]
+    meta = {
+        "returned": len(collected),
+        "truncated": truncated,
+        "total": None if truncated else len(collected),
+    }
+    return collected, meta
+
+
+def collect_list(items: List[Dict[str, Any]], max_items: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Like collect_items, for results already held in memory (the total is always known)."""
+    meta = {
+        "returned": min(len(items), max_items),
+        "truncated": len(items) > max_items,
+        "total": len(items),
+    }
+    return items[:max_items], meta
+
+
+class NetboxGraphQLClient:
+    """Async NetBox GraphQL client shared by every netbox_* tool.
+
+    The aiohttp session (and its keep-alive connection pool) lives on a
+    dedicated background event loop, so callers running on any loop or
+    thread - Streamlit creates a new loop per interaction - reuse the same
+    warm connections instead of paying a TCP+TLS handshake per call.
+    """
+
+    def __init__(self, url: str, token: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 pool_per_host: int = DEFAULT_POOL_PER_HOST,
+                 keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT, resilience: NetboxResilience = None):
+        self.url = url
+        self.token = token
+        self.headers = {
+            "Authorization": f"Token {token}",
+            "Content-Type": "application/json",
+        }
+        self.pool_size = pool_size
+        self.pool_per_host = pool_per_host
+        self.keepalive_timeout = keepalive_timeout
+        # Timeouts, retries, rate limiting and the circuit breaker for this NetBox
+        self.resilience = resilience or NetboxResilience()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="netbox-client", daemon=True)
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Only ever called on the client's own loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                                  timeout=self.resilience.timeout)
+        return self._session
+
+    async def _post(self, payload: Dict[str, Any], timings: List[Tuple] = None) -> Dict[str, Any]:
+        session = self._get_session()
+        start = time.time_ns()
+        async with session.post(self.url, json=payload) as response:
+            response.raise_for_status()
+            body = await response.read()
+        received = time.time_ns()
+        result = json.loads(body)
+        if timings is not None:
+            # Reported back to the caller's trace as network / JSON parse spans
+            timings.append(("netbox.network", start, received, {"bytes": len(body)}))
+            timings.append(("netbox.json_parse", received, time.time_ns(), {}))
+        return result
+
+    async def _run(self, coro):
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Run a coroutine in the background on the client's loop (e.g. a mirror sync).
+
+        It runs in a fresh context: background work outlives the caller's turn and
+        must not pick up its contextvars (the turn's query batcher in particular).
+        """
+        return contextvars.Context().run(asyncio.run_coroutine_threadsafe, coro, self._ensure_loop())
+
+    async def _send(self, payload: Dict[str, Any], timings: List[Tuple]) -> Dict[str, Any]:
+        return await self.resilience.call(lambda: self._post(payload, timings))
+
+    async def _post_document(self, document: QueryDocument, variables: Dict[str, Any],
+                             persisted: bool) -> Tuple[Dict[str, Any], List[Tuple]]:
+        timings = []
+        if persisted:
+            # Automatic persisted queries: send the hash alone, and the full text only if the server asks
+            result = await self._send({"variables": variables, "extensions": document.extensions}, timings)
+            if not is_persisted_query_miss(result):
+                return result, timings
+            payload = {"query": document.text, "variables": variables, "extensions": document.extensions}
+            return await self._send(payload, timings), timings
+        return await self._send({"query": document.text, "variables": variables}, timings), timings
+
+    async def _coalesced_post(self, document: QueryDocument, variables: Dict[str, Any],
+                              persisted: bool) -> Tuple[Dict[str, Any], List[Tuple]]:
+        # Runs on the client's loop: identical requests already in flight share one POST
+        key = make_cache_key(document.text, variables, self.token)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._post_document(document, variables, persisted))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled caller does not cancel the request for the others
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _prepare_document(query: str) -> Tuple[QueryDocument, bool]:
+        document = get_query_registry().registered(query)
+        # Only registered tool queries recur often enough for a persisted hash to pay off; ad-hoc
+        # documents (merged batches, by-id rewrites) would always miss and cost a second round trip
+        persisted = document is not None and persisted_queries_enabled()
+        return document or QueryDocument(query), persisted
+
+    async def send_query(self, query: str, variables: Dict[str, Any] = None) -> Dict[str, Any]:
+        """POST a query without caching or batching."""
+        document, persisted = self._prepare_document(query)
+        with span("netbox.request", query_hash=document.sha256[:12]):
+            result, timings = await self._run(self._coalesced_post(document, variables or {}, persisted))
+            for name, start, end, attributes in timings:
+                record_span(name, start, end, **attributes)
+        return result
+
+    async def post_query(self, query: str, variables: Dict[str, Any] = None) -> Tuple[Dict[str, Any], List[Tuple]]:
+        """Like send_query, but return the timings instead of recording them under the current span.
+
+        The first timing is the netbox.request itself; the rest are its children. The query
+        batcher uses this to attribute one shared request to every tool call that waited on it.
+        """
+        document, persisted = self._prepare_document(query)
+        start = time.time_ns()
+        result, timings = await self._run(self._coalesced_post(document, variables or {}, persisted))
+        request = ("netbox.request", start, time.time_ns(), {"query_hash": document.sha256[:12]})
+        return result, [request] + timings
+
+    async def execute_query(self, query: str, variables: Dict[str, Any] = None,
+                            cache_ttl: float = None) -> Dict[str, Any]:
+        # Responses are cached only when the caller supplies a TTL (see netbox_cache.CACHE_TTLS)
+        cache = get_query_cache() if cache_ttl else None
+        if cache is not None:
+            key = make_cache_key(query, variables, self.token)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        batcher = current_batcher.get()
+        try:
+            if batcher is not None:
+                result = await batcher.submit(self, query, variables)
+            else:
+                result = await self.send_query(query, variables)
+        except NetboxUnavailableError as e:
+            # NetBox is degraded: an expired cached answer beats no answer
+            stale = cache.get_stale(key) if cache is not None else None
+            if stale is None:
+                raise
+            logger.warning(f"Serving a stale cached NetBox response: {e}")
+            return stale
+        if cache is not None and "errors" not in result:
+            cache.set(key, result, cache_ttl)
+        return result
+
+    async def paginate(self, query: str, variables: Dict[str, Any], list_field: str,
+                       page_size: int = None, max_items: int = None, cache_ttl: float = None,
+                       offset_var: str = "offset", limit_var: str = "limit") -> AsyncIterator[Dict[str, Any]]:
+        """Yield the items of list_field page by page using NetBox's pagination: {offset, limit}.
+
+        The query must declare the offset/limit variables and pass them as the
+        list field's pagination argument. Iteration stops after max_items items.
+        """
+        page_size = page_size or int(os.getenv("NETBOX_PAGE_SIZE") or DEFAULT_PAGE_SIZE)
+        offset = 0
+        while max_items is None or offset < max_items:
+            limit = page_size if max_items is None else min(page_size, max_items - offset)
+            page_variables = {**(variables or {}), offset_var: offset, limit_var: limit}
+            result = await self.execute_query(query, page_variables, cache_ttl=cache_ttl)
+            if "errors" in result:
+                raise NetboxQueryError(result["errors"][0]["message"])
+            items = (result.get("data") or {}).get(list_field) or []
+            for item in items:
+                yield item
+            if len(items) < limit:
+                return
+            offset += len(items)
+
+    async def fetch_list(self, query: str, variables: Dict[str, Any], list_field: str,
+                         max_items: int, page_size: int = None, cache_ttl: float = None,
+                         **paginate_kwargs) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Collect up to max_items items and report whether the result was truncated.
+
+        One extra item is requested to detect truncation; 'total' is only known
+        when the list was exhausted.
+        """
+        return await collect_items(
+            self.paginate(query, variables, list_field, page_size=page_size,
+                          max_items=max_items + 1, cache_ttl=cache_ttl, **paginate_kwargs),
+            max_items,
+        )
+
+    async def _close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def close(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+_clients: Dict[Tuple[str, str], NetboxGraphQLClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_netbox_client(url: str = None, token: str = None) -> NetboxGraphQLClient:
+    """Return the process-wide client for a NetBox URL/token pair."""
+    url = url or os.getenv("NETBOX_URL")
+    token = token or os.getenv("NETBOX_TOKEN")
+    key = (url, token)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # Pool settings are read lazily so values loaded from .env apply
+            client = NetboxGraphQLClient(
+                url,
+                token,
+                pool_size=int(os.getenv("NETBOX_POOL_SIZE") or DEFAULT_POOL_SIZE),
+                pool_per_host=int(os.getenv("NETBOX_POOL_PER_HOST") or DEFAULT_POOL_PER_HOST),
+                keepalive_timeout=float(os.getenv("NETBOX_KEEPALIVE_TIMEOUT") or DEFAULT_KEEPALIVE_TIMEOUT),
+                resilience=NetboxResilience.from_env(token),
+            )
+            _clients[key] = client
+        return client
@@ -0,0 +1,197 @@
+import json
+import os
+from typing import Any, Dict, List
+
+DEFAULT_TOKEN_BUDGET = 8000
+# Rough GPT tokenisation ratio for JSON-heavy text
+CHARS_PER_TOKEN = 4
+# Sub-objects smaller than this are cheaper to repeat than to reference
+DEDUPE_MIN_CHARS = 64
+
+# Per-tool output budgets in tokens; tools not listed use NETBOX_TOOL_OUTPUT_TOKENS
+TOOL_TOKEN_BUDGETS: Dict[str, int] = {
+    "netbox_get_all_roles": 4000,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def strip_empty(value: Any) -> Any:
+    """Drop nulls, empty strings, empty lists and empty objects, recursively."""
+    if isinstance(value, dict):
+        stripped = {key: strip_empty(item) for key, item in value.items()}
+        return {key: item for key, item in stripped.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        stripped = [strip_empty(item) for item in value]
+        return [item for item in stripped if item not in (None, "", [], {})]
+    return value
+
+
+def dedupe_repeated(value: Any) -> Any:
+    """Replace sub-objects that occur more than once with {"$ref": id} entries.
+
+    The referenced objects are returned once under a top-level "_shared" key.
+    """
+    counts: Dict[str, int] = {}
+
+    def count(node):
+        if isinstance(node, dict):
+            key = _dumps(node)
+            if len(key) >= DEDUPE_MIN_CHARS:
+                counts[key] = counts.get(key, 0) + 1
+                if counts[key] > 1:
+                    # Children of a repeated object are covered by the object's reference
+                    return
+            for item in node.values():
+                count(item)
+        elif isinstance(node, list):
+            for item in node:
+                count(item)
+
+    count(value)
+    repeated = {key for key, n in counts.items() if n > 1}
+    if not repeated:
+        return value
+
+    shared: Dict[str, Any] = {}
+    ref_ids: Dict[str, str] = {}
+
+    def replace(node):
+        if isinstance(node, dict):
+            key = _dumps(node)
+            if key in repeated:
+                if key not in ref_ids:
+                    ref_ids[key] = f"#{len(ref_ids) + 1}"
+                    shared[ref_ids[key]] = {k: replace(v) for k, v in node.items()}
+                return {"$ref": ref_ids[key]}
+            return {k: replace(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [replace(item) for item in node]
+        return node
+
+    compacted = replace(value)
+    if isinstance(compacted, dict):
+        return {**compacted, "_shared": shared}
+    return {"result": compacted, "_shared": shared}
+
+
+def _flatten_row(row: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    flat = {}
+    for key, item in row.items():
+        name = f"{prefix}{key}"
+        if isinstance(item, dict):
+            flat.update(_flatten_row(item, f"{name}."))
+        else:
+            flat[name] = item
+    return flat
+
+
+def to_table(rows: List[Any]) -> Any:
+    """Turn a list of objects into {"columns": [...], "rows": [[...]]}.
+
+    Nested objects become dotted columns; lists without nested lists are kept
+    as cell values. Lists that do not fit this shape are returned unchanged.
+    """
+    if len(rows) < 2 or not all(isinstance(row, dict) for row in rows):
+        return rows
+    flat_rows = [_flatten_row(row) for row in rows]
+    columns: List[str] = []
+    for flat in flat_rows:
+        for column in flat:
+            if column not in columns:
+                columns.append(column)
+    for flat in flat_rows:
+        for cell in flat.values():
+            if isinstance(cell, list) and any(isinstance(item, (dict, list)) for item in cell):
+                return rows
+    return {"columns": columns, "rows": [[flat.get(column) for column in columns] for flat in flat_rows]}
+
+
+def tabulate(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: tabulate(item) for key, item in value.items()}
+    if isinstance(value, list):
+        table = to_table(value)
+        if table is not value:
+            return table
+        return [tabulate(item) for item in value]
+    return value
+
+
+def _is_marker(item: Any) -> bool:
+    return isinstance(item, str) and item.startswith("[truncated:")
+
+
+def _largest_list(value: Any, path=()):
+    """Return (path, serialised size) of the largest list that can still be shortened."""
+    best = (None, 0)
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        # A list already down to one real item (plus its marker) cannot be halved any further
+        if len(value) - (1 if value and _is_marker(value[-1]) else 0) > 1:
+            best = (path, len(_dumps(value)))
+        items = enumerate(value)
+    else:
+        return best
+    for key, item in items:
+        candidate = _largest_list(item, path + (key,))
+        if candidate[1] > best[1]:
+            best = candidate
+    return best
+
+
+def _get_path(value, path):
+    for key in path:
+        value = value[key]
+    return value
+
+
+def enforce_budget(value: Any, max_tokens: int) -> str:
+    """Serialise value within max_tokens, halving the largest lists with explicit markers."""
+    text = _dumps(value)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    while estimate_tokens(text) > max_tokens:
+        path, _ = _largest_list(value)
+        if path is None:
+            break
+        items = _get_path(value, path)
+        omitted = 0
+        if items and _is_marker(items[-1]):
+            omitted = int(items[-1].split()[1])
+            items = items[:-1]
+        keep = max(1, len(items) // 2)
+        omitted += len(items) - keep
+        items = items[:keep] + [f"[truncated: {omitted} more items omitted to fit the tool output budget]"]
+        if path:
+            _get_path(value, path[:-1])[path[-1]] = items
+        else:
+            value = items
+        text = _dumps(value)
+    if estimate_tokens(text) > max_tokens:
+        cut = max_tokens * CHARS_PER_TOKEN
+        text = text[:cut] + f" [truncated: output cut at {cut} characters to fit the tool output budget]"
+    return text
+
+
+def get_token_budget(tool_name: str) -> int:
+    default = int(os.getenv("NETBOX_TOOL_OUTPUT_TOKENS") or DEFAULT_TOKEN_BUDGET)
+    return TOOL_TOKEN_BUDGETS.get(tool_name, default)
+
+
+def compact_tool_output(tool_name: str, result: Any, tabular: bool = None) -> str:
+    """Compact a tool result into the string submitted back to the Assistant."""
+    if tabular is None:
+        tabular = (os.getenv("NETBOX_COMPACT_TABLES") or "").lower() in ("1", "true", "yes")
+    value = strip_empty(result)
+    value = dedupe_repeated(value)
+    if tabular:
+        value = tabulate(value)
+    return enforce_budget(value, get_token_budget(tool_name))
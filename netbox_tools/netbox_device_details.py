@@ -1,123 +1,141 @@
-import requests
-import os
-import json
 from typing import List, Dict, Any
 
-class NetboxGraphQLClient:
-    def __init__(self, url, token):
-        self.url = url
-        self.headers = {
-            "Authorization": f"Token {token}",
-            "Content-Type": "application/json",
-        }
+from netbox_tools.netbox_client import get_netbox_client, get_max_results, DEFAULT_MAX_RESULTS
+from netbox_tools.netbox_cache import get_cache_ttl
+from netbox_tools.netbox_query_registry import get_query_registry
+from netbox_tools.netbox_mirror import get_fresh_mirror, project_selection
+from netbox_tools.netbox_name_index import fetch_matching, name_index_enabled
+from netbox_tools.netbox_executor import run_blocking
+from netbox_schemas.netbox_query_builder import NetboxQueryBuilder
 
-    def execute_query(self, query: str, variables: Dict[str, Any] = None) -> Dict[str, Any]:
-        payload = {
-            "query": query,
-            "variables": variables or {}
+# Selection fragments per requestable field, merged into one GraphQL selection set
+DEVICE_FIELD_SELECTIONS = {
+    "name": {"name": {}},
+    "primary_ip4": {"primary_ip4": {"display": {}}},
+    "primary_ip6": {"primary_ip6": {"display": {}}},
+    "oob_ip": {"oob_ip": {"address": {}}},
+    "device_type": {"device_type": {"model": {}, "manufacturer": {"name": {}}}},
+    "role": {"role": {"name": {}}},
+    "location": {"location": {"name": {}, "site": {"name": {}}}},
+    "racks": {"location": {"site": {"name": {}, "racks": {"name": {}, "starting_unit": {}}}}},
+    "consoleports": {"consoleports": {"name": {}}},
+    "interfaces": {
+        "interfaces": {
+            "tagged_vlans": {"name": {}},
+            "untagged_vlan": {"name": {}},
+            "name": {},
+            "type": {},
+            "lag": {"name": {}},
+            "mtu": {},
+            "mode": {},
+            "ip_addresses": {"display": {}},
         }
-        response = requests.post(self.url, json=payload, headers=self.headers)
-        
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            raise
+    },
+    "cables": {
+        "interfaces": {
+            "name": {},
+            "cable": {"label": {}, "terminations": {"display": {}}, "display": {}},
+        }
+    },
+}
+
+DETAIL_LEVELS = {
+    "summary": ["name", "primary_ip4", "primary_ip6", "oob_ip", "device_type", "role", "location"],
+    "standard": ["name", "primary_ip4", "primary_ip6", "oob_ip", "device_type", "role", "location",
+                 "consoleports", "interfaces"],
+    "full": list(DEVICE_FIELD_SELECTIONS),
+}
+DEFAULT_DETAIL_LEVEL = "standard"
+# Variable names NetboxQueryBuilder generates for device_list(pagination: {offset, limit})
+DEVICE_PAGINATION_VARS = {
+    "offset_var": "device_list_pagination_offset",
+    "limit_var": "device_list_pagination_limit",
+}
+DEVICE_NAME_VAR = "device_list_filters_name_i_contains"
+
+def merge_selections(target, fragment):
+    for name, sub_selection in fragment.items():
+        merge_selections(target.setdefault(name, {}), sub_selection)
+    return target
 
-        return response.json()
+def build_device_selection(fields: List[str]) -> Dict[str, Any]:
+    selection = {}
+    # The device name is always returned so results can be told apart
+    for field in ["name"] + [f for f in fields if f != "name"]:
+        merge_selections(selection, DEVICE_FIELD_SELECTIONS[field])
+    return selection
 
-    def get_device_details(self, device_name_contains):
-        query = """
-        query Device($nameContains: String!) {
-          device_list(filters: {
-            name: {i_contains: $nameContains}
-          }) {
-            name
-            primary_ip4 {
-              display
-            }
-            primary_ip6 {
-              display
-            }
-            oob_ip {
-              address
-            }
-            device_type {
-              model
-              manufacturer {
-                name
-              }
-            }
-            role {
-              name
-            }
-            location {
-              name			
-              site {
-                name
-                racks {
-                  name
-                  starting_unit
-                }
-              }
-            }
-            consoleports {
-              name
-            }
-            interfaces {
-              tagged_vlans {
-                name
-              }
-              untagged_vlan {
-                name
-              }
-              name
-              type
-              lag {
-                name
-              }
-              mtu
-              mode
-              cable {
-                label
-                terminations {
-                  display
-                }
-                display
-              }
-              ip_addresses {
-                display
-              }
-            }
-          }
+def _build_device_query_text(fields):
+    query_structure = {
+        "device_list": {
+            "__args": {
+                "filters": {"name": {"i_contains": ""}},
+                "pagination": {"offset": 0, "limit": 0},
+            },
+            **build_device_selection(list(fields)),
         }
-        """
-        variables = {"nameContains": device_name_contains}
-        return self.execute_query(query, variables)
+    }
+    query, _ = NetboxQueryBuilder.build_query(query_structure, "Device")
+    return query
+
+def build_device_query(device_name_contains, fields=None):
+    fields = tuple(fields or DETAIL_LEVELS[DEFAULT_DETAIL_LEVEL])
+    # The query text depends only on the selected fields, so it is built once per field set
+    document = get_query_registry().shaped(("device_list", fields), lambda: _build_device_query_text(fields))
+    variables = {
+        DEVICE_NAME_VAR: device_name_contains,
+        DEVICE_PAGINATION_VARS["offset_var"]: 0,
+        DEVICE_PAGINATION_VARS["limit_var"]: 0,
+    }
+    return document.query, variables
+
+async def get_device_details(client, device_name_contains, fields=None, max_items=DEFAULT_MAX_RESULTS):
+    query, variables = build_device_query(device_name_contains, fields)
+    return await client.fetch_list(query, variables, "device_list", max_items,
+                                   cache_ttl=get_cache_ttl("netbox_device_details"), **DEVICE_PAGINATION_VARS)
+
+def resolve_device_fields(arguments):
+    """Return (fields, ignored_fields) from the 'fields' / 'detail_level' arguments."""
+    requested = arguments.get("fields")
+    if requested:
+        fields = [f for f in requested if f in DEVICE_FIELD_SELECTIONS]
+        ignored = [f for f in requested if f not in DEVICE_FIELD_SELECTIONS]
+        return fields or DETAIL_LEVELS["summary"], ignored
+    detail_level = (arguments.get("detail_level") or DEFAULT_DETAIL_LEVEL).lower()
+    if detail_level not in DETAIL_LEVELS:
+        return DETAIL_LEVELS[DEFAULT_DETAIL_LEVEL], [detail_level]
+    return DETAIL_LEVELS[detail_level], []
 
 async def netbox_device_details(arguments):
-    netbox_url = os.getenv("NETBOX_URL")
-    netbox_token = os.getenv("NETBOX_TOKEN")
-    client = NetboxGraphQLClient(netbox_url, netbox_token)
+    client = get_netbox_client()
     
     device_name_contains = arguments.get("device_name_contains")
     
     if not device_name_contains:
         return {"error": "'device_name_contains' is a required parameter."}
+
+    fields, ignored_fields = resolve_device_fields(arguments)
     
     try:
-        result = client.get_device_details(device_name_contains)
+        mirror = get_fresh_mirror("devices", arguments)
+        if mirror is not None:
+            devices, pagination = await run_blocking(mirror.find, "devices", get_max_results(arguments), "icontains(?, name)", (device_name_contains,))
+            devices = project_selection(devices, build_device_selection(fields))
+        elif name_index_enabled():
+            query, _ = build_device_query(device_name_contains, fields)
+            devices, pagination = await fetch_matching(client, "devices", query, device_name_contains, "i_contains",
+                                                       get_max_results(arguments), get_cache_ttl("netbox_device_details"))
+        else:
+            devices, pagination = await get_device_details(client, device_name_contains, fields, get_max_results(arguments))
         response = {"data": {}}
+        if ignored_fields:
+            response['ignored_fields'] = ignored_fields
         
-        if 'errors' in result:
-            response['error'] = result['errors'][0]['message']
-        elif 'data' in result:
-            devices = result['data'].get('device_list', [])
-            if not devices:
-                response['error'] = f"No device found matching contains: {device_name_contains}"
-            else:
-                response['data'] = {"devices": devices}
+        if not devices:
+            response['error'] = f"No device found matching contains: {device_name_contains}"
         else:
-            response['error'] = "Unexpected response structure."
+            response['data'] = {"devices": devices}
+            response['pagination'] = pagination
         
         return response
     
@@ -131,7 +149,8 @@ async def handle_assistant_request(assistant_request):
 
 # You can test the function like this:
 # assistant_request = {
-#     'device_name_contains': 'cisco'
+#     'device_name_contains': 'cisco',
+#     'fields': ['primary_ip4', 'oob_ip']
 # }
 # import asyncio
 # response = asyncio.run(handle_assistant_request(assistant_request))
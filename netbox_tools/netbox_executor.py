@@ -0,0 +1,74 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from netbox_tools.netbox_batching import current_batcher, QueryBatcher
+
+DEFAULT_MAX_CONCURRENCY = 6
+DEFAULT_TOOL_TIMEOUT = 60.0
+DEFAULT_THREAD_POOL_SIZE = 8
+
+# Per-tool timeouts in seconds; tools not listed use NETBOX_TOOL_TIMEOUT
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "netbox_get_all_roles": 15.0,
+    "netbox_search_roles": 30.0,
+    "netbox_child_prefixes": 30.0,
+    "netbox_prefixes": 30.0,
+    # Streams every page of a listing to disk
+    "netbox_export": 600.0,
+    "netbox_aggregate": 300.0,
+}
+
+# Tool concurrency classes. "netbox" tools share the NETBOX_MAX_TOOL_CONCURRENCY cap; "index" tools answer
+# from an in-memory index (refreshed once for all callers) and are not capped.
+CONCURRENCY_CLASSES = ("netbox", "index")
+
+_thread_pool = None
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        workers = int(os.getenv("NETBOX_THREAD_POOL_SIZE") or DEFAULT_THREAD_POOL_SIZE)
+        _thread_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="netbox-tool")
+    return _thread_pool
+
+
+async def run_blocking(func: Callable, *args) -> Any:
+    """Run sync code on the bounded tool thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_thread_pool(), func, *args)
+
+
+def get_tool_timeout(tool_name: str) -> float:
+    default = float(os.getenv("NETBOX_TOOL_TIMEOUT") or DEFAULT_TOOL_TIMEOUT)
+    return TOOL_TIMEOUTS.get(tool_name, default)
+
+
+async def run_tool_calls(tool_calls: List[Any],
+                         execute: Callable[[Any], Awaitable[Dict[str, Any]]],
+                         max_concurrency: int = None,
+                         concurrency_class: Callable[[Any], Optional[str]] = None) -> List[Dict[str, Any]]:
+    """Execute one turn's tool calls concurrently, at most max_concurrency "netbox" calls at a time.
+
+    concurrency_class maps a tool call to its class; calls default to "netbox".
+    Results are returned in the same order as tool_calls.
+    """
+    if max_concurrency is None:
+        max_concurrency = int(os.getenv("NETBOX_MAX_TOOL_CONCURRENCY") or DEFAULT_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def bounded(tool_call):
+        if concurrency_class is not None and concurrency_class(tool_call) == "index":
+            return await execute(tool_call)
+        async with semaphore:
+            return await execute(tool_call)
+
+    # Queries issued together by this turn's tool calls are merged into shared requests
+    batching = (os.getenv("NETBOX_BATCH_QUERIES") or "true").lower() not in ("0", "false", "no")
+    token = current_batcher.set(QueryBatcher() if batching and len(tool_calls) > 1 else None)
+    try:
+        return await asyncio.gather(*[bounded(tool_call) for tool_call in tool_calls])
+    finally:
+        current_batcher.reset(token)
@@ -0,0 +1,340 @@
+import csv
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from netbox_tools.netbox_client import get_netbox_client
+from netbox_tools.netbox_executor import run_blocking
+
+DEFAULT_EXPORT_PAGE_SIZE = 1000
+DEFAULT_EXPORT_MAX_ROWS = 500000
+DEFAULT_EXPORT_TTL = 86400
+PREVIEW_ROWS = 5
+EXPORT_FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+EXPORT_MIME_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+DEVICE_EXPORT_QUERY = """
+query ExportDevices($nameRegex: String, $siteRegex: String, $offset: Int!, $limit: Int!) {
+    device_list(filters: {
+        name: {i_regex: $nameRegex}
+        site: {name: {i_regex: $siteRegex}}
+    }, pagination: {offset: $offset, limit: $limit}) {
+        id
+        name
+        status
+        serial
+        site {
+            name
+        }
+        location {
+            name
+        }
+        role {
+            name
+        }
+        device_type {
+            model
+            manufacturer {
+                name
+            }
+        }
+        primary_ip4 {
+            address
+        }
+        primary_ip6 {
+            address
+        }
+    }
+}
+"""
+
+INTERFACE_EXPORT_QUERY = """
+query ExportInterfaces($nameRegex: String, $siteRegex: String, $ipIsNull: Boolean, $offset: Int!, $limit: Int!) {
+    interface_list(filters: {
+        name: {i_regex: $nameRegex}
+        device: {site: {name: {i_regex: $siteRegex}}}
+        ip_addresses: {id: {is_null: $ipIsNull}}
+    }, pagination: {offset: $offset, limit: $limit}) {
+        id
+        name
+        type
+        enabled
+        mtu
+        description
+        device {
+            name
+            site {
+                name
+            }
+        }
+        ip_addresses {
+            address
+        }
+    }
+}
+"""
+
+IP_ADDRESS_EXPORT_QUERY = """
+query ExportIPAddresses($nameRegex: String, $offset: Int!, $limit: Int!) {
+    ip_address_list(filters: {address: {regex: $nameRegex}}, pagination: {offset: $offset, limit: $limit}) {
+        id
+        address
+        status
+        dns_name
+        vrf {
+            name
+        }
+        assigned_object {
+            ... on InterfaceType {
+                name
+                device {
+                    name
+                    site {
+                        name
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+# Kind -> list field, query, (column, dotted path) pairs ("[]" joins the values of a list) and the
+# filter arguments its query applies server-side, by variable name. IP addresses are assigned to
+# interfaces through a generic relation NetBox cannot filter by site, so that filter stays local.
+EXPORT_SPECS: Dict[str, Dict[str, Any]] = {
+    "devices": {
+        "list_field": "device_list",
+        "query": DEVICE_EXPORT_QUERY,
+        "filters": {"site_regex": "siteRegex"},
+        "columns": [
+            ("id", "id"), ("name", "name"), ("status", "status"), ("site", "site.name"),
+            ("location", "location.name"), ("role", "role.name"), ("manufacturer", "device_type.manufacturer.name"),
+            ("device_type", "device_type.model"), ("serial", "serial"), ("primary_ip4", "primary_ip4.address"),
+            ("primary_ip6", "primary_ip6.address"),
+        ],
+    },
+    "interfaces": {
+        "list_field": "interface_list",
+        "query": INTERFACE_EXPORT_QUERY,
+        "filters": {"site_regex": "siteRegex", "with_ip_only": "ipIsNull"},
+        "columns": [
+            ("id", "id"), ("device", "device.name"), ("site", "device.site.name"), ("name", "name"),
+            ("type", "type"), ("enabled", "enabled"), ("mtu", "mtu"), ("description", "description"),
+            ("ip_addresses", "ip_addresses[].address"),
+        ],
+    },
+    "ip_addresses": {
+        "list_field": "ip_address_list",
+        "query": IP_ADDRESS_EXPORT_QUERY,
+        "filters": {},
+        "columns": [
+            ("id", "id"), ("address", "address"), ("status", "status"), ("dns_name", "dns_name"),
+            ("vrf", "vrf.name"), ("device", "assigned_object.device.name"),
+            ("site", "assigned_object.device.site.name"), ("interface", "assigned_object.name"),
+        ],
+    },
+}
+
+
+def get_export_dir() -> str:
+    return os.getenv("NETBOX_EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "netbox_exports")
+
+
+def extract(obj: Any, path: str) -> Any:
+    """Value at a dotted path; a "name[]" step collects that field across a list and joins the results."""
+    for i, step in enumerate(path.split(".")):
+        if step.endswith("[]"):
+            items = (obj or {}).get(step[:-2]) or []
+            rest = ".".join(path.split(".")[i + 1:])
+            values = [extract(item, rest) if rest else item for item in items]
+            return ", ".join(str(value) for value in values if value is not None)
+        obj = obj.get(step) if isinstance(obj, dict) else None
+        if obj is None:
+            return None
+    return obj
+
+
+class CsvExportWriter:
+    def __init__(self, path: str, columns: List[str]):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows: List[List[Any]]):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetExportWriter:
+    """One row group per page of results, so memory use does not grow with the export."""
+
+    def __init__(self, path: str, columns: List[str]):
+        # Optional dependency: only needed for Parquet exports
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([(column, pa.string()) for column in columns])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows: List[List[Any]]):
+        columns = list(zip(*rows))
+        arrays = [self._pa.array([None if value is None else str(value) for value in column], self._pa.string())
+                  for column in columns]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+async def iter_row_batches(client, kind: str, name_regex: Optional[str] = None, site_regex: Optional[str] = None,
+                           with_ip_only: bool = False, page_size: int = None) -> AsyncIterator[List[List[Any]]]:
+    """kind's objects as rows of its export columns, filtered and yielded in batches of up to page_size rows."""
+    spec = EXPORT_SPECS[kind]
+    paths = [path for _, path in spec["columns"]]
+    filters = spec["filters"]
+    # A null pattern drops the filter in NetBox rather than matching every name against ".*"
+    variables = {"nameRegex": name_regex or None}
+    site_pattern = None
+    if "site_regex" in filters:
+        variables[filters["site_regex"]] = site_regex
+    elif site_regex:
+        site_pattern = re.compile(site_regex, re.IGNORECASE)
+        site_index = [column for column, _ in spec["columns"]].index("site")
+    dedupe = False
+    if "with_ip_only" in filters:
+        variables[filters["with_ip_only"]] = False if with_ip_only else None
+        # The join onto ip_addresses returns an interface once per address it has. The copies share
+        # the interface's sort key, so they arrive back to back and comparing with the last id is enough.
+        dedupe = with_ip_only
+    last_id = None
+    page_size = page_size or int(os.getenv("NETBOX_EXPORT_PAGE_SIZE") or DEFAULT_EXPORT_PAGE_SIZE)
+    batch: List[List[Any]] = []
+    async for obj in client.paginate(spec["query"], variables, spec["list_field"], page_size=page_size):
+        if dedupe:
+            if obj.get("id") == last_id:
+                continue
+            last_id = obj.get("id")
+        row = [extract(obj, path) for path in paths]
+        if site_pattern is not None and not site_pattern.search(row[site_index] or ""):
+            continue
+        batch.append(row)
+        if len(batch) >= page_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def export_rows(client, kind: str, path: str, export_format: str, name_regex: Optional[str] = None,
+                      site_regex: Optional[str] = None, with_ip_only: bool = False,
+                      max_rows: int = None) -> Dict[str, Any]:
+    """Stream kind's objects page by page into a CSV/Parquet file; returns the row count and a preview."""
+    names = [column for column, _ in EXPORT_SPECS[kind]["columns"]]
+    writer_class = ParquetExportWriter if export_format == "parquet" else CsvExportWriter
+    writer = await run_blocking(writer_class, path, names)
+    rows_written = 0
+    preview: List[Dict[str, Any]] = []
+    truncated = False
+    try:
+        async for batch in iter_row_batches(client, kind, name_regex, site_regex, with_ip_only):
+            if max_rows is not None and rows_written + len(batch) > max_rows:
+                batch = batch[:max_rows - rows_written]
+                truncated = True
+            preview += [dict(zip(names, row)) for row in batch[:PREVIEW_ROWS - len(preview)]]
+            if batch:
+                await run_blocking(writer.write, batch)
+                rows_written += len(batch)
+            if truncated:
+                break
+    finally:
+        await run_blocking(writer.close)
+    return {"rows": rows_written, "columns": names, "preview": preview, "truncated": truncated}
+
+
+def purge_expired_exports(export_dir: str, ttl: float):
+    """Delete export files (and partial files left by crashed exports) older than ttl seconds."""
+    cutoff = time.time() - ttl
+    for entry in os.scandir(export_dir):
+        if entry.is_file() and entry.name.startswith("netbox_"):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                # Another export purged it first
+                pass
+
+
+async def netbox_export(arguments):
+    client = get_netbox_client()
+
+    kind = arguments.get("kind")
+    export_format = (arguments.get("format") or "csv").lower()
+
+    if kind not in EXPORT_SPECS:
+        return {"error": f"Invalid kind. Must be one of: {', '.join(EXPORT_SPECS)}."}
+    if export_format not in EXPORT_FORMATS:
+        return {"error": "Invalid format. Must be 'csv' or 'parquet'."}
+
+    export_dir = get_export_dir()
+    os.makedirs(export_dir, exist_ok=True)
+    await run_blocking(purge_expired_exports, export_dir,
+                       float(os.getenv("NETBOX_EXPORT_TTL") or DEFAULT_EXPORT_TTL))
+    file_name = f"netbox_{kind}_{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}{EXPORT_FORMATS[export_format]}"
+    path = os.path.join(export_dir, file_name)
+    partial_path = f"{path}.partial"
+    max_rows = int(os.getenv("NETBOX_EXPORT_MAX_ROWS") or DEFAULT_EXPORT_MAX_ROWS)
+
+    try:
+        summary = await export_rows(client, kind, partial_path, export_format, arguments.get("name_regex") or None,
+                                    arguments.get("site_regex") or None, bool(arguments.get("with_ip_only")),
+                                    max_rows)
+        os.replace(partial_path, path)
+    except ImportError:
+        return {"error": "Parquet export needs the pyarrow package; use format 'csv'."}
+    except Exception as e:
+        return {"error": f"Export failed: {str(e)}"}
+    finally:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+
+    # Only a summary goes back to the model; the user downloads the file from the chat
+    return {"data": {"export": {
+        "file": file_name,
+        "format": export_format,
+        "kind": kind,
+        "rows": summary["rows"],
+        "truncated": summary["truncated"],
+        "bytes": os.path.getsize(path),
+        "columns": summary["columns"],
+        "preview": summary["preview"],
+        "note": "The file is offered to the user as a download link below your answer; summarise it, "
+                "do not list its rows.",
+    }}}
+
+
+def find_export(tool_name: str, output: str) -> Optional[Dict[str, Any]]:
+    """The export described by a netbox_export tool output, with the file's local path, or None."""
+    if tool_name != "netbox_export":
+        return None
+    try:
+        export = json.loads(output)["data"]["export"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    path = export_path(export.get("file") or "")
+    return {**export, "path": path} if path else None
+
+
+def export_path(file_name: str) -> Optional[str]:
+    """Local path of an export file, refusing anything outside the export directory."""
+    if not file_name or os.path.basename(file_name) != file_name:
+        return None
+    path = os.path.join(get_export_dir(), file_name)
+    return path if os.path.isfile(path) else None
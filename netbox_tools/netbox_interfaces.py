@@ -1,105 +1,85 @@
-import requests
 import json
-import os
 from typing import List, Dict, Any
 
-class NetboxGraphQLClient:
-    def __init__(self, url: str, token: str):
-        self.url = url
-        self.headers = {
-            "Authorization": f"Token {token}",
-            "Content-Type": "application/json",
-        }
+from netbox_tools.netbox_client import get_netbox_client, get_max_results, DEFAULT_MAX_RESULTS
+from netbox_tools.netbox_cache import get_cache_ttl
+from netbox_tools.netbox_mirror import get_fresh_mirror
+from netbox_tools.netbox_name_index import fetch_matching, name_index_enabled
+from netbox_tools.netbox_executor import run_blocking
 
-    def execute_query(self, query: str, variables: Dict[str, Any] = None) -> Dict[str, Any]:
-        payload = {
-            "query": query,
-            "variables": variables or {}
+INTERFACE_LIST_QUERY = """
+query interface_list($interfaceRegex: String!, $offset: Int!, $limit: Int!) {
+    interface_list(filters: {name: {i_regex: $interfaceRegex}}, pagination: {offset: $offset, limit: $limit}) {
+        device {
+            name
         }
-        response = requests.post(self.url, json=payload, headers=self.headers)
-        
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            raise
-
-        return response.json()
-
-    def get_interfaces(self, interface_regex):
-        query = """
-        query interface_list($interfaceRegex: String!) {
-            interface_list(filters: {name: {i_regex: $interfaceRegex}}) {
-                device {
-                    name
-                }
-                cable {
-                    display
-                    label
-                    status
-                }
-                connected_endpoints {
-                    __typename
-                }
-                type
-                tags {
-                    name
-                }
-                speed
-                duplex
-                child_interfaces {
-                    name
-                }
-                wwn
-                mac_address
-                tagged_vlans {
-                    name
-                }
-                untagged_vlan {
-                    name
-                }
-                mtu
-                enabled
-                mgmt_only
-                mode
-                bridge {
-                    name
-                }
-                lag {
-                    name
-                }
-                description
-                parent {
-                    name
-                }
-                display
-                ip_addresses {
-                    address
-                    role
-                    status
-                    tenant {
-                        name
-                    }
-                    dns_name
-                    description
-                    assigned_object {
-                        __typename
-                    }
-                    vrf {
-                        name
-                    }
-                }
+        cable {
+            display
+            label
+            status
+        }
+        connected_endpoints {
+            __typename
+        }
+        type
+        tags {
+            name
+        }
+        speed
+        duplex
+        child_interfaces {
+            name
+        }
+        wwn
+        mac_address
+        tagged_vlans {
+            name
+        }
+        untagged_vlan {
+            name
+        }
+        mtu
+        enabled
+        mgmt_only
+        mode
+        bridge {
+            name
+        }
+        lag {
+            name
+        }
+        description
+        parent {
+            name
+        }
+        display
+        ip_addresses {
+            address
+            role
+            status
+            tenant {
+                name
+            }
+            dns_name
+            description
+            assigned_object {
+                __typename
+            }
+            vrf {
+                name
             }
         }
-        """
-        variables = {"interfaceRegex": interface_regex}
-        result = self.execute_query(query, variables)
-        
-        return result
+    }
+}
+"""
+
+async def get_interfaces(client, interface_regex, max_items=DEFAULT_MAX_RESULTS):
+    variables = {"interfaceRegex": interface_regex}
+    return await client.fetch_list(INTERFACE_LIST_QUERY, variables, "interface_list", max_items,
+                                   cache_ttl=get_cache_ttl("netbox_interfaces"))
 
 async def netbox_interfaces(arguments):
-    netbox_url = os.getenv("NETBOX_URL")
-    netbox_token = os.getenv("NETBOX_TOKEN")
-    client = NetboxGraphQLClient(netbox_url, netbox_token)
+    client = get_netbox_client()
     
     interface_regex = arguments.get("interface_regex")
     
@@ -107,17 +87,21 @@ async def netbox_interfaces(arguments):
         return {"error": "'interface_regex' is a required parameter."}
     
     try:
-        result = client.get_interfaces(interface_regex)
+        mirror = get_fresh_mirror("interfaces", arguments)
+        if mirror is not None:
+            interfaces, pagination = await run_blocking(mirror.find, "interfaces", get_max_results(arguments), "iregexp(?, name)", (interface_regex,))
+        elif name_index_enabled():
+            interfaces, pagination = await fetch_matching(client, "interfaces", INTERFACE_LIST_QUERY, interface_regex, "i_regex",
+                                                          get_max_results(arguments), get_cache_ttl("netbox_interfaces"))
+        else:
+            interfaces, pagination = await get_interfaces(client, interface_regex, get_max_results(arguments))
         response = {}
         
-        if 'errors' in result:
-            response['error'] = result['errors'][0]['message']
-        elif 'data' in result:
-            interfaces = result['data'].get('interface_list')
-            if not interfaces:
-                response['error'] = f"No interfaces found matching regex: {interface_regex}."
-            else:
-                response['data'] = {"interfaces": interfaces}
+        if not interfaces:
+            response['error'] = f"No interfaces found matching regex: {interface_regex}."
+        else:
+            response['data'] = {"interfaces": interfaces}
+            response['pagination'] = pagination
         
         return response
     
@@ -1,86 +1,135 @@
-import requests
 import json
 import os
 from typing import List, Dict, Any
 
-class NetboxGraphQLClient:
-    def __init__(self, url: str, token: str):
-        self.url = url
-        self.headers = {
-            "Authorization": f"Token {token}",
-            "Content-Type": "application/json",
-        }
+from netbox_tools.netbox_client import (
+    get_netbox_client, get_max_results, collect_items, NetboxQueryError, DEFAULT_MAX_RESULTS, DEFAULT_PAGE_SIZE
+)
+from netbox_tools.netbox_cache import get_cache_ttl
+from netbox_tools.netbox_mirror import get_fresh_mirror
+from netbox_tools.netbox_executor import run_blocking
 
-    def execute_query(self, query: str, variables: Dict[str, Any] = None) -> Dict[str, Any]:
-        payload = {
-            "query": query,
-            "variables": variables or {}
-        }
-        response = requests.post(self.url, json=payload, headers=self.headers)
-        
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            raise
-
-        return response.json()
-
-    def get_ipaddresses(self, ipaddress_regex=None, dns_name_regex=None):
-        query = """
-        query IPaddresses($ipaddressRegex: String, $dnsNameRegex: String) {
-            ip_address_list(filters: {
-                address: {regex: $ipaddressRegex}
-                dns_name: {i_regex: $dnsNameRegex}
-            }) {
-                id
-                status
-                tenant {
-                    name
-                }
-                display
-                description
-                nat_inside {
-                    description
-                    address
-                }
-                nat_outside {
-                    description
-                    address
-                }
-                vrf {
-                    name
-                    interfaces {
-                        ip_addresses {
-                            address
-                        }
-                        device {
-                            name
-                        }
-                    }
-                }
-                dns_name
-                role
-                services {
-                    name
-                    protocol
-                    ports
-                    description
-                }
+IP_ADDRESS_FIELDS = """
+fragment IPAddressFields on IPAddressType {
+    id
+    status
+    tenant {
+        name
+    }
+    display
+    description
+    nat_inside {
+        description
+        address
+    }
+    nat_outside {
+        description
+        address
+    }
+    vrf {
+        name
+    }
+    dns_name
+    role
+    services {
+        name
+        protocol
+        ports
+        description
+    }
+}
+"""
+
+IP_ADDRESS_LIST_QUERY = """
+query IPaddresses($ipaddressRegex: String, $dnsNameRegex: String, $offset: Int!, $limit: Int!) {
+    ip_address_list(filters: {
+        address: {regex: $ipaddressRegex}
+        dns_name: {i_regex: $dnsNameRegex}
+    }, pagination: {offset: $offset, limit: $limit}) {
+        ...IPAddressFields
+    }
+}
+""" + IP_ADDRESS_FIELDS
+
+# 'or' logic: both filters as aliased selections in one document; @include skips an exhausted side
+IP_ADDRESS_OR_QUERY = """
+query IPaddressesOr($ipaddressRegex: String, $dnsNameRegex: String, $withAddress: Boolean!, $withDnsName: Boolean!,
+                    $offset: Int!, $limit: Int!) {
+    by_address: ip_address_list(filters: {address: {regex: $ipaddressRegex}},
+                                pagination: {offset: $offset, limit: $limit}) @include(if: $withAddress) {
+        ...IPAddressFields
+    }
+    by_dns_name: ip_address_list(filters: {dns_name: {i_regex: $dnsNameRegex}},
+                                 pagination: {offset: $offset, limit: $limit}) @include(if: $withDnsName) {
+        ...IPAddressFields
+    }
+}
+""" + IP_ADDRESS_FIELDS
+
+async def get_ipaddresses(client, ipaddress_regex=None, dns_name_regex=None, max_items=DEFAULT_MAX_RESULTS):
+    variables = {
+        "ipaddressRegex": ipaddress_regex,
+        "dnsNameRegex": dns_name_regex
+    }
+    return await client.fetch_list(IP_ADDRESS_LIST_QUERY, variables, "ip_address_list", max_items,
+                                   cache_ttl=get_cache_ttl("netbox_ipaddresses"))
+
+# VRF membership is fetched once per distinct VRF rather than once per matched address
+VRF_MEMBERS_QUERY = """
+query VrfMembers($names: [String!]) {
+    vrf_list(filters: {name: {in_list: $names}}) {
+        name
+        interfaces {
+            ip_addresses {
+                address
+            }
+            device {
+                name
             }
         }
-        """
+    }
+}
+"""
+
+async def iter_ipaddresses_or(client, ipaddress_regex, dns_name_regex, page_size=None):
+    """Yield addresses matching either regex, deduplicated by id as the pages stream in."""
+    page_size = page_size or int(os.getenv("NETBOX_PAGE_SIZE") or DEFAULT_PAGE_SIZE)
+    with_address, with_dns_name = bool(ipaddress_regex), bool(dns_name_regex)
+    seen_ids = set()
+    offset = 0
+    while with_address or with_dns_name:
         variables = {
-            "ipaddressRegex": ipaddress_regex,
-            "dnsNameRegex": dns_name_regex
+            "ipaddressRegex": ipaddress_regex or None,
+            "dnsNameRegex": dns_name_regex or None,
+            "withAddress": with_address,
+            "withDnsName": with_dns_name,
+            "offset": offset,
+            "limit": page_size,
         }
-        result = self.execute_query(query, variables)
-        
-        return result
+        result = await client.execute_query(IP_ADDRESS_OR_QUERY, variables, cache_ttl=get_cache_ttl("netbox_ipaddresses"))
+        if 'errors' in result:
+            raise NetboxQueryError(result['errors'][0]['message'])
+        data = result.get('data') or {}
+        by_address = data.get('by_address') or []
+        by_dns_name = data.get('by_dns_name') or []
+        for item in by_address + by_dns_name:
+            if item['id'] not in seen_ids:
+                seen_ids.add(item['id'])
+                yield item
+        with_address = with_address and len(by_address) == page_size
+        with_dns_name = with_dns_name and len(by_dns_name) == page_size
+        offset += page_size
+
+async def get_vrf_members(client, vrf_names):
+    """Return {vrf name: interfaces} for the given VRFs in a single query."""
+    result = await client.execute_query(VRF_MEMBERS_QUERY, {"names": sorted(vrf_names)},
+                                        cache_ttl=get_cache_ttl("netbox_ipaddresses"))
+    if 'errors' in result:
+        raise NetboxQueryError(result['errors'][0]['message'])
+    return {vrf['name']: vrf.get('interfaces') or [] for vrf in result['data'].get('vrf_list') or []}
 
 async def netbox_ipaddresses(arguments):
-    netbox_url = os.getenv("NETBOX_URL")
-    netbox_token = os.getenv("NETBOX_TOKEN")
-    client = NetboxGraphQLClient(netbox_url, netbox_token)
+    client = get_netbox_client()
     
     ipaddress_regex = arguments.get("ipaddress_regex", "")
     dns_name_regex = arguments.get("dns_name_regex", "")
@@ -92,39 +141,41 @@ async def netbox_ipaddresses(arguments):
     if filter_logic not in ["and", "or"]:
         return {"error": "Invalid filter_logic. Must be 'and' or 'or'."}
 
-    try:
-        # Initialize the result lists
-        ipaddress_results = []
-        dns_name_results = []
+    max_results = get_max_results(arguments)
+    include_vrf_members = arguments.get("include_vrf_members", True)
 
-        # If 'and' logic, perform one query with both filters
-        if filter_logic == "and":
-            result = client.get_ipaddresses(ipaddress_regex, dns_name_regex)
-            if 'errors' in result:
-                return {"error": result['errors'][0]['message']}
-            ipaddress_results = result['data'].get('ip_address_list', [])
-        else:
-            # If 'or' logic, perform two queries and combine results
+    try:
+        mirror = get_fresh_mirror("ip_addresses", arguments)
+        if mirror is not None:
+            conditions = []
+            params = []
             if ipaddress_regex:
-                ip_result = client.get_ipaddresses(ipaddress_regex, None)
-                if 'errors' in ip_result:
-                    return {"error": ip_result['errors'][0]['message']}
-                ipaddress_results = ip_result['data'].get('ip_address_list', [])
-
+                conditions.append("regexp(?, name)")
+                params.append(ipaddress_regex)
             if dns_name_regex:
-                dns_result = client.get_ipaddresses(None, dns_name_regex)
-                if 'errors' in dns_result:
-                    return {"error": dns_result['errors'][0]['message']}
-                dns_name_results = dns_result['data'].get('ip_address_list', [])
-
-            # Combine both results and remove duplicates
-            combined_results = {item['id']: item for item in ipaddress_results + dns_name_results}
-            ipaddress_results = list(combined_results.values())
+                conditions.append("iregexp(?, alt_name)")
+                params.append(dns_name_regex)
+            where = f" {filter_logic.upper()} ".join(conditions)
+            ipaddress_results, pagination = await run_blocking(mirror.find, "ip_addresses", max_results, where, tuple(params))
+        # If 'and' logic, perform one query with both filters
+        elif filter_logic == "and":
+            ipaddress_results, pagination = await get_ipaddresses(client, ipaddress_regex, dns_name_regex, max_results)
+        else:
+            # If 'or' logic, fetch both filters per round trip and dedupe by id in one pass
+            ipaddress_results, pagination = await collect_items(
+                iter_ipaddresses_or(client, ipaddress_regex, dns_name_regex), max_results
+            )
 
         # Prepare the response
         if not ipaddress_results:
             return {"error": "No IP addresses found matching the provided criteria."}
-        return {"data": {"ip addresses": ipaddress_results}}
+        response = {"data": {"ip addresses": ipaddress_results}, "pagination": pagination}
+
+        # Join VRF membership client-side, keyed by VRF name
+        vrf_names = {item['vrf']['name'] for item in ipaddress_results if item.get('vrf')}
+        if include_vrf_members and vrf_names:
+            response['data']['vrf members'] = await get_vrf_members(client, vrf_names)
+        return response
 
     except Exception as e:
         return {"error": str(e)}
@@ -0,0 +1,367 @@
+import asyncio
+import ipaddress
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from netbox_tools.netbox_client import get_netbox_client
+from netbox_tools.netbox_batching import rewrite_list_query
+from netbox_tools.netbox_executor import run_blocking
+
+DEFAULT_MAX_STALENESS = 300.0
+DEFAULT_RECONCILE_INTERVAL = 3600.0
+DEFAULT_SYNC_PAGE_SIZE = 500
+SYNC_LOCK_POLL_INTERVAL = 0.05
+ITER_CHUNK_SIZE = 500
+
+MIRROR_KINDS = ["sites", "devices", "interfaces", "prefixes", "ip_addresses", "device_roles"]
+
+
+def _device_source_query():
+    from netbox_tools.netbox_device_details import build_device_query, DETAIL_LEVELS
+    return build_device_query("", DETAIL_LEVELS["full"])[0]
+
+
+def _source_query(module: str, constant: str) -> Callable[[], str]:
+    def load():
+        return getattr(__import__(f"netbox_tools.{module}", fromlist=[constant]), constant)
+    return load
+
+
+# Each mirrored kind reuses the selection set of the tool that serves it, so
+# answers from the mirror have the same shape as live answers.
+KIND_SPECS: Dict[str, Dict[str, Any]] = {
+    "sites": {
+        "list_field": "site_list",
+        "source": _source_query("netbox_sites", "SITE_LIST_QUERY"),
+        "extra_fields": "",
+        "name": lambda obj: obj.get("name"),
+    },
+    "devices": {
+        "list_field": "device_list",
+        "source": _device_source_query,
+        "extra_fields": "",
+        "name": lambda obj: obj.get("name"),
+    },
+    "interfaces": {
+        "list_field": "interface_list",
+        "source": _source_query("netbox_interfaces", "INTERFACE_LIST_QUERY"),
+        "extra_fields": "name",
+        "name": lambda obj: obj.get("name"),
+    },
+    "prefixes": {
+        "list_field": "prefix_list",
+        "source": _source_query("netbox_prefixes", "PREFIX_LIST_QUERY"),
+        "extra_fields": "",
+        "name": lambda obj: obj.get("prefix"),
+        "alt_name": lambda obj: (obj.get("vrf") or {}).get("name"),
+    },
+    "ip_addresses": {
+        "list_field": "ip_address_list",
+        "source": _source_query("netbox_ipaddresses", "IP_ADDRESS_LIST_QUERY"),
+        "extra_fields": "address",
+        "name": lambda obj: obj.get("address"),
+        "alt_name": lambda obj: obj.get("dns_name"),
+    },
+    "device_roles": {
+        "list_field": "device_role_list",
+        "source": _source_query("netbox_search_roles", "SEARCH_ROLES_QUERY"),
+        "extra_fields": "name",
+        "name": lambda obj: obj.get("name"),
+    },
+}
+
+# Fields the mirror adds for its own bookkeeping and strips from answers
+MIRROR_ONLY_FIELDS = ("last_updated",)
+
+
+def build_mirror_query(kind: str) -> str:
+    spec = KIND_SPECS[kind]
+    return rewrite_list_query(
+        spec["source"](), "Mirror", "$since: DateTime, $offset: Int!, $limit: Int!",
+        "filters: {last_updated: {gte: $since}}, pagination: {offset: $offset, limit: $limit}",
+        f"id\nlast_updated\n{spec['extra_fields']}",
+    )
+
+
+@lru_cache(maxsize=512)
+def _compile(pattern: str, flags: int):
+    return re.compile(pattern, flags)
+
+
+def _regexp(pattern, value):
+    return value is not None and _compile(pattern, 0).search(value) is not None
+
+
+def _iregexp(pattern, value):
+    return value is not None and _compile(pattern, re.IGNORECASE).search(value) is not None
+
+
+def _icontains(needle, value):
+    return value is not None and needle.casefold() in value.casefold()
+
+
+def _within(prefix, parent):
+    # Strictly inside parent, like NetBox's 'within' lookup
+    try:
+        network = ipaddress.ip_network(prefix, strict=False)
+        parent_network = ipaddress.ip_network(parent, strict=False)
+    except (TypeError, ValueError):
+        return False
+    return network.version == parent_network.version and network != parent_network and network.subnet_of(parent_network)
+
+
+def project_selection(obj: Any, selection: Dict[str, Any]) -> Any:
+    """Reduce a stored object to a NetboxQueryBuilder-style selection dict."""
+    if isinstance(obj, list):
+        return [project_selection(item, selection) for item in obj]
+    if not isinstance(obj, dict) or not selection:
+        return obj
+    return {name: project_selection(obj.get(name), sub) for name, sub in selection.items() if name in obj}
+
+
+class NetboxMirror:
+    """SQLite snapshot of read-heavy NetBox objects, kept fresh by last_updated-based sync.
+
+    Incremental syncs pick up created and updated objects. Deletions and changes to
+    nested relations that do not touch the parent's last_updated are picked up by the
+    periodic full reload (NETBOX_MIRROR_RECONCILE_INTERVAL).
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # A threading lock: syncs run on different event loops (the client's, the CLI's asyncio.run)
+        self._sync_lock = threading.Lock()
+        self._syncing = False
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.create_function("regexp", 2, _regexp, deterministic=True)
+        self._conn.create_function("iregexp", 2, _iregexp, deterministic=True)
+        self._conn.create_function("icontains", 2, _icontains, deterministic=True)
+        self._conn.create_function("within", 2, _within, deterministic=True)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS objects (
+                kind TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                name TEXT,
+                alt_name TEXT,
+                last_updated TEXT,
+                data TEXT NOT NULL,
+                PRIMARY KEY (kind, id)
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                kind TEXT PRIMARY KEY,
+                synced_at REAL,
+                reconciled_at REAL,
+                max_last_updated TEXT
+            );
+        """)
+        self._conn.commit()
+
+    def sync_state(self, kind: str) -> Optional[Tuple[float, float, str]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT synced_at, reconciled_at, max_last_updated FROM sync_state WHERE kind = ?", (kind,)
+            ).fetchone()
+
+    def staleness(self, kind: str) -> Optional[float]:
+        state = self.sync_state(kind)
+        return None if state is None else time.time() - state[0]
+
+    def is_fresh(self, kind: str, max_staleness: float) -> bool:
+        staleness = self.staleness(kind)
+        return staleness is not None and staleness <= max_staleness
+
+    def upsert(self, kind: str, objects: List[Dict[str, Any]]):
+        spec = KIND_SPECS[kind]
+        alt_name = spec.get("alt_name", lambda obj: None)
+        rows = [
+            (kind, int(obj["id"]), spec["name"](obj), alt_name(obj), obj.get("last_updated"),
+             json.dumps(obj, separators=(",", ":")))
+            for obj in objects
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO objects (kind, id, name, alt_name, last_updated, data) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def _record_sync(self, kind: str, max_last_updated: Optional[str], reconciled: bool):
+        now = time.time()
+        state = self.sync_state(kind)
+        reconciled_at = now if reconciled or state is None else state[1]
+        if state is not None and state[2] and (max_last_updated is None or state[2] > max_last_updated):
+            max_last_updated = state[2]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (kind, synced_at, reconciled_at, max_last_updated) VALUES (?, ?, ?, ?)",
+                (kind, now, reconciled_at, max_last_updated),
+            )
+            self._conn.commit()
+
+    def find(self, kind: str, max_items: int, where: str = "", params: Tuple = (),
+             order_by: str = "id") -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Return up to max_items objects of kind matching a SQL condition, with pagination metadata.
+
+        The condition can use regexp(), iregexp(), icontains() and within() on the
+        name / alt_name columns. These UDFs scan the kind's rows, so async callers
+        should go through run_blocking rather than calling this on the event loop.
+        """
+        sql = f"SELECT data FROM objects WHERE kind = ?{' AND (' + where + ')' if where else ''} ORDER BY {order_by} LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, (kind, *params, max_items + 1)).fetchall()
+        items = []
+        for (data,) in rows[:max_items]:
+            obj = json.loads(data)
+            for field in MIRROR_ONLY_FIELDS:
+                obj.pop(field, None)
+            items.append(obj)
+        truncated = len(rows) > max_items
+        meta = {"returned": len(items), "truncated": truncated, "total": None if truncated else len(items)}
+        return items, meta
+
+    def iter_objects(self, kind: str, chunk_size: int = ITER_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+        """Yield every object of kind in id order, reading chunk_size rows at a time.
+
+        Each chunk resumes after the last id seen, so the lock is only held per chunk
+        and concurrent writes never invalidate an open cursor.
+        """
+        last_id = None
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, data FROM objects WHERE kind = ? AND (? IS NULL OR id > ?) ORDER BY id LIMIT ?",
+                    (kind, last_id, last_id, chunk_size),
+                ).fetchall()
+            for last_id, data in rows:
+                obj = json.loads(data)
+                for field in MIRROR_ONLY_FIELDS:
+                    obj.pop(field, None)
+                yield obj
+            if len(rows) < chunk_size:
+                return
+
+    def list_objects(self, kind: str) -> List[Dict[str, Any]]:
+        return list(self.iter_objects(kind))
+
+    def _drop_missing(self, kind: str, seen_ids: set):
+        with self._lock:
+            existing = [row[0] for row in self._conn.execute("SELECT id FROM objects WHERE kind = ?", (kind,))]
+            stale = [(kind, object_id) for object_id in existing if object_id not in seen_ids]
+            self._conn.executemany("DELETE FROM objects WHERE kind = ? AND id = ?", stale)
+            self._conn.commit()
+
+    async def sync_kind(self, client, kind: str, full: bool = False, page_size: int = None):
+        page_size = page_size or int(os.getenv("NETBOX_MIRROR_PAGE_SIZE") or DEFAULT_SYNC_PAGE_SIZE)
+        state = self.sync_state(kind)
+        reconcile_interval = float(os.getenv("NETBOX_MIRROR_RECONCILE_INTERVAL") or DEFAULT_RECONCILE_INTERVAL)
+        full = full or state is None or not state[2] or time.time() - state[1] > reconcile_interval
+        since = None if full else state[2]
+        list_field = KIND_SPECS[kind]["list_field"]
+        query = build_mirror_query(kind)
+        seen_ids = set()
+        max_last_updated = None
+        batch = []
+        async for obj in client.paginate(query, {"since": since}, list_field, page_size=page_size):
+            seen_ids.add(int(obj["id"]))
+            if obj.get("last_updated") and (max_last_updated is None or obj["last_updated"] > max_last_updated):
+                max_last_updated = obj["last_updated"]
+            batch.append(obj)
+            if len(batch) >= page_size:
+                # SQLite writes go to the tool pool so they never stall the client's loop
+                await run_blocking(self.upsert, kind, batch)
+                batch = []
+        if batch:
+            await run_blocking(self.upsert, kind, batch)
+        if full:
+            # A full load is authoritative: drop anything NetBox no longer returns
+            await run_blocking(self._drop_missing, kind, seen_ids)
+        await run_blocking(self._record_sync, kind, max_last_updated, full)
+
+    async def sync(self, client=None, kinds: List[str] = None, full: bool = False):
+        client = client or get_netbox_client()
+        # Polled rather than blocking, so waiting never stalls this loop and a cancelled waiter holds nothing
+        while not self._sync_lock.acquire(blocking=False):
+            await asyncio.sleep(SYNC_LOCK_POLL_INTERVAL)
+        try:
+            for kind in kinds or MIRROR_KINDS:
+                await self.sync_kind(client, kind, full=full)
+        finally:
+            self._sync_lock.release()
+
+    def schedule_sync(self, client=None, kinds: List[str] = None):
+        """Start a background sync on the client's loop unless one is already running."""
+        with self._lock:
+            if self._syncing:
+                return
+            self._syncing = True
+        client = client or get_netbox_client()
+
+        async def run():
+            try:
+                await self.sync(client, kinds)
+            finally:
+                self._syncing = False
+
+        client.submit(run())
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror() -> Optional[NetboxMirror]:
+    """Return the process-wide mirror, or None unless NETBOX_MIRROR_PATH is set."""
+    global _mirror
+    path = os.getenv("NETBOX_MIRROR_PATH")
+    if not path:
+        return None
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = NetboxMirror(path)
+        return _mirror
+
+
+def get_fresh_mirror(kind: str, arguments: Dict[str, Any]) -> Optional[NetboxMirror]:
+    """Return the mirror if kind was synced within the query's staleness bound.
+
+    The bound is the tool's 'max_staleness' argument (seconds), else
+    NETBOX_MIRROR_MAX_STALENESS. A stale mirror triggers a background sync and
+    the caller falls back to the live API.
+    """
+    mirror = get_mirror()
+    if mirror is None:
+        return None
+    default = float(os.getenv("NETBOX_MIRROR_MAX_STALENESS") or DEFAULT_MAX_STALENESS)
+    try:
+        max_staleness = float(arguments.get("max_staleness", default))
+    except (TypeError, ValueError):
+        max_staleness = default
+    if max_staleness <= 0:
+        return None
+    if mirror.is_fresh(kind, max_staleness):
+        return mirror
+    mirror.schedule_sync()
+    return None
+
+
+# Initial load / cron sync:
+# python -m netbox_tools.netbox_mirror [--full]
+if __name__ == "__main__":
+    import sys
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    mirror = get_mirror()
+    if mirror is None:
+        sys.exit("Set NETBOX_MIRROR_PATH to enable the local mirror.")
+    start = time.time()
+    asyncio.run(mirror.sync(full="--full" in sys.argv))
+    print(f"Mirror synced in {time.time() - start:.1f}s")
@@ -0,0 +1,240 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from netbox_tools.netbox_client import get_netbox_client, NetboxQueryError
+from netbox_tools.netbox_batching import rewrite_list_query
+
+DEFAULT_INDEX_TTL = 60.0
+DEFAULT_RECONCILE_INTERVAL = 3600.0
+DEFAULT_INDEX_PAGE_SIZE = 1000
+DEFAULT_ID_CHUNK_SIZE = 100
+
+# Kind -> (list field, name field) for the objects the name-matching tools filter on
+NAME_SOURCES = {
+    "sites": ("site_list", "name"),
+    "devices": ("device_list", "name"),
+    "interfaces": ("interface_list", "name"),
+    "device_roles": ("device_role_list", "name"),
+    "prefixes": ("prefix_list", "prefix"),
+}
+
+_regex_meta = re.compile(r"[.^$*+?{}\[\]|()\\]")
+_escaped_literal = re.compile(r"\\([^\w\s])")
+
+
+def build_name_query(kind: str) -> str:
+    list_field, name_field = NAME_SOURCES[kind]
+    return f"""
+query NameIndex($since: DateTime, $offset: Int!, $limit: Int!) {{
+    {list_field}(filters: {{last_updated: {{gte: $since}}}}, pagination: {{offset: $offset, limit: $limit}}) {{
+        id
+        last_updated
+        {name_field}
+    }}
+}}
+"""
+
+
+@lru_cache(maxsize=1024)
+def compile_pattern(pattern: str, ignore_case: bool) -> re.Pattern:
+    return re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+
+
+@lru_cache(maxsize=1024)
+def literal_substring(pattern: str) -> Optional[str]:
+    """The plain substring a regex searches for, or None if it uses real regex features.
+
+    Leading/trailing '.*' are dropped since an unanchored search already implies them
+    (netbox_sites sends 'name.*').
+    """
+    while pattern.startswith(".*"):
+        pattern = pattern[2:]
+    while pattern.endswith(".*") and not pattern.endswith("\\.*"):
+        pattern = pattern[:-2]
+    unescaped = _escaped_literal.sub("", pattern)
+    if not pattern or _regex_meta.search(unescaped):
+        return None
+    return _escaped_literal.sub(r"\1", pattern)
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    """id -> name for one object kind, with a trigram index for substring lookups."""
+
+    def __init__(self):
+        self.names: Dict[int, str] = {}
+        self._folded: Dict[int, str] = {}
+        self._postings: Dict[str, Set[int]] = {}
+
+    def upsert(self, object_id: int, name: Optional[str]):
+        self.remove(object_id)
+        if name is None:
+            return
+        self.names[object_id] = name
+        folded = self._folded[object_id] = name.casefold()
+        for trigram in _trigrams(folded):
+            self._postings.setdefault(trigram, set()).add(object_id)
+
+    def remove(self, object_id: int):
+        folded = self._folded.pop(object_id, None)
+        self.names.pop(object_id, None)
+        if folded is None:
+            return
+        for trigram in _trigrams(folded):
+            postings = self._postings.get(trigram)
+            if postings is not None:
+                postings.discard(object_id)
+                if not postings:
+                    del self._postings[trigram]
+
+    def _candidates(self, folded_needle: str):
+        trigrams = _trigrams(folded_needle)
+        if not trigrams:
+            return self._folded.keys()
+        postings = sorted((self._postings.get(trigram, set()) for trigram in trigrams), key=len)
+        return set.intersection(*postings) if postings[0] else set()
+
+    def contains(self, needle: str, ignore_case: bool = True) -> List[int]:
+        folded_needle = needle.casefold()
+        if ignore_case:
+            matched = [i for i in self._candidates(folded_needle) if folded_needle in self._folded[i]]
+        else:
+            matched = [i for i in self._candidates(folded_needle) if needle in self.names[i]]
+        return sorted(matched)
+
+    def search(self, pattern: str, ignore_case: bool) -> List[int]:
+        literal = literal_substring(pattern)
+        if literal is not None:
+            return self.contains(literal, ignore_case)
+        compiled = compile_pattern(pattern, ignore_case)
+        return sorted(i for i, name in self.names.items() if compiled.search(name))
+
+    def match(self, value: str, lookup: str) -> List[int]:
+        if lookup == "i_contains":
+            return self.contains(value)
+        return self.search(value, ignore_case=lookup == "i_regex")
+
+
+class NetboxNameIndex:
+    """Name indexes for the name-matching tools, bulk loaded and refreshed by last_updated.
+
+    Patterns are matched locally and only the matching objects are fetched from
+    NetBox by id, instead of pushing regex/contains filters that scan the tables.
+    Deletions are picked up by a periodic full rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, NameIndex] = {}
+        self._since: Dict[str, Optional[str]] = {}
+        self.refreshed_at: Dict[str, float] = {}
+        self.rebuilt_at: Dict[str, float] = {}
+        self._refresh_futures: Dict[str, Any] = {}
+
+    def apply(self, kind: str, objects: List[Dict[str, Any]], index: NameIndex = None):
+        name_field = NAME_SOURCES[kind][1]
+        with self._lock:
+            index = index or self._indexes.setdefault(kind, NameIndex())
+            for obj in objects:
+                index.upsert(int(obj["id"]), obj.get(name_field))
+                if obj.get("last_updated") and (self._since.get(kind) or "") < obj["last_updated"]:
+                    self._since[kind] = obj["last_updated"]
+
+    async def _refresh(self, client, kind: str, full: bool):
+        page_size = int(os.getenv("NETBOX_NAME_INDEX_PAGE_SIZE") or DEFAULT_INDEX_PAGE_SIZE)
+        since = None if full else self._since.get(kind)
+        objects = [obj async for obj in client.paginate(build_name_query(kind), {"since": since},
+                                                        NAME_SOURCES[kind][0], page_size=page_size)]
+        if full:
+            rebuilt = NameIndex()
+            self.apply(kind, objects, rebuilt)
+            with self._lock:
+                self._indexes[kind] = rebuilt
+            self.rebuilt_at[kind] = time.time()
+        else:
+            self.apply(kind, objects)
+        self.refreshed_at[kind] = time.time()
+
+    async def ensure_fresh(self, kind: str, client=None, max_age: float = None):
+        """Refresh kind's index if older than max_age (NETBOX_NAME_INDEX_TTL by default)."""
+        if max_age is None:
+            max_age = float(os.getenv("NETBOX_NAME_INDEX_TTL") or DEFAULT_INDEX_TTL)
+        now = time.time()
+        refreshed_at = self.refreshed_at.get(kind)
+        if refreshed_at is not None and now - refreshed_at <= max_age:
+            return
+        client = client or get_netbox_client()
+        with self._lock:
+            future = self._refresh_futures.get(kind)
+            if future is None or future.done():
+                reconcile = float(os.getenv("NETBOX_NAME_INDEX_RECONCILE_INTERVAL") or DEFAULT_RECONCILE_INTERVAL)
+                rebuilt_at = self.rebuilt_at.get(kind)
+                full = rebuilt_at is None or now - rebuilt_at > reconcile
+                future = self._refresh_futures[kind] = client.submit(self._refresh(client, kind, full))
+        # Shielded: a caller's tool timeout must not cancel the refresh other callers are waiting on
+        await asyncio.shield(asyncio.wrap_future(future))
+
+    def match(self, kind: str, value: str, lookup: str) -> List[int]:
+        with self._lock:
+            return self._indexes.get(kind, NameIndex()).match(value, lookup)
+
+
+@lru_cache(maxsize=64)
+def build_by_id_query(query: str) -> str:
+    """The tool's list query with its name filter replaced by an id filter."""
+    return rewrite_list_query(query, "ById", "$ids: [ID!]", "filters: {id: {in_list: $ids}}")
+
+
+async def fetch_by_ids(client, query: str, list_field: str, ids: List[int], cache_ttl: float = None) -> List[Dict[str, Any]]:
+    chunk_size = int(os.getenv("NETBOX_NAME_INDEX_ID_CHUNK") or DEFAULT_ID_CHUNK_SIZE)
+    by_id_query = build_by_id_query(query)
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    results = await asyncio.gather(*[
+        client.execute_query(by_id_query, {"ids": [str(i) for i in chunk]}, cache_ttl=cache_ttl) for chunk in chunks
+    ])
+    items = []
+    for result in results:
+        if "errors" in result:
+            raise NetboxQueryError(result["errors"][0]["message"])
+        items.extend((result.get("data") or {}).get(list_field) or [])
+    return items
+
+
+async def fetch_matching(client, kind: str, query: str, value: str, lookup: str, max_items: Optional[int],
+                         cache_ttl: float = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Resolve a name filter against the local index, then fetch only the matching objects.
+
+    max_items=None fetches every match.
+    """
+    index = get_name_index()
+    await index.ensure_fresh(kind, client)
+    ids = index.match(kind, value, lookup)
+    if max_items is None:
+        max_items = len(ids)
+    items = await fetch_by_ids(client, query, NAME_SOURCES[kind][0], ids[:max_items], cache_ttl) if ids else []
+    meta = {"returned": len(items), "truncated": len(ids) > max_items, "total": len(ids)}
+    return items, meta
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_name_index() -> NetboxNameIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NetboxNameIndex()
+        return _index
+
+
+def name_index_enabled() -> bool:
+    return (os.getenv("NETBOX_NAME_INDEX") or "").lower() in ("1", "true", "yes")
@@ -0,0 +1,115 @@
+from netbox_tools.netbox_client import get_netbox_client, get_max_results, collect_list
+from netbox_tools.netbox_cache import get_cache_ttl
+from netbox_tools.netbox_prefix_trie import (
+    get_prefix_index, prefix_index_enabled, NetboxPrefixIndex, DEFAULT_FREE_COUNT
+)
+
+MAX_FREE_COUNT = 256
+
+# Live answers when the prefix index is off or still loading; null variables drop their filter
+PREFIX_LOOKUP_QUERY = """
+query PrefixLookup($within: String, $contains: String, $vrf: String, $offset: Int!, $limit: Int!) {
+    prefix_list(filters: {
+        within: $within
+        contains: $contains
+        vrf: {name: {exact: $vrf}}
+    }, pagination: {offset: $offset, limit: $limit}) {
+        id
+        prefix
+        status
+        description
+        vrf {
+            name
+        }
+        site {
+            name
+        }
+        role {
+            name
+        }
+        vlan {
+            name
+            tenant {
+                name
+            }
+        }
+    }
+}
+"""
+
+async def live_prefix_index(client, within=None, contains=None, vrf=None) -> NetboxPrefixIndex:
+    """A throwaway index over just the prefixes one live query returns, so both paths answer alike.
+
+    Like NetBox's own available-prefixes, free space is then judged by child prefixes only.
+    """
+    variables = {"within": within, "contains": contains, "vrf": vrf}
+    prefixes = [prefix async for prefix in client.paginate(PREFIX_LOOKUP_QUERY, variables, "prefix_list",
+                                                           cache_ttl=get_cache_ttl("netbox_prefix_lookup"))]
+    index = NetboxPrefixIndex()
+    index.apply("prefix", prefixes)
+    return index
+
+async def netbox_prefix_lookup(arguments):
+    client = get_netbox_client()
+
+    operation = (arguments.get("operation") or "").lower()
+    vrf = arguments.get("vrf") or None
+
+    if operation not in ("contains", "within", "free"):
+        return {"error": "Invalid operation. Must be 'contains', 'within' or 'free'."}
+    if operation == "contains" and not arguments.get("address"):
+        return {"error": "'address' is a required parameter for 'contains'."}
+    if operation in ("within", "free") and not arguments.get("prefix"):
+        return {"error": f"'prefix' is a required parameter for '{operation}'."}
+    if operation == "free" and not arguments.get("prefix_length"):
+        return {"error": "'prefix_length' is a required parameter for 'free'."}
+
+    try:
+        index = get_prefix_index() if prefix_index_enabled() else None
+        if index is not None and not index.loaded:
+            # Live queries answer while the index loads in the background
+            index.start_refresh(client)
+            index = None
+        if index is not None:
+            await index.ensure_fresh(client)
+        if operation == "contains":
+            if index is None:
+                index = await live_prefix_index(client, contains=arguments["address"], vrf=vrf)
+            matches = index.containing(arguments["address"], vrf)
+            if not matches:
+                return {"error": f"No prefix contains: {arguments['address']}"}
+            return {"data": {"matches": matches}}
+        if operation == "within":
+            if index is None:
+                prefixes, pagination = await client.fetch_list(
+                    PREFIX_LOOKUP_QUERY, {"within": arguments["prefix"], "vrf": vrf}, "prefix_list",
+                    get_max_results(arguments), cache_ttl=get_cache_ttl("netbox_prefix_lookup"))
+            else:
+                prefixes, pagination = collect_list(index.within(arguments["prefix"], vrf), get_max_results(arguments))
+            if not prefixes:
+                return {"error": f"No prefixes found within: {arguments['prefix']}"}
+            return {"data": {"prefixes": prefixes}, "pagination": pagination}
+        count = min(int(arguments.get("count") or DEFAULT_FREE_COUNT), MAX_FREE_COUNT)
+        if index is None:
+            index = await live_prefix_index(client, within=arguments["prefix"], vrf=vrf)
+        free = index.free(arguments["prefix"], int(arguments["prefix_length"]), vrf, count)
+        if not free:
+            return {"error": f"No free /{arguments['prefix_length']} left in: {arguments['prefix']}"}
+        return {"data": {"free prefixes": free}}
+    except Exception as e:
+        return {"error": str(e)}
+
+# Example usage
+async def handle_assistant_request(assistant_request):
+    result = await netbox_prefix_lookup(assistant_request)
+    return result
+
+# You can test the function like this:
+# assistant_request = {
+#     'operation': 'free',
+#     'prefix': '192.168.0.0/22',
+#     'prefix_length': 29
+# }
+# import asyncio
+# response = asyncio.run(handle_assistant_request(assistant_request))
+# print(response)
@@ -0,0 +1,313 @@
+import asyncio
+import ipaddress
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from netbox_tools.netbox_client import get_netbox_client
+
+DEFAULT_INDEX_TTL = 60.0
+DEFAULT_RECONCILE_INTERVAL = 3600.0
+DEFAULT_INDEX_PAGE_SIZE = 1000
+DEFAULT_FREE_COUNT = 1
+
+PREFIX_INDEX_QUERY = """
+query PrefixIndex($since: DateTime, $offset: Int!, $limit: Int!) {
+    prefix_list(filters: {last_updated: {gte: $since}}, pagination: {offset: $offset, limit: $limit}) {
+        id
+        last_updated
+        prefix
+        status
+        description
+        vrf {
+            name
+        }
+        site {
+            name
+        }
+        role {
+            name
+        }
+        vlan {
+            name
+            tenant {
+                name
+            }
+        }
+    }
+}
+"""
+
+IP_INDEX_QUERY = """
+query IPAddressIndex($since: DateTime, $offset: Int!, $limit: Int!) {
+    ip_address_list(filters: {last_updated: {gte: $since}}, pagination: {offset: $offset, limit: $limit}) {
+        id
+        last_updated
+        address
+        status
+        dns_name
+        description
+        vrf {
+            name
+        }
+    }
+}
+"""
+
+INDEX_SOURCES = {
+    "prefix": (PREFIX_INDEX_QUERY, "prefix_list", "prefix"),
+    "ip": (IP_INDEX_QUERY, "ip_address_list", "address"),
+}
+
+
+class _Node:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children: List[Optional["_Node"]] = [None, None]
+        # (kind, id) -> object stored at exactly this prefix
+        self.entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+
+def _bits(value: int, start: int, end: int, max_bits: int) -> Iterator[int]:
+    for depth in range(start, end):
+        yield (value >> (max_bits - 1 - depth)) & 1
+
+
+class PrefixTrie:
+    """Binary radix trie of one address family, keyed by network bits."""
+
+    def __init__(self, version: int):
+        self.version = version
+        self.max_bits = 32 if version == 4 else 128
+        self.root = _Node()
+
+    def _node(self, network, create: bool = False) -> Optional[_Node]:
+        node = self.root
+        for bit in _bits(int(network.network_address), 0, network.prefixlen, self.max_bits):
+            child = node.children[bit]
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[bit] = _Node()
+            node = child
+        return node
+
+    def insert(self, network, key, obj):
+        self._node(network, create=True).entries[key] = obj
+
+    def remove(self, network, key):
+        # Empty nodes are left in place; a full rebuild compacts the trie
+        node = self._node(network)
+        if node is not None:
+            node.entries.pop(key, None)
+
+    def containing(self, network) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Prefix entries that contain network (including an equal prefix), shortest first."""
+        found = []
+        node = self.root
+        value = int(network.network_address)
+        depth = 0
+        while node is not None:
+            for (kind, _), obj in node.entries.items():
+                if kind == "prefix":
+                    found.append((depth, obj))
+            if depth == network.prefixlen:
+                break
+            node = node.children[(value >> (self.max_bits - 1 - depth)) & 1]
+            depth += 1
+        return found
+
+    def within(self, network, kind: str = "prefix") -> Iterator[Dict[str, Any]]:
+        """Entries strictly inside network, in address order."""
+        start = self._node(network)
+        if start is None:
+            return
+        stack = [(start, True)]
+        while stack:
+            node, is_start = stack.pop()
+            if not is_start:
+                for (entry_kind, _), obj in node.entries.items():
+                    if entry_kind == kind:
+                        yield obj
+            for child in (node.children[1], node.children[0]):
+                if child is not None:
+                    stack.append((child, False))
+
+    def free_blocks(self, network) -> Iterator[Tuple[int, int]]:
+        """(network int, prefix length) blocks under network not covered by any prefix or address."""
+        start = self._node(network)
+        if start is None:
+            yield int(network.network_address), network.prefixlen
+            return
+        stack = [(start, int(network.network_address), network.prefixlen)]
+        while stack:
+            node, value, length = stack.pop()
+            if node is None:
+                yield value, length
+                continue
+            if (node.entries and node is not start) or length == self.max_bits:
+                continue
+            half = 1 << (self.max_bits - length - 1)
+            stack.append((node.children[1], value | half, length + 1))
+            stack.append((node.children[0], value, length + 1))
+
+
+def _vrf_name(obj: Dict[str, Any]) -> Optional[str]:
+    return (obj.get("vrf") or {}).get("name")
+
+
+def _entry_network(kind: str, obj: Dict[str, Any]):
+    value = obj.get(INDEX_SOURCES[kind][2])
+    if kind == "ip":
+        # An address occupies a single host, not the subnet in its mask
+        return ipaddress.ip_network(ipaddress.ip_interface(value).ip)
+    return ipaddress.ip_network(value, strict=False)
+
+
+class NetboxPrefixIndex:
+    """In-memory tries over NetBox prefixes and IP addresses, one per VRF and address family.
+
+    The first refresh is a bulk load; later refreshes fetch only objects whose
+    last_updated moved. Deletions are picked up by a periodic full rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tries: Dict[Tuple[Optional[str], int], PrefixTrie] = {}
+        self._locations: Dict[Tuple[str, str], Tuple[Optional[str], Any]] = {}
+        self._since: Dict[str, Optional[str]] = {}
+        self.refreshed_at: Optional[float] = None
+        self.rebuilt_at: Optional[float] = None
+        self._refresh_future = None
+
+    def _trie(self, vrf: Optional[str], version: int) -> PrefixTrie:
+        key = (vrf, version)
+        if key not in self._tries:
+            self._tries[key] = PrefixTrie(version)
+        return self._tries[key]
+
+    def apply(self, kind: str, objects: List[Dict[str, Any]]):
+        with self._lock:
+            for obj in objects:
+                key = (kind, str(obj["id"]))
+                previous = self._locations.pop(key, None)
+                if previous is not None:
+                    self._trie(previous[0], previous[1].version).remove(previous[1], key)
+                try:
+                    network = _entry_network(kind, obj)
+                except (TypeError, ValueError):
+                    continue
+                vrf = _vrf_name(obj)
+                entry = {k: v for k, v in obj.items() if k != "last_updated"}
+                self._trie(vrf, network.version).insert(network, key, entry)
+                self._locations[key] = (vrf, network)
+                if obj.get("last_updated") and (self._since.get(kind) or "") < obj["last_updated"]:
+                    self._since[kind] = obj["last_updated"]
+
+    async def _load(self, client, kind: str, since: Optional[str]) -> List[Dict[str, Any]]:
+        query, list_field, _ = INDEX_SOURCES[kind]
+        page_size = int(os.getenv("NETBOX_PREFIX_INDEX_PAGE_SIZE") or DEFAULT_INDEX_PAGE_SIZE)
+        return [obj async for obj in client.paginate(query, {"since": since}, list_field, page_size=page_size)]
+
+    async def _refresh(self, client, full: bool):
+        if full:
+            loaded = {kind: await self._load(client, kind, None) for kind in INDEX_SOURCES}
+            rebuilt = NetboxPrefixIndex()
+            for kind, objects in loaded.items():
+                rebuilt.apply(kind, objects)
+            with self._lock:
+                self._tries, self._locations, self._since = rebuilt._tries, rebuilt._locations, rebuilt._since
+                self.rebuilt_at = time.time()
+        else:
+            for kind in INDEX_SOURCES:
+                self.apply(kind, await self._load(client, kind, self._since.get(kind)))
+        self.refreshed_at = time.time()
+
+    @property
+    def loaded(self) -> bool:
+        return self.refreshed_at is not None
+
+    def start_refresh(self, client=None):
+        """Start a refresh on the client's loop unless one is running; returns its concurrent future."""
+        client = client or get_netbox_client()
+        now = time.time()
+        with self._lock:
+            if self._refresh_future is None or self._refresh_future.done():
+                reconcile = float(os.getenv("NETBOX_PREFIX_INDEX_RECONCILE_INTERVAL") or DEFAULT_RECONCILE_INTERVAL)
+                full = self.rebuilt_at is None or now - self.rebuilt_at > reconcile
+                self._refresh_future = client.submit(self._refresh(client, full))
+            return self._refresh_future
+
+    async def ensure_fresh(self, client=None, max_age: float = None):
+        """Refresh the index if it is older than max_age (NETBOX_PREFIX_INDEX_TTL by default).
+
+        Concurrent callers share a single refresh running on the client's loop.
+        """
+        if max_age is None:
+            max_age = float(os.getenv("NETBOX_PREFIX_INDEX_TTL") or DEFAULT_INDEX_TTL)
+        if self.refreshed_at is not None and time.time() - self.refreshed_at <= max_age:
+            return
+        # Shielded: a caller's tool timeout must not cancel the refresh other callers are waiting on
+        await asyncio.shield(asyncio.wrap_future(self.start_refresh(client)))
+
+    def _tries_for(self, vrf: Optional[str], version: int) -> List[Tuple[Optional[str], PrefixTrie]]:
+        # vrf=None searches every VRF including the global table
+        return [(key[0], trie) for key, trie in self._tries.items()
+                if key[1] == version and (vrf is None or key[0] == vrf)]
+
+    def containing(self, address: str, vrf: str = None) -> List[Dict[str, Any]]:
+        """Prefixes containing an address or prefix, per VRF, longest match last."""
+        network = ipaddress.ip_network(address, strict=False)
+        results = []
+        with self._lock:
+            for vrf_name, trie in self._tries_for(vrf, network.version):
+                matches = trie.containing(network)
+                if matches:
+                    results.append({
+                        "vrf": vrf_name,
+                        "prefixes": [obj for _, obj in matches],
+                        "longest_match": matches[-1][1],
+                    })
+        return results
+
+    def within(self, prefix: str, vrf: str = None, kind: str = "prefix") -> List[Dict[str, Any]]:
+        network = ipaddress.ip_network(prefix, strict=False)
+        with self._lock:
+            return [obj for _, trie in self._tries_for(vrf, network.version) for obj in trie.within(network, kind)]
+
+    def free(self, parent: str, prefix_length: int, vrf: str = None, count: int = DEFAULT_FREE_COUNT) -> List[str]:
+        """The first count unused /prefix_length subnets of parent."""
+        network = ipaddress.ip_network(parent, strict=False)
+        if not network.prefixlen <= prefix_length <= network.max_prefixlen:
+            raise ValueError(f"prefix_length must be between {network.prefixlen} and {network.max_prefixlen}")
+        with self._lock:
+            trie = self._tries.get((vrf, network.version)) or PrefixTrie(network.version)
+            free = []
+            for value, length in trie.free_blocks(network):
+                if length > prefix_length:
+                    continue
+                step = 1 << (network.max_prefixlen - prefix_length)
+                for offset in range(0, min(1 << (prefix_length - length), count - len(free))):
+                    free.append(str(ipaddress.ip_network((value + offset * step, prefix_length))))
+                if len(free) >= count:
+                    break
+        return free
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_prefix_index() -> NetboxPrefixIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NetboxPrefixIndex()
+        return _index
+
+
+def prefix_index_enabled() -> bool:
+    # Opt-in: the first load reads every prefix and IP address in NetBox
+    return (os.getenv("NETBOX_PREFIX_INDEX") or "").lower() in ("1", "true", "yes")
@@ -1,63 +1,44 @@
-import requests
-import os
+from netbox_tools.netbox_client import get_netbox_client, get_max_results, DEFAULT_MAX_RESULTS
+from netbox_tools.netbox_cache import get_cache_ttl
+from netbox_tools.netbox_mirror import get_fresh_mirror
+from netbox_tools.netbox_name_index import fetch_matching, name_index_enabled
+from netbox_tools.netbox_executor import run_blocking
 
-class NetboxGraphQLClient:
-    def __init__(self, url, token):
-        self.url = url
-        self.headers = {
-            "Authorization": f"Token {token}",
-            "Content-Type": "application/json",
-        }
+PREFIX_LIST_QUERY = """
+query prefixes($prefixRegex: String!, $offset: Int!, $limit: Int!) {
+  prefix_list(filters: {
+    prefix: {regex: $prefixRegex}
+  }, pagination: {offset: $offset, limit: $limit}) {
+    description
+    status
+    role {
+      name
+    }
+    prefix
+    vrf {
+      name
+    }
+    _children
+    site {
+      name
+    }
+    vlan {
+      name
+      tenant {
+        name
+      }
+    }
+  }
+}
+"""
 
-    def execute_query(self, query, variables=None):
-        payload = {
-            "query": query,
-            "variables": variables or {}
-        }
-        response = requests.post(self.url, json=payload, headers=self.headers)
-        
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            raise
-
-        return response.json()
-
-    def get_prefix_details(self, prefix_regex):
-        query = """
-        query prefixes($prefixRegex: String!) {
-          prefix_list(filters: {
-            prefix: {regex: $prefixRegex}
-          }) {
-            description
-            status
-            role {
-              name
-            }
-            prefix
-            vrf {
-              name
-            }
-            _children
-            site {
-              name
-            }
-            vlan {
-              name
-              tenant {
-                name
-              }
-            }
-          }
-        }
-        """
-        variables = {"prefixRegex": prefix_regex}
-        return self.execute_query(query, variables)
+async def get_prefix_details(client, prefix_regex, max_items=DEFAULT_MAX_RESULTS):
+    variables = {"prefixRegex": prefix_regex}
+    return await client.fetch_list(PREFIX_LIST_QUERY, variables, "prefix_list", max_items,
+                                   cache_ttl=get_cache_ttl("netbox_prefixes"))
 
 async def netbox_prefixes(arguments):
-    netbox_url = os.getenv("NETBOX_URL")
-    netbox_token = os.getenv("NETBOX_TOKEN")
-    client = NetboxGraphQLClient(netbox_url, netbox_token)
+    client = get_netbox_client()
     
     prefix_regex = arguments.get("prefix_regex")
     
@@ -65,19 +46,21 @@ async def netbox_prefixes(arguments):
         return {"error": "'prefix_regex' is a required parameter."}
     
     try:
-        result = client.get_prefix_details(prefix_regex)
+        mirror = get_fresh_mirror("prefixes", arguments)
+        if mirror is not None:
+            prefixes, pagination = await run_blocking(mirror.find, "prefixes", get_max_results(arguments), "regexp(?, name)", (prefix_regex,))
+        elif name_index_enabled():
+            prefixes, pagination = await fetch_matching(client, "prefixes", PREFIX_LIST_QUERY, prefix_regex, "regex",
+                                                        get_max_results(arguments), get_cache_ttl("netbox_prefixes"))
+        else:
+            prefixes, pagination = await get_prefix_details(client, prefix_regex, get_max_results(arguments))
         response = {"data": {}}
         
-        if 'errors' in result:
-            response['error'] = result['errors'][0]['message']
-        elif 'data' in result:
-            prefixes = result['data'].get('prefix_list', [])
-            if not prefixes:
-                response['error'] = f"No prefixes found matching regex: {prefix_regex}"
-            else:
-                response['data'] = {"prefixes": prefixes}
+        if not prefixes:
+            response['error'] = f"No prefixes found matching regex: {prefix_regex}"
         else:
-            response['error'] = "Unexpected response structure."
+            response['data'] = {"prefixes": prefixes}
+            response['pagination'] = pagination
         
         return response
     
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from netbox_tools.netbox_cache import normalize_query
+
+DEFAULT_REGISTRY_SIZE = 512
+PERSISTED_QUERY_NOT_FOUND = "PersistedQueryNotFound"
+
+
+class QueryDocument:
+    """A query prepared once: its minified text and the sha256 hash used for persisted queries."""
+
+    __slots__ = ("query", "text", "sha256")
+
+    def __init__(self, query: str):
+        self.query = query
+        # String literals could contain significant whitespace, so only literal-free documents are minified
+        self.text = query if '"' in query else normalize_query(query)
+        self.sha256 = hashlib.sha256(self.text.encode()).hexdigest()
+
+    @property
+    def extensions(self) -> Dict[str, Any]:
+        return {"persistedQuery": {"version": 1, "sha256Hash": self.sha256}}
+
+
+class QueryRegistry:
+    """Bounded LRU registry of QueryDocuments, keyed by query text or by selection shape.
+
+    Only tool queries belong here (warm_query_registry and shaped device queries);
+    ad-hoc documents such as merged batches are never registered, so they cannot
+    evict the warmed ones.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_REGISTRY_SIZE):
+        self.max_entries = max_entries
+        self._documents: "OrderedDict[Hashable, QueryDocument]" = OrderedDict()
+        self._keys_by_query: Dict[str, Hashable] = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, key: Hashable, factory: Callable[[], str]) -> QueryDocument:
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+                return document
+        document = QueryDocument(factory())
+        with self._lock:
+            self._documents[key] = document
+            self._keys_by_query[document.query] = key
+            while len(self._documents) > self.max_entries:
+                _, evicted = self._documents.popitem(last=False)
+                if self._keys_by_query.get(evicted.query) not in self._documents:
+                    self._keys_by_query.pop(evicted.query, None)
+        return document
+
+    def document(self, query: str) -> QueryDocument:
+        return self._remember(query, lambda: query)
+
+    def shaped(self, shape: Hashable, build: Callable[[], str]) -> QueryDocument:
+        """Document for a generated query, built only the first time its shape is seen."""
+        return self._remember(("shape", shape), build)
+
+    def registered(self, query: str) -> Optional[QueryDocument]:
+        """The registered document for this query text, or None for an ad-hoc query."""
+        with self._lock:
+            key = self._keys_by_query.get(query)
+            document = self._documents.get(key) if key is not None else None
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def __len__(self):
+        return len(self._documents)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_query_registry() -> QueryRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = QueryRegistry(int(os.getenv("NETBOX_QUERY_REGISTRY_SIZE") or DEFAULT_REGISTRY_SIZE))
+        return _registry
+
+
+def persisted_queries_enabled() -> bool:
+    # Off by default: stock NetBox does not implement automatic persisted queries
+    return (os.getenv("NETBOX_PERSISTED_QUERIES") or "").lower() in ("1", "true", "yes")
+
+
+def is_persisted_query_miss(result: Dict[str, Any]) -> bool:
+    for error in result.get("errors") or []:
+        if PERSISTED_QUERY_NOT_FOUND in (error.get("message") or "") or \
+                (error.get("extensions") or {}).get("code") == "PERSISTED_QUERY_NOT_FOUND":
+            return True
+    return False
+
+
+def warm_query_registry() -> int:
+    """Register every tool's query document up front; returns the registry size."""
+    from netbox_tools.netbox_sites import SITE_LIST_QUERY, SITE_SUMMARY_QUERY, SITE_CONTACTS_QUERY, SITE_SECTION_LISTS
+    from netbox_tools.netbox_interfaces import INTERFACE_LIST_QUERY
+    from netbox_tools.netbox_prefixes import PREFIX_LIST_QUERY
+    from netbox_tools.netbox_child_prefixes import CHILD_PREFIX_LIST_QUERY
+    from netbox_tools.netbox_prefix_lookup import PREFIX_LOOKUP_QUERY
+    from netbox_tools.netbox_ipaddresses import IP_ADDRESS_LIST_QUERY, IP_ADDRESS_OR_QUERY, VRF_MEMBERS_QUERY
+    from netbox_tools.netbox_search_roles import SEARCH_ROLES_QUERY, ROLES_LIST_ALL_QUERY
+    from netbox_tools.netbox_device_details import DETAIL_LEVELS, build_device_query
+    from netbox_tools.netbox_export import EXPORT_SPECS
+
+    registry = get_query_registry()
+    queries: List[str] = [
+        SITE_LIST_QUERY, INTERFACE_LIST_QUERY, PREFIX_LIST_QUERY, CHILD_PREFIX_LIST_QUERY, PREFIX_LOOKUP_QUERY,
+        IP_ADDRESS_LIST_QUERY, IP_ADDRESS_OR_QUERY, VRF_MEMBERS_QUERY, SEARCH_ROLES_QUERY, ROLES_LIST_ALL_QUERY,
+    ]
+    queries += [build_device_query("", fields)[0] for fields in DETAIL_LEVELS.values()]
+    queries += [spec["query"] for spec in EXPORT_SPECS.values()]
+    queries += [SITE_SUMMARY_QUERY, SITE_CONTACTS_QUERY] + [query for _, query, _ in SITE_SECTION_LISTS.values()]
+    for query in queries:
+        registry.document(query)
+    return len(registry)
@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import aiohttp
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BASE_DELAY = 0.2
+DEFAULT_RETRY_MAX_DELAY = 5.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET = 30.0
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class NetboxUnavailableError(Exception):
+    """NetBox did not answer: retries were exhausted or its circuit breaker is open."""
+
+
+class CircuitOpenError(NetboxUnavailableError):
+    pass
+
+
+class TokenBucket:
+    """Rate limiter shared across threads and loops: reserve() takes a token and returns how long to wait for it."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # A negative balance is the queue of callers already waiting for a token
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `reset_timeout` one probe request may try again."""
+
+    def __init__(self, threshold: int = DEFAULT_BREAKER_THRESHOLD, reset_timeout: float = DEFAULT_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def before_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._probing:
+                raise CircuitOpenError("NetBox is unavailable (circuit open); try again shortly")
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def abandon(self):
+        # The request was cancelled without an answer; let the next caller probe instead
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or (self.threshold > 0 and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class NetboxResilience:
+    """Timeouts, retry policy, rate limiter and circuit breaker for one NetBox client."""
+
+    def __init__(self, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+                 max_delay: float = DEFAULT_RETRY_MAX_DELAY, rate_limiter: TokenBucket = None,
+                 breaker: CircuitBreaker = None):
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limiter = rate_limiter or TokenBucket(0, 1)
+        self.breaker = breaker or CircuitBreaker()
+
+    @classmethod
+    def from_env(cls, token: str) -> "NetboxResilience":
+        return cls(
+            connect_timeout=float(os.getenv("NETBOX_CONNECT_TIMEOUT") or DEFAULT_CONNECT_TIMEOUT),
+            read_timeout=float(os.getenv("NETBOX_READ_TIMEOUT") or DEFAULT_READ_TIMEOUT),
+            max_retries=int(os.getenv("NETBOX_MAX_RETRIES") or DEFAULT_MAX_RETRIES),
+            base_delay=float(os.getenv("NETBOX_RETRY_BASE_DELAY") or DEFAULT_RETRY_BASE_DELAY),
+            max_delay=float(os.getenv("NETBOX_RETRY_MAX_DELAY") or DEFAULT_RETRY_MAX_DELAY),
+            rate_limiter=get_rate_limiter(token),
+            breaker=CircuitBreaker(int(os.getenv("NETBOX_BREAKER_THRESHOLD") or DEFAULT_BREAKER_THRESHOLD),
+                                   float(os.getenv("NETBOX_BREAKER_RESET") or DEFAULT_BREAKER_RESET)),
+        )
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After when it sent one."""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, send):
+        """Await send() under the rate limit, retrying 429/5xx/connection failures with backoff."""
+        self.breaker.before_request()
+        attempt = 0
+        while True:
+            delay = self.rate_limiter.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                result = await send()
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # NetBox answered (e.g. 400/403), so it is up
+                    self.breaker.record_success()
+                    raise
+                if attempt >= self.max_retries:
+                    self.breaker.record_failure()
+                    raise NetboxUnavailableError(f"NetBox request failed after {attempt + 1} attempts: {describe(e)}") from e
+                await asyncio.sleep(self.backoff(attempt, retry_after(e)))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRYABLE_STATUSES
+    return isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def describe(error: Exception) -> str:
+    if isinstance(error, aiohttp.ClientResponseError):
+        return f"HTTP {error.status} {error.message}"
+    return str(error) or type(error).__name__
+
+
+_rate_limiters: Dict[str, TokenBucket] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(token: str) -> TokenBucket:
+    """The process-wide token bucket for a NetBox token (NETBOX_RATE_LIMIT requests/s; 0 disables)."""
+    key = hashlib.sha256((token or "").encode()).hexdigest()
+    with _rate_limiters_lock:
+        bucket = _rate_limiters.get(key)
+        if bucket is None:
+            rate = float(os.getenv("NETBOX_RATE_LIMIT") or 0)
+            bucket = _rate_limiters[key] = TokenBucket(rate, float(os.getenv("NETBOX_RATE_BURST") or max(1.0, rate)))
+        return bucket
@@ -1,76 +1,58 @@
-import requests
-import os
 import json
 from typing import List, Dict, Any
 
-class NetboxGraphQLClient:
-    def __init__(self, url, token):
-        self.url = url
-        self.headers = {
-            "Authorization": f"Token {token}",
-            "Content-Type": "application/json",
-        }
+from netbox_tools.netbox_client import get_netbox_client
+from netbox_tools.netbox_cache import get_cache_ttl
+from netbox_tools.netbox_mirror import get_fresh_mirror, project_selection
+from netbox_tools.netbox_name_index import fetch_matching, name_index_enabled
+from netbox_tools.netbox_executor import run_blocking
 
-    def execute_query(self, query: str, variables: Dict[str, Any] = None) -> Dict[str, Any]:
-        payload = {
-            "query": query,
-            "variables": variables or {}
-        }
-        response = requests.post(self.url, json=payload, headers=self.headers)
-        
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            raise
+SEARCH_ROLES_QUERY = """
+query SearchRoles($nameContains: String!) {
+  device_role_list(filters: {
+    name: {i_contains: $nameContains},
+  }) {
+    display
+    description
+    devices {
+      status
+      name
+      role {
+        name
+      }
+      id
+      location {
+        name
+      }
+      site {
+        name
+      }
+      rack {
+        name       
+      }
+    }
+  }
+}
+"""
 
-        return response.json()
+async def search_roles(client, name_contains):
+    variables = {"nameContains": name_contains}
+    return await client.execute_query(SEARCH_ROLES_QUERY, variables, cache_ttl=get_cache_ttl("netbox_search_roles"))
 
-    def search_roles(self, name_contains):
-        query = """
-        query SearchRoles($nameContains: String!) {
-          device_role_list(filters: {
-            name: {i_contains: $nameContains},
-          }) {
-            display
-            description
-            devices {
-              status
-              name
-              role {
-                name
-              }
-              id
-              location {
-                name
-              }
-              site {
-                name
-              }
-              rack {
-                name       
-              }
-            }
-          }
-        }
-        """
-        variables = {"nameContains": name_contains}
-        return self.execute_query(query, variables)
+ROLES_LIST_ALL_QUERY = """
+query RolesListAll {
+  device_role_list {
+    display
+    description
+  }
+}
+"""
 
-    def get_all_roles(self):
-        query = """
-        query RolesListAll {
-          device_role_list {
-            display
-            description
-          }
-        }
-        """
-        return self.execute_query(query)
+async def get_all_roles(client):
+    return await client.execute_query(ROLES_LIST_ALL_QUERY, cache_ttl=get_cache_ttl("netbox_get_all_roles"))
 
 async def netbox_search_roles(arguments):
-    netbox_url = os.getenv("NETBOX_URL")
-    netbox_token = os.getenv("NETBOX_TOKEN")
-    client = NetboxGraphQLClient(netbox_url, netbox_token)
+    client = get_netbox_client()
     
     role_name_contains = arguments.get("role_name_contains")
     
@@ -78,7 +60,17 @@ async def netbox_search_roles(arguments):
         return {"error": "'role_name_contains' is a required parameter for searching roles."}
     
     try:
-        result = client.search_roles(role_name_contains)
+        mirror = get_fresh_mirror("device_roles", arguments)
+        if mirror is not None:
+            device_roles = [role for role in await run_blocking(mirror.list_objects, "device_roles")
+                            if role_name_contains.casefold() in (role.get("name") or "").casefold()]
+            result = {"data": {"device_role_list": device_roles}}
+        elif name_index_enabled():
+            device_roles, _ = await fetch_matching(client, "device_roles", SEARCH_ROLES_QUERY, role_name_contains, "i_contains",
+                                                   None, get_cache_ttl("netbox_search_roles"))
+            result = {"data": {"device_role_list": device_roles}}
+        else:
+            result = await search_roles(client, role_name_contains)
         response = {"data": {}}
         
         if 'errors' in result:
@@ -99,12 +91,15 @@ async def netbox_search_roles(arguments):
         return {"error": str(e)}
 
 async def netbox_get_all_roles():
-    netbox_url = os.getenv("NETBOX_URL")
-    netbox_token = os.getenv("NETBOX_TOKEN")
-    client = NetboxGraphQLClient(netbox_url, netbox_token)
+    client = get_netbox_client()
     
     try:
-        result = client.get_all_roles()
+        mirror = get_fresh_mirror("device_roles", {})
+        if mirror is not None:
+            device_roles = project_selection(await run_blocking(mirror.list_objects, "device_roles"), {"display": {}, "description": {}})
+            result = {"data": {"device_role_list": device_roles}}
+        else:
+            result = await get_all_roles(client)
         response = {"data": {}}
         
         if 'errors' in result:
@@ -1,94 +1,233 @@
-import requests
 import json
-import os
 from typing import List, Dict, Any
 
-class NetboxGraphQLClient:
-    def __init__(self, url: str, token: str):
-        self.url = url
-        self.headers = {
-            "Authorization": f"Token {token}",
-            "Content-Type": "application/json",
-        }
+from netbox_tools.netbox_client import get_netbox_client, get_max_results, collect_list
+from netbox_tools.netbox_cache import get_cache_ttl, store_result, load_result
+from netbox_tools.netbox_mirror import get_fresh_mirror
+from netbox_tools.netbox_name_index import fetch_matching, name_index_enabled
+from netbox_tools.netbox_executor import run_blocking
 
-    def execute_query(self, query: str, variables: Dict[str, Any] = None) -> Dict[str, Any]:
-        payload = {
-            "query": query,
-            "variables": variables or {}
+SITE_LIST_QUERY = """
+query Sites($name: String!) {
+    site_list(filters: {name: {i_regex: $name}}) {
+        name
+        status
+        comments
+        contacts {
+            contact {
+                name
+                link
+                phone
+            }
         }
-        response = requests.post(self.url, json=payload, headers=self.headers)
-        
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            raise
-
-        return response.json()
-
-    def get_site_details(self, site_name: str) -> Dict[str, Any]:
-        query = """
-        query Sites($name: String!) {
-            site_list(filters: {name: {i_regex: $name}}) {
-                status
-                comments
-                contacts {
-                    contact {
-                        name
-                        link
-                        phone
-                    }
-                }
-                locations {
-                    site {
-                        name
-                    }
-                    name
-                    facility    
-                    devices {
-                        name
-                        description
-                        rack {
-                            name
-                        }
-                    }
-                    tenant {
-                        name
-                    }    
-                }
-                status
-                facility
-                time_zone
-                physical_address
+        locations {
+            site {
+                name
+            }
+            name
+            facility    
+            devices {
+                name
                 description
-                region {
-                    name
-                }
-                group {
-                    name
-                }
-                tenant {
+                rack {
                     name
                 }
             }
+            tenant {
+                name
+            }    
         }
-        """
-        variables = {"name": f"{site_name}.*"}
-        result = self.execute_query(query, variables)
-        
-        return result
+        status
+        facility
+        time_zone
+        physical_address
+        description
+        region {
+            name
+        }
+        group {
+            name
+        }
+        tenant {
+            name
+        }
+    }
+}
+"""
+
+# Shallow variant of SITE_LIST_QUERY for summaries: related objects are only counted
+SITE_SUMMARY_QUERY = """
+query SiteSummaries($name: String!) {
+    site_list(filters: {name: {i_regex: $name}}) {
+        name
+        status
+        comments
+        facility
+        time_zone
+        physical_address
+        description
+        region {
+            name
+        }
+        group {
+            name
+        }
+        tenant {
+            name
+        }
+        locations {
+            id
+        }
+        racks {
+            id
+        }
+        devices {
+            id
+        }
+        contacts {
+            id
+        }
+    }
+}
+"""
+
+SITE_LOCATIONS_QUERY = """
+query SiteLocations($site: String!, $locationRegex: String, $offset: Int!, $limit: Int!) {
+    location_list(filters: {
+        site: {name: {exact: $site}}
+        name: {i_regex: $locationRegex}
+    }, pagination: {offset: $offset, limit: $limit}) {
+        name
+        facility
+        tenant {
+            name
+        }
+        devices {
+            id
+        }
+    }
+}
+"""
+
+SITE_DEVICES_QUERY = """
+query SiteDevices($site: String!, $locationRegex: String, $offset: Int!, $limit: Int!) {
+    device_list(filters: {
+        site: {name: {exact: $site}}
+        location: {name: {i_regex: $locationRegex}}
+    }, pagination: {offset: $offset, limit: $limit}) {
+        name
+        description
+        rack {
+            name
+        }
+        location {
+            name
+        }
+    }
+}
+"""
+
+SITE_RACKS_QUERY = """
+query SiteRacks($site: String!, $locationRegex: String, $offset: Int!, $limit: Int!) {
+    rack_list(filters: {
+        site: {name: {exact: $site}}
+        location: {name: {i_regex: $locationRegex}}
+    }, pagination: {offset: $offset, limit: $limit}) {
+        name
+        location {
+            name
+        }
+        devices {
+            name
+        }
+    }
+}
+"""
+
+SITE_CONTACTS_QUERY = """
+query SiteContacts($site: String!) {
+    site_list(filters: {name: {exact: $site}}) {
+        contacts {
+            contact {
+                name
+                link
+                phone
+            }
+        }
+    }
+}
+"""
+
+# Parts of a site that netbox_site_expand fetches on demand
+SITE_SECTIONS = ["locations", "devices", "racks", "contacts"]
+
+# Sections listed straight from NetBox, scoped to the site: list field, query and item shaping
+SITE_SECTION_LISTS = {
+    "locations": ("location_list", SITE_LOCATIONS_QUERY,
+                  lambda location: {**{key: value for key, value in location.items() if key != "devices"},
+                                    "device_count": len(location.get("devices") or [])}),
+    "devices": ("device_list", SITE_DEVICES_QUERY,
+                lambda device: {**device, "location": (device.get("location") or {}).get("name")}),
+    "racks": ("rack_list", SITE_RACKS_QUERY,
+              lambda rack: {"name": rack.get("name"), "location": (rack.get("location") or {}).get("name"),
+                            "devices": [device.get("name") for device in rack.get("devices") or []]}),
+}
+
+def site_devices(locations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{**device, "location": location.get("name")}
+            for location in locations for device in location.get("devices") or []]
+
+def summarize_site(site: Dict[str, Any]) -> Dict[str, Any]:
+    """A site without its related objects: their counts plus a handle to expand them later.
+
+    Accepts both a shallow SITE_SUMMARY_QUERY site and a full SITE_LIST_QUERY one (from the mirror).
+    """
+    locations = site.get("locations") or []
+    if "devices" in site:
+        devices, racks = site.get("devices") or [], site.get("racks") or []
+    else:
+        devices = site_devices(locations)
+        racks = {(device.get("rack") or {}).get("name") for device in devices} - {None}
+    summary = {key: value for key, value in site.items()
+               if key not in ("locations", "contacts", "devices", "racks")}
+    summary["counts"] = {
+        "locations": len(locations),
+        "devices": len(devices),
+        "racks": len(racks),
+        "contacts": len(site.get("contacts") or []),
+    }
+    # Expanding a section queries NetBox for just that part of the site; the handle only names it
+    summary["handle"] = store_result({"name": site.get("name")}, prefix="site-")
+    return summary
+
+async def get_site_details(client, site_name: str, query: str = SITE_LIST_QUERY) -> Dict[str, Any]:
+    variables = {"name": f"{site_name}.*"}
+    result = await client.execute_query(query, variables, cache_ttl=get_cache_ttl("netbox_sites"))
+    
+    return result
 
 async def netbox_sites(arguments: Dict[str, Any]) -> Dict[str, Any]:
-    netbox_url = os.getenv("NETBOX_URL")
-    netbox_token = os.getenv("NETBOX_TOKEN")
-    client = NetboxGraphQLClient(netbox_url, netbox_token)
+    client = get_netbox_client()
     
     site_name = arguments.get("site_name")
     
     if not site_name:
         return {"error": "'site_name' is a required parameter."}
     
+    # Summaries only need counts, so they are answered by the shallow query
+    query = SITE_LIST_QUERY if (arguments.get("detail") or "").lower() == "full" else SITE_SUMMARY_QUERY
+
     try:
-        result = client.get_site_details(site_name)
+        mirror = get_fresh_mirror("sites", arguments)
+        if mirror is not None:
+            sites, _ = await run_blocking(mirror.find, "sites", get_max_results(arguments), "iregexp(?, name)", (f"{site_name}.*",))
+            result = {"data": {"site_list": sites}}
+        elif name_index_enabled():
+            sites, _ = await fetch_matching(client, "sites", query, f"{site_name}.*", "i_regex",
+                                            get_max_results(arguments), get_cache_ttl("netbox_sites"))
+            result = {"data": {"site_list": sites}}
+        else:
+            result = await get_site_details(client, site_name, query)
         response = {}
         
         if 'errors' in result:
@@ -97,14 +236,51 @@ async def netbox_sites(arguments: Dict[str, Any]) -> Dict[str, Any]:
             site_data = result['data'].get('site_list')
             if not site_data:
                 response['error'] = f"No sites found matching the name: {site_name}."
-            else:
+            elif (arguments.get("detail") or "").lower() == "full":
                 response['data'] = {"sites": site_data}
+            else:
+                response['data'] = {"sites": [summarize_site(site) for site in site_data]}
         
         return response
     
     except Exception as e:
         return {"error": str(e)}
 
+async def netbox_site_expand(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    handle = arguments.get("handle")
+    section = arguments.get("section")
+    location_regex = arguments.get("location_regex")
+
+    if not handle:
+        return {"error": "'handle' is a required parameter."}
+    if section not in SITE_SECTIONS:
+        return {"error": f"Invalid section. Must be one of: {', '.join(SITE_SECTIONS)}."}
+
+    try:
+        site = load_result(handle)
+        if site is None:
+            return {"error": f"Unknown or expired handle: {handle}. Call netbox_sites again for a fresh handle."}
+        client = get_netbox_client()
+        cache_ttl = get_cache_ttl("netbox_sites")
+
+        if section == "contacts":
+            result = await client.execute_query(SITE_CONTACTS_QUERY, {"site": site["name"]}, cache_ttl=cache_ttl)
+            if "errors" in result:
+                return {"error": result["errors"][0]["message"]}
+            contacts = [contact.get("contact") for found in result["data"].get("site_list") or []
+                        for contact in found.get("contacts") or []]
+            items, pagination = collect_list(contacts, get_max_results(arguments))
+        else:
+            list_field, query, shape = SITE_SECTION_LISTS[section]
+            variables = {"site": site["name"], "locationRegex": location_regex or None}
+            items, pagination = await client.fetch_list(query, variables, list_field, get_max_results(arguments),
+                                                        cache_ttl=cache_ttl)
+            items = [shape(item) for item in items]
+        return {"data": {"site": site["name"], section: items}, "pagination": pagination}
+
+    except Exception as e:
+        return {"error": str(e)}
+
 # Example usage
 async def handle_assistant_request(assistant_request: Dict[str, Any]) -> Dict[str, Any]:
     result = await netbox_sites(assistant_request)
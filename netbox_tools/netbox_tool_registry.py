@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ConfigDict, ValidationError, create_model
+
+from netbox_tools.netbox_cache import get_cache_ttl
+from netbox_tools.netbox_executor import get_tool_timeout, run_blocking, CONCURRENCY_CLASSES
+from netbox_tools.netbox_compaction import compact_tool_output
+from netbox_tools.netbox_tracing import span
+from netbox_tools.netbox_sites import netbox_sites, netbox_site_expand
+from netbox_tools.netbox_device_details import netbox_device_details
+from netbox_tools.netbox_prefixes import netbox_prefixes
+from netbox_tools.netbox_child_prefixes import netbox_child_prefixes
+from netbox_tools.netbox_prefix_lookup import netbox_prefix_lookup
+from netbox_tools.netbox_ipaddresses import netbox_ipaddresses
+from netbox_tools.netbox_interfaces import netbox_interfaces
+from netbox_tools.netbox_search_roles import netbox_search_roles, netbox_get_all_roles
+from netbox_tools.netbox_export import netbox_export
+from netbox_tools.netbox_aggregate import netbox_aggregate
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "netbox_openai_function_schemas")
+
+_json_types = {"string": str, "integer": int, "number": float, "boolean": bool}
+
+
+class ToolSchemaError(Exception):
+    """A function schema file is missing or does not describe its tool."""
+
+
+class ToolArgumentsError(ValueError):
+    """A tool call's arguments do not match the tool's schema."""
+
+
+def _property_type(name: str, spec: Dict[str, Any]):
+    # An "enum" only checks the JSON type here: handlers normalise values (e.g. case) and report
+    # the ones they cannot use (e.g. ignored_fields) instead of failing the whole call
+    if spec.get("type") == "array":
+        return List[_property_type(name, spec.get("items") or {})]
+    if spec.get("type") not in _json_types:
+        raise ToolSchemaError(f"Unsupported type for '{name}': {spec.get('type')}")
+    return _json_types[spec["type"]]
+
+
+def build_arguments_model(schema: Dict[str, Any]) -> type:
+    """Pydantic model for a function schema's parameters; unknown arguments are rejected."""
+    parameters = schema.get("parameters") or {}
+    if parameters.get("type") != "object":
+        raise ToolSchemaError(f"{schema.get('name')}: parameters must be an object schema")
+    properties = parameters.get("properties") or {}
+    required = parameters.get("required") or []
+    missing = [name for name in required if name not in properties]
+    if missing:
+        raise ToolSchemaError(f"{schema.get('name')}: required parameters not in properties: {missing}")
+    fields = {}
+    for name, spec in properties.items():
+        annotation = _property_type(name, spec)
+        fields[name] = (annotation, ...) if name in required else (Optional[annotation], None)
+    return create_model(f"{schema['name']}_arguments", __config__=ConfigDict(extra="forbid"), **fields)
+
+
+def load_schema(tool_name: str, schema_dir: str = None) -> Dict[str, Any]:
+    path = os.path.join(schema_dir or SCHEMA_DIR, tool_name)
+    try:
+        with open(path) as f:
+            schema = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ToolSchemaError(f"Could not load the schema for {tool_name}: {e}")
+    if schema.get("name") != tool_name:
+        raise ToolSchemaError(f"{path} describes '{schema.get('name')}', not '{tool_name}'")
+    return schema
+
+
+class ToolSpec:
+    """A tool's handler with its schema, validated arguments model, cache policy, timeout and concurrency class."""
+
+    def __init__(self, name: str, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 schema: Dict[str, Any], concurrency: str = "netbox", aliases: Dict[str, str] = None):
+        if concurrency not in CONCURRENCY_CLASSES:
+            raise ValueError(f"Unknown concurrency class: {concurrency}")
+        self.name = name
+        self.handler = handler
+        self.schema = schema
+        self.concurrency = concurrency
+        # Old argument names still sent by assistants configured with an earlier schema
+        self.aliases = aliases or {}
+        self.arguments_model = build_arguments_model(schema)
+
+    @property
+    def cache_ttl(self) -> float:
+        return get_cache_ttl(self.name)
+
+    @property
+    def timeout(self) -> float:
+        return get_tool_timeout(self.name)
+
+    def parse_arguments(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate arguments against the schema; returns only the arguments that were given."""
+        if not isinstance(arguments, dict):
+            raise ToolArgumentsError(f"Invalid arguments for {self.name}: expected an object")
+        arguments = {self.aliases.get(key, key): value for key, value in arguments.items()}
+        try:
+            parsed = self.arguments_model.model_validate(arguments)
+        except ValidationError as e:
+            problems = "; ".join(f"{'.'.join(str(part) for part in error['loc']) or 'arguments'}: {error['msg']}"
+                                 for error in e.errors())
+            raise ToolArgumentsError(f"Invalid arguments for {self.name}: {problems}")
+        return parsed.model_dump(exclude_none=True)
+
+    async def __call__(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.handler(self.parse_arguments(arguments))
+
+
+class ToolRegistry:
+    def __init__(self, schema_dir: str = None):
+        self.schema_dir = schema_dir
+        self._tools: Dict[str, ToolSpec] = {}
+
+    def register(self, name: str, handler: Callable, concurrency: str = "netbox",
+                 aliases: Dict[str, str] = None) -> ToolSpec:
+        self._tools[name] = ToolSpec(name, handler, load_schema(name, self.schema_dir), concurrency, aliases)
+        return self._tools[name]
+
+    def get(self, name: str) -> ToolSpec:
+        try:
+            return self._tools[name]
+        except KeyError:
+            raise ValueError(f"Unknown tool: {name}")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __iter__(self):
+        return iter(self._tools.values())
+
+    def schemas(self) -> List[Dict[str, Any]]:
+        return [spec.schema for spec in self._tools.values()]
+
+
+def build_tool_registry(schema_dir: str = None) -> ToolRegistry:
+    registry = ToolRegistry(schema_dir)
+    registry.register("netbox_sites", netbox_sites)
+    registry.register("netbox_site_expand", netbox_site_expand)
+    registry.register("netbox_device_details", netbox_device_details,
+                      aliases={"device_name_regex": "device_name_contains"})
+    registry.register("netbox_prefixes", netbox_prefixes)
+    registry.register("netbox_child_prefixes", netbox_child_prefixes)
+    registry.register("netbox_prefix_lookup", netbox_prefix_lookup, concurrency="index")
+    registry.register("netbox_ipaddresses", netbox_ipaddresses)
+    registry.register("netbox_interfaces", netbox_interfaces)
+    registry.register("netbox_search_roles", netbox_search_roles)
+    registry.register("netbox_get_all_roles", lambda arguments: netbox_get_all_roles())
+    registry.register("netbox_export", netbox_export)
+    registry.register("netbox_aggregate", netbox_aggregate)
+    return registry
+
+
+# Schemas are loaded and validated once, at import
+TOOL_REGISTRY = build_tool_registry()
+
+
+def get_tool(name: str) -> ToolSpec:
+    return TOOL_REGISTRY.get(name)
+
+
+def tool_concurrency_class(tool_call) -> Optional[str]:
+    """run_tool_calls classifier: the registered tool's concurrency class."""
+    name = tool_call.function.name
+    return TOOL_REGISTRY.get(name).concurrency if name in TOOL_REGISTRY else None
+
+
+async def execute_tool_call(tool_call) -> Tuple[Dict[str, str], bool]:
+    """Run one Assistant tool call; returns its tool output and whether it succeeded.
+
+    Arguments are validated before any NetBox request, and the result is compacted
+    to the tool's token budget off the event loop.
+    """
+    tool_name = tool_call.function.name
+    try:
+        tool = get_tool(tool_name)
+        arguments = tool.parse_arguments(json.loads(tool_call.function.arguments or "{}"))
+        with span("tool.call", tool=tool_name) as tool_span:
+            with span("tool.dispatch"):
+                result = await asyncio.wait_for(tool.handler(arguments), timeout=tool.timeout)
+            with span("tool.compact"):
+                output = await run_blocking(compact_tool_output, tool_name, result)
+            if tool_span is not None:
+                tool_span.set(output_chars=len(output))
+        return {"tool_call_id": tool_call.id, "output": output}, True
+    except asyncio.TimeoutError:
+        timeout = get_tool(tool_name).timeout
+        logger.error(f"Tool {tool_name} timed out after {timeout}s")
+        return {"tool_call_id": tool_call.id, "output": f"Error: {tool_name} timed out after {timeout} seconds"}, False
+    except Exception as e:
+        logger.error(f"Error executing tool {tool_name}: {str(e)}")
+        return {"tool_call_id": tool_call.id, "output": f"Error: {str(e)}"}, False
@@ -0,0 +1,154 @@
+import contextvars
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any],
+                 start_ns: int = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """OpenTelemetry-style span record."""
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """The spans of one chat turn. Spans may be added from any thread or task."""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = secrets.token_hex(16)
+        self._lock = threading.Lock()
+        self.spans: List[Span] = []
+        self.root = self.add(name, None, attributes)
+
+    def add(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any], start_ns: int = None) -> Span:
+        span = Span(self, name, parent_id, attributes, start_ns)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def waterfall(self) -> List[Dict[str, Any]]:
+        """Finished spans as rows of name, depth, start offset and duration (ms), in start order."""
+        with self._lock:
+            spans = [span for span in self.spans if span.end_ns is not None]
+        depths = {self.root.span_id: 0}
+        rows = []
+        for span in sorted(spans, key=lambda span: span.start_ns):
+            depth = depths.get(span.parent_id, -1) + 1 if span is not self.root else 0
+            depths[span.span_id] = depth
+            rows.append({
+                "name": span.name,
+                "depth": depth,
+                "start_ms": (span.start_ns - self.root.start_ns) / 1e6,
+                "duration_ms": (span.end_ns - span.start_ns) / 1e6,
+                "attributes": span.attributes,
+            })
+        return rows
+
+
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[Trace]:
+    """Trace a chat turn; spans opened inside it (including in tasks it starts) become its children."""
+    trace = Trace(name, attributes)
+    token = current_span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        current_span.reset(token)
+        trace.root.end_ns = time.time_ns()
+        export_trace(trace)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Time a block as a child of the current span; a no-op outside a trace."""
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.trace.add(name, parent.span_id, attributes)
+    token = current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.set(error=type(e).__name__)
+        raise
+    finally:
+        current_span.reset(token)
+        child.end_ns = time.time_ns()
+
+
+def record_span(name: str, start_ns: int, end_ns: int, parent: Optional[Span] = None,
+                **attributes) -> Optional[Span]:
+    """Add an already-timed span (e.g. measured on the NetBox client's loop) under parent or the current span."""
+    parent = parent or current_span.get()
+    if parent is None:
+        return None
+    child = parent.trace.add(name, parent.span_id, attributes, start_ns)
+    child.end_ns = end_ns
+    return child
+
+
+def _export_json_lines(trace: Trace, path: str):
+    with open(path, "a") as f:
+        for item in trace.spans:
+            f.write(json.dumps(item.to_dict(), default=str) + "\n")
+
+
+def _export_opentelemetry(trace: Trace):
+    # Optional dependency: only used when the OpenTelemetry API is installed
+    from opentelemetry import trace as otel_trace
+
+    tracer = otel_trace.get_tracer("netbox_ai_assistant")
+    exported = {}
+    for item in sorted(trace.spans, key=lambda item: item.start_ns):
+        parent = exported.get(item.parent_id)
+        context = otel_trace.set_span_in_context(parent) if parent is not None else None
+        attributes = {key: value if isinstance(value, (str, bool, int, float)) else str(value)
+                      for key, value in item.attributes.items()}
+        exported[item.span_id] = tracer.start_span(item.name, context=context, attributes=attributes,
+                                                   start_time=item.start_ns)
+    for item in trace.spans:
+        exported[item.span_id].end(end_time=item.end_ns or item.start_ns)
+
+
+def export_trace(trace: Trace):
+    """Write the trace to NETBOX_TRACE_FILE (JSON lines) and/or OpenTelemetry (NETBOX_TRACE_OTEL)."""
+    path = os.getenv("NETBOX_TRACE_FILE")
+    try:
+        if path:
+            _export_json_lines(trace, path)
+        if (os.getenv("NETBOX_TRACE_OTEL") or "").lower() in ("1", "true", "yes"):
+            _export_opentelemetry(trace)
+    except Exception as e:
+        logger.warning(f"Could not export trace {trace.trace_id}: {e}")
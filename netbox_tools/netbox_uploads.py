@@ -0,0 +1,184 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPLOAD_CONCURRENCY = 4
+# Files attached to the vector store per file batch
+DEFAULT_UPLOAD_BATCH_SIZE = 100
+# How long a finished job stays available for its status display
+DEFAULT_UPLOAD_JOB_TTL = 3600.0
+
+
+def get_vector_stores(client):
+    # vector_stores moved out of client.beta in newer openai releases
+    return getattr(client, "vector_stores", None) or client.beta.vector_stores
+
+
+class UploadManifest:
+    """sha256 -> file id of the documents already in each vector store, so unchanged files are skipped.
+
+    Kept in memory, and in NETBOX_UPLOAD_MANIFEST (JSON) when set so it survives restarts.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stores: Dict[str, Dict[str, str]] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._stores = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable upload manifest {path}: {e}")
+
+    def get(self, vector_store_id: str, digest: str) -> Optional[str]:
+        with self._lock:
+            return self._stores.get(vector_store_id, {}).get(digest)
+
+    def add(self, vector_store_id: str, uploaded: Dict[str, str]):
+        with self._lock:
+            self._stores.setdefault(vector_store_id, {}).update(uploaded)
+            if self.path:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(self._stores, f)
+                os.replace(tmp_path, self.path)
+
+
+class UploadJob:
+    """Progress of one background upload; read from the UI thread while the worker updates it."""
+
+    def __init__(self, vector_store_id: str, names: List[str]):
+        self.id = uuid.uuid4().hex
+        self.vector_store_id = vector_store_id
+        self.names = names
+        self.status = "running"
+        self.uploaded: List[str] = []
+        self.skipped: List[str] = []
+        self.failed: Dict[str, str] = {}
+        self.indexed = 0
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.status != "running"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = len(self.uploaded) + len(self.skipped) + len(self.failed)
+            return {
+                "status": self.status,
+                "total": len(self.names),
+                "uploaded": len(self.uploaded),
+                "skipped": len(self.skipped),
+                "failed": dict(self.failed),
+                "indexed": self.indexed,
+                "progress": finished / len(self.names) if self.names else 1.0,
+                "error": self.error,
+                "seconds": (self.finished_at or time.time()) - self.started_at,
+            }
+
+
+def run_upload(client, job: UploadJob, files: List[Tuple[str, bytes]], manifest: UploadManifest):
+    """Upload files straight from memory, concurrently, then attach them to the vector store in batches."""
+    concurrency = int(os.getenv("NETBOX_UPLOAD_CONCURRENCY") or DEFAULT_UPLOAD_CONCURRENCY)
+    batch_size = int(os.getenv("NETBOX_UPLOAD_BATCH_SIZE") or DEFAULT_UPLOAD_BATCH_SIZE)
+    try:
+        pending: Dict[str, Tuple[str, bytes]] = {}
+        for name, data in files:
+            digest = hashlib.sha256(data).hexdigest()
+            if digest in pending or manifest.get(job.vector_store_id, digest):
+                with job._lock:
+                    job.skipped.append(name)
+            else:
+                pending[digest] = (name, data)
+
+        file_ids: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="vector-store-upload") as pool:
+            futures = {pool.submit(client.files.create, file=(name, data), purpose="assistants"): (digest, name)
+                       for digest, (name, data) in pending.items()}
+            for future in as_completed(futures):
+                digest, name = futures[future]
+                try:
+                    file_ids[digest] = future.result().id
+                    with job._lock:
+                        job.uploaded.append(name)
+                except Exception as e:
+                    logger.error(f"Upload of {name} failed: {e}")
+                    with job._lock:
+                        job.failed[name] = str(e)
+
+        vector_stores = get_vector_stores(client)
+        digests = list(file_ids)
+        for i in range(0, len(digests), batch_size):
+            chunk = digests[i:i + batch_size]
+            batch = vector_stores.file_batches.create_and_poll(
+                vector_store_id=job.vector_store_id,
+                file_ids=[file_ids[digest] for digest in chunk],
+            )
+            completed = getattr(getattr(batch, "file_counts", None), "completed", len(chunk))
+            with job._lock:
+                job.indexed += completed
+            if batch.status == "completed":
+                manifest.add(job.vector_store_id, {digest: file_ids[digest] for digest in chunk})
+            else:
+                with job._lock:
+                    job.error = f"File batch {batch.id} ended with status {batch.status}"
+        job.status = "failed" if job.failed or job.error else "completed"
+    except Exception as e:
+        logger.error(f"Upload job {job.id} failed: {e}")
+        job.error = str(e)
+        job.status = "failed"
+    finally:
+        job.finished_at = time.time()
+
+
+_jobs: Dict[str, UploadJob] = {}
+_jobs_lock = threading.Lock()
+_manifest = None
+
+
+def get_upload_manifest() -> UploadManifest:
+    global _manifest
+    with _jobs_lock:
+        if _manifest is None:
+            _manifest = UploadManifest(os.getenv("NETBOX_UPLOAD_MANIFEST"))
+        return _manifest
+
+
+def prune_upload_jobs(now: float = None):
+    """Forget jobs that finished more than NETBOX_UPLOAD_JOB_TTL seconds ago; running jobs are kept."""
+    ttl = float(os.getenv("NETBOX_UPLOAD_JOB_TTL") or DEFAULT_UPLOAD_JOB_TTL)
+    cutoff = (now or time.time()) - ttl
+    with _jobs_lock:
+        for job_id in [job_id for job_id, job in _jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]:
+            del _jobs[job_id]
+
+
+def start_upload(client, vector_store_id: str, files: List[Tuple[str, bytes]]) -> UploadJob:
+    """Start uploading (name, content) pairs in a background thread; returns the job to poll for progress."""
+    prune_upload_jobs()
+    job = UploadJob(vector_store_id, [name for name, _ in files])
+    with _jobs_lock:
+        _jobs[job.id] = job
+    thread = threading.Thread(target=run_upload, args=(client, job, files, get_upload_manifest()),
+                              name=f"upload-{job.id[:8]}", daemon=True)
+    thread.start()
+    return job
+
+
+def get_upload_job(job_id: str) -> Optional[UploadJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
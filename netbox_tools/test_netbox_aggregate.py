@@ -0,0 +1,51 @@
+import asyncio
+
+from netbox_tools import netbox_aggregate
+
+
+class FakeNetboxClient:
+    def __init__(self, items):
+        self.items = items
+
+    async def paginate(self, query, variables, list_field, page_size=None, **kwargs):
+        for item in self.items:
+            yield item
+
+
+def device(i):
+    return {"id": i, "name": f"dev{i}", "site": {"name": f"site{i % 2}"},
+            "role": {"name": "core"} if i % 3 == 0 else ({"name": "edge"} if i % 3 == 1 else None),
+            "device_type": {"model": f"model{i % 4}", "manufacturer": {"name": "Acme"}}}
+
+
+def run(arguments, monkeypatch, items):
+    monkeypatch.setenv("NETBOX_EXPORT_PAGE_SIZE", "5")
+    monkeypatch.setattr(netbox_aggregate, "get_netbox_client", lambda: FakeNetboxClient(items))
+    return asyncio.run(netbox_aggregate.netbox_aggregate(arguments))
+
+
+def test_counts_are_merged_across_pages(monkeypatch):
+    items = [device(i) for i in range(23)]
+    result = run({"kind": "devices", "group_by": ["site", "role"]}, monkeypatch, items)
+    aggregate = result["data"]["aggregate"]
+    assert aggregate["total_rows"] == 23 and aggregate["groups"] == 6
+    rows = {(row["site"], row["role"]): row["count"] for row in aggregate["rows"]}
+    expected = {}
+    for item in items:
+        key = (item["site"]["name"], (item["role"] or {}).get("name", "(none)"))
+        expected[key] = expected.get(key, 0) + 1
+    assert rows == expected
+    assert [row["count"] for row in aggregate["rows"]] == sorted(expected.values(), reverse=True)
+
+    top = run({"kind": "devices", "group_by": ["site", "role"], "top": 2}, monkeypatch, items)["data"]["aggregate"]
+    assert len(top["rows"]) == 2 and top["truncated"]
+
+
+def test_count_distinct_and_argument_errors(monkeypatch):
+    items = [device(i) for i in range(23)]
+    result = run({"kind": "devices", "group_by": ["site"], "count_distinct": "device_type"}, monkeypatch, items)
+    assert result["data"]["aggregate"]["rows"] == [{"site": "site0", "distinct_device_type": 2},
+                                                   {"site": "site1", "distinct_device_type": 2}]
+
+    assert "Unknown field" in run({"kind": "devices", "group_by": ["vrf"]}, monkeypatch, items)["error"]
+    assert "group_by" in run({"kind": "devices", "group_by": []}, monkeypatch, items)["error"]
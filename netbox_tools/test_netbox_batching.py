@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+from netbox_tools.netbox_batching import merge_queries, split_result, QueryBatcher, current_batcher
+from netbox_tools.netbox_client import NetboxGraphQLClient
+from netbox_tools.netbox_ipaddresses import IP_ADDRESS_LIST_QUERY
+from netbox_tools.netbox_search_roles import search_roles
+from netbox_tools.netbox_tracing import start_trace, span
+
+
+def test_merge_queries_prefixes_aliases_and_variables():
+    merged, variables, alias_maps = merge_queries([
+        (IP_ADDRESS_LIST_QUERY, {"ipaddressRegex": "^10.", "offset": 0, "limit": 10}),
+        (IP_ADDRESS_LIST_QUERY, {"ipaddressRegex": "^192.", "offset": 0, "limit": 10}),
+        ("query RolesListAll {\n  device_role_list {\n    display\n  }\n}", {}),
+    ])
+    assert "q0_ip_address_list: ip_address_list(" in merged
+    assert "q1_ip_address_list: ip_address_list(" in merged
+    assert "q2_device_role_list: device_role_list" in merged
+    assert "$q1_ipaddressRegex: String" in merged
+    assert merged.count("fragment IPAddressFields") == 1
+    assert variables["q0_ipaddressRegex"] == "^10." and variables["q1_ipaddressRegex"] == "^192."
+    assert alias_maps[2] == {"q2_device_role_list": "device_role_list"}
+
+
+def test_split_result_routes_data_and_errors():
+    alias_maps = [{"q0_site_list": "site_list"}, {"q1_device_list": "device_list"}]
+    result = {
+        "data": {"q0_site_list": [{"name": "Mel"}], "q1_device_list": None},
+        "errors": [{"message": "bad regex", "path": ["q1_device_list"]}],
+    }
+    sites, devices = split_result(result, alias_maps)
+    assert sites == {"data": {"site_list": [{"name": "Mel"}]}}
+    assert devices["errors"] == [{"message": "bad regex", "path": ["device_list"]}]
+
+
+def test_split_result_gives_path_less_errors_to_every_part():
+    alias_maps = [{"q0_site_list": "site_list"}, {"q1_device_list": "device_list"}]
+    result = {
+        "data": {"q0_site_list": [], "q1_device_list": []},
+        "errors": [{"message": "Query complexity limit exceeded"},
+                   {"message": "bad regex", "path": ["q1_device_list"]}],
+    }
+    sites, devices = split_result(result, alias_maps)
+    assert sites["errors"] == [{"message": "Query complexity limit exceeded"}]
+    assert devices["errors"] == [{"message": "Query complexity limit exceeded"},
+                                 {"message": "bad regex", "path": ["device_list"]}]
+
+
+class RecordingClient(NetboxGraphQLClient):
+    def __init__(self):
+        super().__init__("http://netbox.invalid/graphql/", "token")
+        self.sent = []
+
+    async def send_query(self, query, variables=None):
+        self.sent.append(query)
+        data = {}
+        for name in variables:
+            if name.endswith("nameContains"):
+                prefix = name[:-len("nameContains")]
+                data[f"{prefix}device_role_list"] = [{"display": variables[name]}]
+        return {"data": data}
+
+    async def post_query(self, query, variables=None):
+        return await self.send_query(query, variables), [("netbox.request", 0, 1, {})]
+
+
+def test_batcher_sends_one_request_per_window():
+    client = RecordingClient()
+
+    async def turn():
+        current_batcher.set(QueryBatcher(window=0.01))
+        return await asyncio.gather(
+            search_roles(client, "WAN"), search_roles(client, "Core"), search_roles(client, "WAN")
+        )
+
+    wan, core, wan_again = asyncio.run(turn())
+    assert len(client.sent) == 1
+    assert wan["data"]["device_role_list"] == [{"display": "WAN"}]
+    assert core["data"]["device_role_list"] == [{"display": "Core"}]
+    assert wan_again == wan
+
+
+def test_background_work_does_not_inherit_the_turn_batcher():
+    client = RecordingClient()
+    batcher = QueryBatcher(window=0.01)
+
+    async def background():
+        return current_batcher.get(), await search_roles(client, "WAN")
+
+    async def turn():
+        current_batcher.set(batcher)
+        return await asyncio.wrap_future(client.submit(background()))
+
+    try:
+        seen, result = asyncio.run(turn())
+    finally:
+        client.close()
+    assert seen is None and result["data"]["device_role_list"] == [{"display": "WAN"}]
+    assert batcher.requests_sent == 0 and batcher._loop is None
+
+
+def test_batcher_sends_directly_from_a_foreign_loop():
+    client = RecordingClient()
+    batcher = QueryBatcher(window=0.01)
+
+    async def turn():
+        return await batcher.submit(client, "query A { device_role_list { display } }", {})
+
+    asyncio.run(turn())
+    # A second loop (e.g. another thread's asyncio.run) bypasses the first loop's pending batch
+    asyncio.run(turn())
+    assert len(client.sent) == 2 and not batcher._pending
+
+
+class TimedRoleServer(NetboxGraphQLClient):
+    def __init__(self):
+        super().__init__("http://netbox.invalid/graphql/", "token")
+
+    async def _post(self, payload, timings=None):
+        now = time.time_ns()
+        timings.append(("netbox.network", now, now + 1000, {"bytes": 10}))
+        variables = payload["variables"]
+        return {"data": {f"{name[:-len('nameContains')]}device_role_list": [] for name in variables}}
+
+
+def test_a_shared_request_is_traced_under_every_waiting_tool():
+    client = TimedRoleServer()
+
+    async def tool(name):
+        with span("tool.call", tool=name):
+            return await search_roles(client, name)
+
+    async def turn():
+        current_batcher.set(QueryBatcher(window=0.01))
+        await asyncio.gather(tool("Edge"), tool("Spine"))
+
+    with start_trace("chat.turn") as trace:
+        asyncio.run(turn())
+    client.close()
+
+    by_id = {item.span_id: item for item in trace.spans}
+    requests = [item for item in trace.spans if item.name == "netbox.request"]
+    assert sorted(by_id[item.parent_id].attributes["tool"] for item in requests) == ["Edge", "Spine"]
+    assert all(item.attributes["batched"] == 2 for item in requests)
+    networks = [item for item in trace.spans if item.name == "netbox.network"]
+    assert sorted(by_id[item.parent_id].span_id for item in networks) == sorted(item.span_id for item in requests)
@@ -0,0 +1,66 @@
+import time
+
+from netbox_tools import netbox_cache
+from netbox_tools.netbox_cache import QueryCache, DiskCacheBackend, make_cache_key
+
+
+def test_cache_key_ignores_query_formatting():
+    compact = "query Sites($name: String!) { site_list(filters: {name: {i_regex: $name}}) { name } }"
+    spaced = """
+    query Sites($name: String!) {
+        site_list(filters: {name: {i_regex: $name}}) {
+            name
+        }
+    }
+    """
+    assert make_cache_key(compact, {"name": "Mel"}, "token") == make_cache_key(spaced, {"name": "Mel"}, "token")
+    assert make_cache_key(compact, {"name": "Mel"}, "token") != make_cache_key(compact, {"name": "Syd"}, "token")
+    assert make_cache_key(compact, {"name": "Mel"}, "token") != make_cache_key(compact, {"name": "Mel"}, "other")
+
+
+def test_cache_hit_miss_and_ttl():
+    cache = QueryCache(max_bytes=1024)
+    assert cache.get("a") is None
+    cache.set("a", {"data": {"x": 1}}, ttl=60)
+    assert cache.get("a") == {"data": {"x": 1}}
+    cache.set("b", {"data": {}}, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_cache_evicts_least_recently_used_by_bytes():
+    cache = QueryCache(max_bytes=60)
+    cache.set("a", {"data": "a" * 10}, ttl=60)
+    cache.set("b", {"data": "b" * 10}, ttl=60)
+    cache.get("a")
+    cache.set("c", {"data": "c" * 10}, ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_backend_survives_new_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    QueryCache(disk=DiskCacheBackend(path)).set("a", {"data": [1, 2]}, ttl=60)
+    assert QueryCache(disk=DiskCacheBackend(path)).get("a") == {"data": [1, 2]}
+
+
+def test_disk_backend_is_bounded_and_purged_on_set(tmp_path, monkeypatch):
+    disk = DiskCacheBackend(str(tmp_path / "cache.sqlite3"), max_bytes=100, grace=0)
+    now = time.time()
+    for i in range(4):
+        disk.set(f"k{i}", now + 60 + i, "x" * 40)
+    # Over the byte cap the rows closest to expiry go first
+    assert [disk.get(f"k{i}") is not None for i in range(4)] == [False, False, True, True]
+    assert disk.evictions == 2
+    disk.set("huge", now + 60, "x" * 101)
+    assert disk.get("huge") is None
+
+    disk.set("old", now - 1, "x")
+    monkeypatch.setattr(netbox_cache, "DISK_PURGE_INTERVAL", 0)
+    disk.set("k4", now + 60, "x")
+    assert disk.get("old") is None and disk.get("k3") is not None
@@ -0,0 +1,174 @@
+import asyncio
+import json
+from types import SimpleNamespace as NS
+
+import openai
+from aiohttp.test_utils import TestClient, TestServer
+
+from netbox_tools.netbox_chat_service import ChatService, LocalChatService, create_app
+
+
+class FakeRuns:
+    def __init__(self):
+        self.polls = []
+        self.submitted = []
+
+    async def create(self, thread_id, assistant_id, model):
+        return NS(id="run_1", status="queued")
+
+    async def retrieve(self, thread_id, run_id):
+        self.polls.append(run_id)
+        if not self.submitted:
+            # An invalid tool call: rejected by the registry without any NetBox request
+            call = NS(id="call_1", function=NS(name="netbox_sites", arguments=json.dumps({"site": "mel"})))
+            return NS(id=run_id, status="requires_action",
+                      required_action=NS(submit_tool_outputs=NS(tool_calls=[call])))
+        return NS(id=run_id, status="completed")
+
+    async def submit_tool_outputs(self, thread_id, run_id, tool_outputs):
+        self.submitted.extend(tool_outputs)
+        return NS(id=run_id, status="queued")
+
+
+class FakeMessages:
+    async def create(self, thread_id, role, content):
+        return NS(id="msg_user")
+
+    async def list(self, thread_id, run_id, order, limit, after):
+        assert (run_id, after) == ("run_1", "msg_user")
+        return NS(data=[NS(role="assistant", content=[NS(text=NS(value="No such site."))])])
+
+
+class FakeOpenAI:
+    def __init__(self):
+        self.runs = FakeRuns()
+
+        async def create_thread():
+            return NS(id="thread_1")
+
+        self.beta = NS(threads=NS(create=create_thread, runs=self.runs, messages=FakeMessages()))
+
+
+def test_chat_turn_over_sse():
+    openai_client = FakeOpenAI()
+    service = ChatService(client=openai_client, assistant_id="asst", model="gpt")
+    service.streaming = False
+
+    async def scenario():
+        async with TestClient(TestServer(create_app(service))) as http:
+            thread_id = (await (await http.post("/threads")).json())["thread_id"]
+            response = await http.post(f"/threads/{thread_id}/messages", json={"content": "where is mel?"})
+            assert response.headers["Content-Type"] == "text/event-stream"
+            body = await response.text()
+            bad = await http.post(f"/threads/{thread_id}/messages", json={})
+            return body, bad.status
+
+    body, bad_status = asyncio.run(scenario())
+    events = [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+    assert [event["type"] for event in events if event["type"] != "status"] == ["tool_result", "done"]
+    assert events[-1]["contents"] == ["No such site."]
+    assert events[-1]["trace"][0]["name"] == "chat.turn"
+    assert openai_client.runs.submitted[0]["output"].startswith("Error: Invalid arguments for netbox_sites")
+    assert bad_status == 400
+    assert service.active_turns == 0 and not service._thread_locks
+
+
+def test_local_chat_service_yields_the_same_events_synchronously():
+    local = LocalChatService(client=FakeOpenAI(), assistant_id="asst", model="gpt")
+    local.service.streaming = False
+    try:
+        thread_id = local.create_thread()
+        events = list(local.chat(thread_id, "where is mel?"))
+    finally:
+        local.close()
+    assert [event["type"] for event in events if event["type"] != "status"] == ["tool_result", "done"]
+    assert events[-1]["contents"] == ["No such site."]
+
+
+class ScriptedRuns:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+
+    async def retrieve(self, thread_id, run_id):
+        return NS(id=run_id, status=self.statuses.pop(0))
+
+
+def test_polling_backs_off_while_unchanged_and_resets_on_a_new_status(monkeypatch):
+    openai_client = FakeOpenAI()
+    openai_client.beta.threads.runs = ScriptedRuns(
+        ["queued", "queued", "queued", "in_progress", "in_progress", "cancelled"])
+    service = ChatService(client=openai_client, assistant_id="asst", model="gpt")
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def record_sleep(seconds):
+        sleeps.append(seconds)
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", record_sleep)
+    events = []
+    run = asyncio.run(service._poll("thread_1", "run_1", events.append))
+    assert run.status == "cancelled"
+    assert sleeps == [0.25, 0.5, 1.0, 0.25, 0.5]
+    assert [event["status"] for event in events] == ["queued", "in_progress", "cancelled"]
+
+
+class FakeStream:
+    def __init__(self, events):
+        self.events = events
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for event in self.events:
+            yield event
+
+
+def text_delta(message_id, text):
+    return NS(event="thread.message.delta",
+              data=NS(id=message_id, delta=NS(content=[NS(type="text", text=NS(value=text))])))
+
+
+def test_streamed_turn_emits_deltas_and_stops_at_the_run_status():
+    openai_client = FakeOpenAI()
+    openai_client.beta.threads.runs.stream = lambda thread_id, assistant_id, model: FakeStream([
+        NS(event="thread.run.created", data=NS(id="run_1", status="queued")),
+        text_delta("msg_1", "Mel "), text_delta("msg_1", "is DC1."),
+        NS(event="thread.run.completed", data=NS(id="run_1", status="completed")),
+    ])
+    service = ChatService(client=openai_client, assistant_id="asst", model="gpt")
+
+    async def turn():
+        return [event async for event in service.chat("thread_1", "where is mel?")]
+
+    events = asyncio.run(turn())
+    assert [event["text"] for event in events if event["type"] == "delta"] == ["Mel ", "is DC1."]
+    assert events[-1]["type"] == "done" and events[-1]["contents"] == ["Mel is DC1."]
+    assert openai_client.runs.polls == []
+
+
+def test_rejected_streaming_falls_back_to_polling():
+    openai_client = FakeOpenAI()
+    # Built without an HTTP response: only the exception type matters to the fallback
+    rejection = openai.BadRequestError.__new__(openai.BadRequestError)
+    Exception.__init__(rejection, "stream not supported")
+
+    def reject(thread_id, assistant_id, model):
+        raise rejection
+
+    openai_client.beta.threads.runs.stream = reject
+    service = ChatService(client=openai_client, assistant_id="asst", model="gpt")
+
+    async def turn():
+        return [event async for event in service.chat("thread_1", "where is mel?")]
+
+    events = asyncio.run(turn())
+    assert events[-1]["contents"] == ["No such site."]
+    assert not service.streaming and openai_client.runs.polls
@@ -0,0 +1,44 @@
+import asyncio
+
+from netbox_tools.netbox_client import NetboxGraphQLClient, NetboxQueryError
+
+
+class FakePagedClient(NetboxGraphQLClient):
+    def __init__(self, rows, errors=None):
+        super().__init__("http://netbox.invalid/graphql/", "token")
+        self.rows = rows
+        self.errors = errors
+        self.requests = []
+
+    async def execute_query(self, query, variables=None, cache_ttl=None):
+        self.requests.append(dict(variables))
+        if self.errors:
+            return {"errors": [{"message": self.errors}]}
+        offset, limit = variables["offset"], variables["limit"]
+        return {"data": {"device_list": self.rows[offset:offset + limit]}}
+
+
+def test_fetch_list_reports_truncation():
+    client = FakePagedClient([{"id": i} for i in range(25)])
+    items, meta = asyncio.run(client.fetch_list("query", {}, "device_list", max_items=10, page_size=4))
+    assert [item["id"] for item in items] == list(range(10))
+    assert meta == {"returned": 10, "truncated": True, "total": None}
+    # Stops after the page that proves truncation instead of walking the whole list
+    assert client.requests[-1]["offset"] + client.requests[-1]["limit"] == 11
+
+
+def test_fetch_list_reports_total_when_exhausted():
+    client = FakePagedClient([{"id": i} for i in range(7)])
+    items, meta = asyncio.run(client.fetch_list("query", {}, "device_list", max_items=10, page_size=5))
+    assert len(items) == 7
+    assert meta == {"returned": 7, "truncated": False, "total": 7}
+
+
+def test_paginate_raises_graphql_errors():
+    client = FakePagedClient([], errors="bad filter")
+    try:
+        asyncio.run(client.fetch_list("query", {}, "device_list", max_items=10))
+    except NetboxQueryError as e:
+        assert str(e) == "bad filter"
+    else:
+        raise AssertionError("expected NetboxQueryError")
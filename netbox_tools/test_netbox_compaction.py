@@ -0,0 +1,50 @@
+import json
+
+from netbox_tools.netbox_compaction import (
+    strip_empty, dedupe_repeated, to_table, enforce_budget, estimate_tokens, compact_tool_output
+)
+
+
+def test_strip_empty_drops_nulls_and_empties():
+    value = {"a": None, "b": [], "c": {}, "d": "", "e": [{"x": None}], "f": 0, "g": False, "h": "ok"}
+    assert strip_empty(value) == {"f": 0, "g": False, "h": "ok"}
+
+
+def test_dedupe_replaces_repeated_sub_objects():
+    site = {"name": "Melbourne", "region": {"name": "Victoria"}, "tenant": {"name": "Operations"}}
+    value = {"devices": [{"name": "r1", "site": site}, {"name": "r2", "site": site}]}
+    compacted = dedupe_repeated(value)
+    assert compacted["devices"][0]["site"] == {"$ref": "#1"}
+    assert compacted["devices"][1]["site"] == {"$ref": "#1"}
+    assert compacted["_shared"] == {"#1": site}
+
+
+def test_to_table_flattens_nested_objects():
+    rows = [{"name": "r1", "role": {"name": "core"}}, {"name": "r2", "role": {"name": "edge"}, "mtu": 9000}]
+    assert to_table(rows) == {
+        "columns": ["name", "role.name", "mtu"],
+        "rows": [["r1", "core", None], ["r2", "edge", 9000]],
+    }
+
+
+def test_enforce_budget_truncates_with_marker():
+    value = {"interfaces": [{"name": f"Ethernet1/{i}", "mtu": 9000} for i in range(500)]}
+    text = enforce_budget(value, max_tokens=500)
+    assert estimate_tokens(text) <= 500
+    interfaces = json.loads(text)["interfaces"]
+    assert interfaces[-1].startswith("[truncated:")
+    assert int(interfaces[-1].split()[1]) == 500 - (len(interfaces) - 1)
+
+
+def test_enforce_budget_terminates_on_oversized_items(monkeypatch):
+    # Halving stops at one real item plus the marker; the text cut takes over from there
+    monkeypatch.setenv("NETBOX_TOOL_OUTPUT_TOKENS", "500")
+    result = {"data": {"devices": [{"name": f"r{i}", "description": "x" * 5000} for i in range(3)]}}
+    text = compact_tool_output("netbox_device_details", result)
+    assert text.startswith('{"data":{"devices":[{"name":"r0"')
+    assert text.endswith("characters to fit the tool output budget]")
+
+
+def test_compact_tool_output_is_json():
+    result = {"data": {"devices": [{"name": "r1", "rack": None}]}}
+    assert json.loads(compact_tool_output("netbox_device_details", result)) == {"data": {"devices": [{"name": "r1"}]}}
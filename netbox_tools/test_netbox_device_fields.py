@@ -0,0 +1,52 @@
+import asyncio
+
+from netbox_tools import netbox_device_details
+from netbox_tools.netbox_client import collect_list
+from netbox_tools.netbox_device_details import DETAIL_LEVELS, build_device_query, resolve_device_fields
+
+
+class FakeNetboxClient:
+    def __init__(self, devices):
+        self.devices = devices
+        self.queries = []
+
+    async def fetch_list(self, query, variables, list_field, max_items, **kwargs):
+        self.queries.append((query, variables, kwargs))
+        return collect_list(self.devices, max_items)
+
+
+def test_query_selects_only_the_requested_fields():
+    query, variables = build_device_query("core", ["role"])
+    assert "filters: {name: {i_contains: $device_list_filters_name_i_contains}}" in query
+    assert "role {" in query and "name" in query
+    assert "interfaces" not in query and "primary_ip4" not in query
+    assert variables["device_list_filters_name_i_contains"] == "core"
+
+    standard, _ = build_device_query("core")
+    full, _ = build_device_query("core", DETAIL_LEVELS["full"])
+    assert "interfaces" in standard and "terminations" not in standard and "racks" not in standard
+    assert "terminations" in full and "racks" in full
+    # One document per field set, reused across calls
+    assert build_device_query("edge", ["role"])[0] is query
+
+
+def test_field_and_detail_level_resolution():
+    assert resolve_device_fields({"fields": ["role", "serial"]}) == (["role"], ["serial"])
+    assert resolve_device_fields({"fields": ["serial"]}) == (DETAIL_LEVELS["summary"], ["serial"])
+    assert resolve_device_fields({"detail_level": "FULL"}) == (DETAIL_LEVELS["full"], [])
+    assert resolve_device_fields({"detail_level": "everything"}) == (DETAIL_LEVELS["standard"], ["everything"])
+
+
+def test_tool_sends_the_projected_query_and_reports_ignored_fields(monkeypatch):
+    client = FakeNetboxClient([{"name": "core1", "role": {"name": "core"}}])
+    monkeypatch.setattr(netbox_device_details, "get_netbox_client", lambda: client)
+    monkeypatch.delenv("NETBOX_MIRROR_PATH", raising=False)
+    monkeypatch.delenv("NETBOX_NAME_INDEX", raising=False)
+
+    result = asyncio.run(netbox_device_details.netbox_device_details(
+        {"device_name_contains": "core", "fields": ["role", "serial"]}))
+    assert result["data"]["devices"] == [{"name": "core1", "role": {"name": "core"}}]
+    assert result["ignored_fields"] == ["serial"]
+    assert result["pagination"] == {"returned": 1, "truncated": False, "total": 1}
+    assert client.queries[0][0] == build_device_query("core", ["role"])[0]
+    assert client.queries[0][2]["offset_var"] == "device_list_pagination_offset"
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace as NS
+
+from netbox_tools import netbox_executor
+from netbox_tools.netbox_executor import get_tool_timeout, run_blocking, run_tool_calls
+from netbox_tools.netbox_tool_registry import execute_tool_call, get_tool
+
+
+def test_netbox_calls_are_capped_and_results_keep_their_order():
+    active = {"netbox": 0, "index": 0}
+    most_netbox = []
+
+    async def execute(tool_call):
+        kind, number = tool_call
+        active[kind] += 1
+        most_netbox.append(active["netbox"])
+        # Later calls finish first, so ordering comes from run_tool_calls and not from completion
+        await asyncio.sleep(0.01 * (10 - number))
+        active[kind] -= 1
+        return {"output": f"{kind}-{number}"}
+
+    calls = [("netbox", i) for i in range(6)] + [("index", i) for i in range(4)]
+    results = asyncio.run(run_tool_calls(calls, execute, max_concurrency=2,
+                                         concurrency_class=lambda tool_call: tool_call[0]))
+    assert [result["output"] for result in results] == [f"{kind}-{i}" for kind, i in calls]
+    assert max(most_netbox) == 2
+
+
+def test_index_calls_are_not_held_behind_the_netbox_cap():
+    started = []
+
+    async def execute(tool_call):
+        started.append(tool_call)
+        if tool_call == "netbox":
+            await asyncio.sleep(0.2)
+        return {"output": tool_call}
+
+    async def scenario():
+        task = asyncio.ensure_future(run_tool_calls(["netbox", "index"], execute, max_concurrency=1,
+                                                    concurrency_class=lambda tool_call: tool_call))
+        await asyncio.sleep(0.05)
+        assert started == ["netbox", "index"]
+        return await task
+
+    assert [result["output"] for result in asyncio.run(scenario())] == ["netbox", "index"]
+
+
+def test_tool_timeouts_and_blocking_work_off_the_loop(monkeypatch):
+    monkeypatch.setenv("NETBOX_TOOL_TIMEOUT", "12")
+    assert get_tool_timeout("netbox_sites") == 12.0
+    assert get_tool_timeout("netbox_get_all_roles") == netbox_executor.TOOL_TIMEOUTS["netbox_get_all_roles"]
+    assert asyncio.run(run_blocking(lambda: threading.current_thread().name)).startswith("netbox-tool")
+
+
+def test_a_slow_tool_times_out_without_failing_the_turn(monkeypatch):
+    async def hang(arguments):
+        await asyncio.sleep(10)
+
+    monkeypatch.setitem(netbox_executor.TOOL_TIMEOUTS, "netbox_get_all_roles", 0.05)
+    monkeypatch.setattr(get_tool("netbox_get_all_roles"), "handler", hang)
+    call = NS(id="call_1", function=NS(name="netbox_get_all_roles", arguments=json.dumps({})))
+    output, ok = asyncio.run(execute_tool_call(call))
+    assert not ok and output == {"tool_call_id": "call_1",
+                                 "output": "Error: netbox_get_all_roles timed out after 0.05 seconds"}
@@ -0,0 +1,97 @@
+import asyncio
+import csv
+import json
+import os
+import re
+import time
+
+import pytest
+
+from netbox_tools import netbox_export
+from netbox_tools.netbox_compaction import compact_tool_output
+from netbox_tools.netbox_export import extract, find_export
+
+
+class FakeNetboxClient:
+    def __init__(self, items):
+        self.items = items
+        self.pages = []
+
+    async def paginate(self, query, variables, list_field, page_size=None, **kwargs):
+        # Applies the interface export's server-side filters as NetBox would, including the join
+        # onto ip_addresses returning an interface once per address
+        items = [item for item in self.items
+                 if not variables.get("siteRegex")
+                 or re.search(variables["siteRegex"], item["device"]["site"]["name"], re.IGNORECASE)]
+        if variables.get("ipIsNull") is False:
+            items = [item for item in items for _ in item["ip_addresses"]]
+        for offset in range(0, len(items), page_size):
+            self.pages.append((list_field, variables, offset))
+            for item in items[offset:offset + page_size]:
+                yield item
+
+
+def interface(i):
+    addresses = [{"address": f"10.{n}.0.{i}/24"} for n in range(2 if i % 8 == 0 else 1)]
+    return {"id": i, "name": f"eth{i}", "type": "1000base-t", "enabled": True, "mtu": None, "description": "",
+            "device": {"name": f"sw{i % 3}", "site": {"name": "DC1" if i % 2 else "DC2"}},
+            "ip_addresses": addresses if i % 4 == 0 else []}
+
+
+def test_extract_follows_dotted_paths_and_joins_lists():
+    obj = {"device": {"site": None}, "ip_addresses": [{"address": "10.0.0.1/24"}, {"address": "10.0.0.2/24"}]}
+    assert extract(obj, "device.site.name") is None
+    assert extract(obj, "ip_addresses[].address") == "10.0.0.1/24, 10.0.0.2/24"
+
+
+def test_export_streams_pages_to_csv_and_returns_a_summary(tmp_path, monkeypatch):
+    monkeypatch.setenv("NETBOX_EXPORT_DIR", str(tmp_path))
+    monkeypatch.setenv("NETBOX_EXPORT_PAGE_SIZE", "7")
+    client = FakeNetboxClient([interface(i) for i in range(40)])
+    monkeypatch.setattr(netbox_export, "get_netbox_client", lambda: client)
+
+    result = asyncio.run(netbox_export.netbox_export({"kind": "interfaces", "site_regex": "^dc2$",
+                                                      "with_ip_only": True}))
+    export = result["data"]["export"]
+    assert export["rows"] == 10 and len(export["preview"]) == 5
+    # Both filters run in NetBox, so only the matching rows are paged through
+    assert len(client.pages) == 3
+    assert client.pages[0][1] == {"nameRegex": None, "siteRegex": "^dc2$", "ipIsNull": False}
+
+    with open(tmp_path / export["file"], newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 10 and rows[0]["site"] == "DC2" and rows[0]["ip_addresses"] == "10.0.0.0/24, 10.1.0.0/24"
+    assert rows[1]["ip_addresses"] == "10.0.0.4/24"
+    assert os.listdir(tmp_path) == [export["file"]]
+
+    # Only the summary reaches the model, and the app can find the file again from the tool output
+    output = compact_tool_output("netbox_export", result)
+    found = find_export("netbox_export", output)
+    assert found["path"] == str(tmp_path / export["file"])
+    assert find_export("netbox_export", json.dumps({"data": {"export": {"file": "../etc/passwd"}}})) is None
+
+
+def test_parquet_export_and_row_cap(tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setenv("NETBOX_EXPORT_DIR", str(tmp_path))
+    monkeypatch.setenv("NETBOX_EXPORT_MAX_ROWS", "25")
+    client = FakeNetboxClient([{"id": i, "address": f"10.0.{i}.1/24", "assigned_object": {}} for i in range(100)])
+    monkeypatch.setattr(netbox_export, "get_netbox_client", lambda: client)
+
+    result = asyncio.run(netbox_export.netbox_export({"kind": "ip_addresses", "format": "parquet"}))
+    export = result["data"]["export"]
+    assert export["rows"] == 25 and export["truncated"]
+    table = pq.read_table(tmp_path / export["file"])
+    assert table.num_rows == 25 and table.column("address")[0].as_py() == "10.0.0.1/24"
+
+
+def test_expired_exports_are_purged(tmp_path, monkeypatch):
+    monkeypatch.setenv("NETBOX_EXPORT_DIR", str(tmp_path))
+    monkeypatch.setenv("NETBOX_EXPORT_TTL", "60")
+    monkeypatch.setattr(netbox_export, "get_netbox_client", lambda: FakeNetboxClient([interface(0)]))
+    for name in ("netbox_interfaces_old.csv", "netbox_interfaces_old.csv.partial", "unrelated.txt"):
+        (tmp_path / name).write_text("")
+        os.utime(tmp_path / name, (time.time() - 120, time.time() - 120))
+
+    export = asyncio.run(netbox_export.netbox_export({"kind": "interfaces"}))["data"]["export"]
+    assert sorted(os.listdir(tmp_path)) == sorted([export["file"], "unrelated.txt"])
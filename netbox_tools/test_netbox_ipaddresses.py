@@ -0,0 +1,65 @@
+import asyncio
+
+from benchmarks.netbox_mock_server import Dataset, Executor
+from netbox_tools import netbox_ipaddresses
+from netbox_tools.netbox_client import NetboxGraphQLClient
+from netbox_tools.netbox_ipaddresses import IP_ADDRESS_OR_QUERY, VRF_MEMBERS_QUERY
+
+
+class MockServerClient(NetboxGraphQLClient):
+    """Answers from the benchmark mock server's executor, keeping the real pagination logic."""
+
+    def __init__(self, dataset):
+        super().__init__("http://netbox.invalid/graphql/", "token")
+        self.executor = Executor(dataset)
+        self.requests = []
+
+    async def execute_query(self, query, variables=None, cache_ttl=None):
+        self.requests.append((query, dict(variables or {})))
+        return self.executor.execute(query, variables or {})
+
+
+def run(arguments, monkeypatch, client):
+    monkeypatch.delenv("NETBOX_MIRROR_PATH", raising=False)
+    monkeypatch.setattr(netbox_ipaddresses, "get_netbox_client", lambda: client)
+    return asyncio.run(netbox_ipaddresses.netbox_ipaddresses(arguments))
+
+
+def test_vrf_members_are_fetched_once_per_vrf(monkeypatch):
+    client = MockServerClient(Dataset(devices=20, interfaces_per_device=2, vrf_size=10))
+    result = run({"ipaddress_regex": "^10\\.0\\.1\\.", "max_results": 100}, monkeypatch, client)
+
+    addresses = result["data"]["ip addresses"]
+    assert len(addresses) == 40 and all(set(item["vrf"]) == {"name"} for item in addresses)
+    vrf_requests = [variables for query, variables in client.requests if query == VRF_MEMBERS_QUERY]
+    assert vrf_requests == [{"names": ["vrf-0000", "vrf-0001", "vrf-0002", "vrf-0003"]}]
+    members = result["data"]["vrf members"]
+    assert sorted(members) == vrf_requests[0]["names"]
+    assert all(len(interfaces) == 10 for interfaces in members.values())
+
+    client.requests.clear()
+    result = run({"ipaddress_regex": "^10\\.0\\.1\\.", "include_vrf_members": False}, monkeypatch, client)
+    assert "vrf members" not in result["data"]
+    assert all(query != VRF_MEMBERS_QUERY for query, _ in client.requests)
+
+
+def test_or_filter_fetches_both_sides_per_round_trip(monkeypatch):
+    monkeypatch.setenv("NETBOX_PAGE_SIZE", "5")
+    client = MockServerClient(Dataset(devices=20, interfaces_per_device=2))
+    arguments = {"ipaddress_regex": "^10\\.0\\.1\\.[0-3]/", "dns_name_regex": "^dev-00000[0-9]-",
+                 "filter_logic": "or", "include_vrf_members": False}
+    result = run(arguments, monkeypatch, client)
+
+    # .0-.3 belong to dev-000000 and dev-000001, so they are also DNS matches and appear once
+    addresses = [item["display"] for item in result["data"]["ip addresses"]]
+    assert len(addresses) == len(set(addresses)) == 20
+    assert result["pagination"] == {"returned": 20, "truncated": False, "total": 20}
+    assert all(query == IP_ADDRESS_OR_QUERY for query, _ in client.requests)
+    sides = [(variables["withAddress"], variables["withDnsName"]) for _, variables in client.requests]
+    # The address side is exhausted by the first page and dropped from the following requests
+    assert sides == [(True, True)] + [(False, True)] * 4
+
+    client.requests.clear()
+    capped = run({**arguments, "max_results": 7}, monkeypatch, client)
+    assert capped["pagination"] == {"returned": 7, "truncated": True, "total": None}
+    assert len(client.requests) == 2
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+
+from netbox_tools.netbox_client import NetboxGraphQLClient
+from netbox_tools.netbox_mirror import NetboxMirror, build_mirror_query, project_selection
+
+
+class FakeSyncClient(NetboxGraphQLClient):
+    def __init__(self, rows):
+        super().__init__("http://netbox.invalid/graphql/", "token")
+        self.rows = rows
+        self.requests = []
+
+    async def execute_query(self, query, variables=None, cache_ttl=None):
+        self.requests.append(dict(variables))
+        since = variables["since"]
+        rows = [row for row in self.rows if since is None or row["last_updated"] >= since]
+        offset, limit = variables["offset"], variables["limit"]
+        return {"data": {"prefix_list": rows[offset:offset + limit]}}
+
+
+def prefix(object_id, value, last_updated):
+    return {"id": str(object_id), "prefix": value, "vrf": {"name": "blue"}, "last_updated": last_updated}
+
+
+def test_mirror_query_reuses_tool_selection():
+    query = build_mirror_query("ip_addresses")
+    assert "last_updated: {gte: $since}" in query
+    assert "...IPAddressFields" in query and "fragment IPAddressFields" in query
+
+
+def test_incremental_sync_and_local_queries(tmp_path):
+    mirror = NetboxMirror(str(tmp_path / "mirror.db"))
+    client = FakeSyncClient([
+        prefix(1, "10.0.0.0/16", "2024-01-01T00:00:00Z"),
+        prefix(2, "10.0.1.0/24", "2024-01-01T00:00:00Z"),
+        prefix(3, "192.168.0.0/24", "2024-01-01T00:00:00Z"),
+    ])
+    asyncio.run(mirror.sync(client, ["prefixes"]))
+    assert mirror.is_fresh("prefixes", 60)
+
+    client.rows[1] = prefix(2, "10.0.2.0/24", "2024-02-01T00:00:00Z")
+    client.requests.clear()
+    asyncio.run(mirror.sync(client, ["prefixes"]))
+    assert client.requests[0]["since"] == "2024-01-01T00:00:00Z"
+
+    items, meta = mirror.find("prefixes", 10, "within(name, ?)", ("10.0.0.0/16",))
+    assert [item["prefix"] for item in items] == ["10.0.2.0/24"]
+    assert "last_updated" not in items[0]
+    items, meta = mirror.find("prefixes", 1, "regexp(?, name)", ("^10\\.",))
+    assert meta == {"returned": 1, "truncated": True, "total": None}
+
+
+def test_full_sync_drops_deleted_objects(tmp_path):
+    mirror = NetboxMirror(str(tmp_path / "mirror.db"))
+    client = FakeSyncClient([prefix(1, "10.0.0.0/16", "2024-01-01T00:00:00Z"),
+                             prefix(2, "10.1.0.0/16", "2024-01-01T00:00:00Z")])
+    asyncio.run(mirror.sync(client, ["prefixes"]))
+    del client.rows[0]
+    asyncio.run(mirror.sync(client, ["prefixes"], full=True))
+    assert [item["id"] for item in mirror.iter_objects("prefixes")] == ["2"]
+
+
+def test_iter_objects_reads_in_chunks_that_survive_concurrent_writes(tmp_path):
+    mirror = NetboxMirror(str(tmp_path / "mirror.db"))
+    mirror.upsert("prefixes", [prefix(i, f"10.{i}.0.0/16", "2024-01-01T00:00:00Z") for i in range(1, 6)])
+    objects = mirror.iter_objects("prefixes", chunk_size=2)
+    assert [next(objects)["id"], next(objects)["id"]] == ["1", "2"]
+    mirror.upsert("prefixes", [prefix(6, "10.6.0.0/16", "2024-01-01T00:00:00Z")])
+    assert [item["id"] for item in objects] == ["3", "4", "5", "6"]
+    assert len(mirror.list_objects("prefixes")) == 6
+
+
+def test_project_selection():
+    device = {"name": "r1", "role": {"name": "core"}, "interfaces": [{"name": "e1", "mtu": 1500}]}
+    assert project_selection(device, {"name": {}, "interfaces": {"name": {}}}) == {
+        "name": "r1", "interfaces": [{"name": "e1"}]
+    }
+
+
+class SlowSyncClient(FakeSyncClient):
+    def __init__(self, rows):
+        super().__init__(rows)
+        self.active = 0
+        self.max_active = 0
+
+    async def execute_query(self, query, variables=None, cache_ttl=None):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.05)
+        self.active -= 1
+        return await super().execute_query(query, variables, cache_ttl)
+
+
+def test_syncs_on_different_event_loops_take_turns(tmp_path):
+    mirror = NetboxMirror(str(tmp_path / "mirror.db"))
+    client = SlowSyncClient([prefix(1, "10.0.0.0/16", "2024-01-01T00:00:00Z")])
+    errors = []
+
+    def run_sync():
+        try:
+            asyncio.run(mirror.sync(client, ["prefixes"], full=True))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run_sync) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == [] and client.max_active == 1 and len(client.requests) == 3
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from netbox_tools.netbox_client import NetboxGraphQLClient
+from netbox_tools import netbox_name_index
+from netbox_tools.netbox_name_index import NameIndex, NetboxNameIndex, literal_substring, fetch_matching
+from netbox_tools.netbox_sites import SITE_LIST_QUERY
+
+
+def test_literal_substring_detects_plain_patterns():
+    assert literal_substring("Mel.*") == "Mel"
+    assert literal_substring("nl\\.ams") == "nl.ams"
+    assert literal_substring("^core") is None
+    assert literal_substring("a|b") is None
+
+
+def test_name_index_matches_substrings_and_regexes():
+    index = NameIndex()
+    for object_id, name in enumerate(["ams-core-01", "AMS-edge-01", "lon-core-01", "ams"]):
+        index.upsert(object_id, name)
+    assert index.match("ams-", "i_contains") == [0, 1]
+    assert index.match("ams-", "regex") == [0]
+    assert index.match("^(ams|lon)-core", "i_regex") == [0, 2]
+    assert index.match("am", "i_contains") == [0, 1, 3]
+    index.upsert(0, "fra-core-01")
+    index.remove(3)
+    assert index.match("ams", "i_contains") == [1]
+
+
+class FakeByIdClient(NetboxGraphQLClient):
+    def __init__(self, sites):
+        super().__init__("http://netbox.invalid/graphql/", "token")
+        self.sites = sites
+        self.requests = []
+
+    async def execute_query(self, query, variables=None, cache_ttl=None):
+        self.requests.append((query, dict(variables)))
+        if "ids" in variables:
+            wanted = set(variables["ids"])
+            return {"data": {"site_list": [site for site in self.sites if site["id"] in wanted]}}
+        return {"data": {"site_list": self.sites[variables["offset"]:variables["offset"] + variables["limit"]]}}
+
+
+def test_fetch_matching_fetches_only_matching_ids(monkeypatch):
+    monkeypatch.setattr(netbox_name_index, "_index", NetboxNameIndex())
+    client = FakeByIdClient([{"id": str(i), "name": name} for i, name in enumerate(["Melbourne", "Sydney", "Melton"])])
+    sites, meta = asyncio.run(fetch_matching(client, "sites", SITE_LIST_QUERY, "mel.*", "i_regex", 1))
+    assert [site["name"] for site in sites] == ["Melbourne"]
+    assert meta == {"returned": 1, "truncated": True, "total": 2}
+    query, variables = client.requests[-1]
+    assert "id: {in_list: $ids}" in query and variables == {"ids": ["0"]}
+
+
+class SlowByIdClient(FakeByIdClient):
+    started = 0
+
+    async def execute_query(self, query, variables=None, cache_ttl=None):
+        self.started += 1
+        await asyncio.sleep(0.1)
+        return await super().execute_query(query, variables, cache_ttl)
+
+
+def test_a_waiter_timing_out_does_not_cancel_the_shared_refresh():
+    client = SlowByIdClient([{"id": "1", "name": "Melbourne"}])
+    index = NetboxNameIndex()
+
+    async def impatient_then_patient():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(index.ensure_fresh("sites", client), 0.05)
+        await index.ensure_fresh("sites", client)
+
+    try:
+        asyncio.run(impatient_then_patient())
+    finally:
+        client.close()
+    assert client.started == 1 and index.match("sites", "mel", "i_contains") == [1]
@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+from benchmarks.netbox_mock_server import Dataset, Executor
+from netbox_tools import netbox_child_prefixes, netbox_prefix_lookup, netbox_prefix_trie
+from netbox_tools.netbox_client import NetboxGraphQLClient
+from netbox_tools.netbox_prefix_trie import NetboxPrefixIndex
+
+
+def prefix(object_id, value, vrf=None, last_updated="2024-01-01T00:00:00Z"):
+    return {"id": str(object_id), "prefix": value, "vrf": {"name": vrf} if vrf else None, "last_updated": last_updated}
+
+
+def address(object_id, value, vrf=None, last_updated="2024-01-01T00:00:00Z"):
+    return {"id": str(object_id), "address": value, "vrf": {"name": vrf} if vrf else None, "last_updated": last_updated}
+
+
+def build_index():
+    index = NetboxPrefixIndex()
+    index.apply("prefix", [
+        prefix(1, "10.0.0.0/8"),
+        prefix(2, "10.1.0.0/16"),
+        prefix(3, "10.1.2.0/24"),
+        prefix(4, "10.1.0.0/29"),
+        prefix(5, "10.1.2.0/24", vrf="blue"),
+        prefix(6, "2001:db8::/32"),
+    ])
+    index.apply("ip", [address(7, "10.1.0.9/16")])
+    return index
+
+
+def test_containing_reports_longest_match_per_vrf():
+    index = build_index()
+    matches = {match["vrf"]: match for match in index.containing("10.1.2.3")}
+    assert [p["prefix"] for p in matches[None]["prefixes"]] == ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24"]
+    assert matches[None]["longest_match"]["id"] == "3"
+    assert matches["blue"]["longest_match"]["id"] == "5"
+    assert index.containing("2001:db8::1")[0]["longest_match"]["id"] == "6"
+
+
+def test_within_is_strict_and_ordered():
+    index = build_index()
+    assert [p["id"] for p in index.within("10.1.0.0/16", vrf=None)] == ["4", "3", "5"]
+    assert [p["id"] for p in index.within("10.1.0.0/16", vrf="blue")] == ["5"]
+
+
+def test_free_skips_prefixes_and_addresses():
+    index = build_index()
+    # 10.1.0.0/29 is a prefix and 10.1.0.9 an address, so the first free /29 is 10.1.0.16/29
+    assert index.free("10.1.0.0/16", 29, count=2) == ["10.1.0.16/29", "10.1.0.24/29"]
+
+
+def test_incremental_update_moves_entries():
+    index = build_index()
+    index.apply("prefix", [prefix(3, "10.1.3.0/24", last_updated="2024-02-01T00:00:00Z")])
+    matches = {match["vrf"]: match for match in index.containing("10.1.2.3")}
+    assert matches[None]["longest_match"]["id"] == "2"
+    assert sorted(p["id"] for p in index.within("10.1.3.0/23")) == ["3", "5"]
+    assert index._since["prefix"] == "2024-02-01T00:00:00Z"
+
+
+class FakeIndexClient(NetboxGraphQLClient):
+    def __init__(self):
+        super().__init__("http://netbox.invalid/graphql/", "token")
+        self.requests = []
+
+    async def execute_query(self, query, variables=None, cache_ttl=None):
+        self.requests.append(dict(variables))
+        rows = {"prefix_list": [prefix(1, "192.168.0.0/22")], "ip_address_list": []}
+        list_field = "prefix_list" if "prefix_list" in query else "ip_address_list"
+        return {"data": {list_field: rows[list_field][variables["offset"]:]}}
+
+
+def test_ensure_fresh_bulk_loads_once():
+    client = FakeIndexClient()
+    index = NetboxPrefixIndex()
+
+    async def lookups():
+        await asyncio.gather(index.ensure_fresh(client), index.ensure_fresh(client))
+        await index.ensure_fresh(client)
+
+    asyncio.run(lookups())
+    assert len(client.requests) == 2
+    assert index.containing("192.168.1.1")[0]["longest_match"]["prefix"] == "192.168.0.0/22"
+
+
+class SlowIndexClient(FakeIndexClient):
+    started = 0
+
+    async def execute_query(self, query, variables=None, cache_ttl=None):
+        self.started += 1
+        await asyncio.sleep(0.1)
+        return await super().execute_query(query, variables, cache_ttl)
+
+
+def test_a_waiter_timing_out_does_not_cancel_the_shared_refresh():
+    client = SlowIndexClient()
+    index = NetboxPrefixIndex()
+
+    async def impatient_then_patient():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(index.ensure_fresh(client), 0.05)
+        await index.ensure_fresh(client)
+
+    try:
+        asyncio.run(impatient_then_patient())
+    finally:
+        client.close()
+    # One bulk load (prefixes + addresses), finished despite the first caller's timeout
+    assert client.started == 2 and len(client.requests) == 2 and index.loaded
+
+
+def test_child_prefixes_query_live_while_the_index_is_cold(monkeypatch):
+    monkeypatch.setenv("NETBOX_PREFIX_INDEX", "true")
+    monkeypatch.setattr(netbox_prefix_trie, "_index", None)
+    client = SlowIndexClient()
+    monkeypatch.setattr(netbox_child_prefixes, "get_netbox_client", lambda: client)
+    try:
+        first = asyncio.run(netbox_child_prefixes.netbox_child_prefixes({"parent_prefix": "192.168.0.0/16"}))
+        assert first["data"]["prefixes"] == [prefix(1, "192.168.0.0/22")]
+        assert not netbox_prefix_trie.get_prefix_index().loaded
+        netbox_prefix_trie.get_prefix_index().start_refresh(client).result(timeout=5)
+        requests = len(client.requests)
+        second = asyncio.run(netbox_child_prefixes.netbox_child_prefixes({"parent_prefix": "192.168.0.0/16"}))
+    finally:
+        client.close()
+    assert second["data"]["prefixes"][0]["prefix"] == "192.168.0.0/22"
+    assert len(client.requests) == requests
+
+
+class MockServerClient(NetboxGraphQLClient):
+    def __init__(self, dataset):
+        super().__init__("http://netbox.invalid/graphql/", "token")
+        self.executor = Executor(dataset)
+        self.queries = []
+
+    async def execute_query(self, query, variables=None, cache_ttl=None):
+        self.queries.append(query)
+        return self.executor.execute(query, variables or {})
+
+
+def test_prefix_lookup_answers_live_unless_the_index_is_enabled(monkeypatch):
+    monkeypatch.delenv("NETBOX_PREFIX_INDEX", raising=False)
+    monkeypatch.setattr(netbox_prefix_trie, "_index", None)
+    client = MockServerClient(Dataset(devices=300))
+    monkeypatch.setattr(netbox_prefix_lookup, "get_netbox_client", lambda: client)
+    lookup = lambda **arguments: asyncio.run(netbox_prefix_lookup.netbox_prefix_lookup(arguments))
+
+    matches = lookup(operation="contains", address="10.1.1.5")["data"]["matches"]
+    assert [p["prefix"] for p in matches[0]["prefixes"]] == ["10.1.0.0/16", "10.1.1.0/24"]
+    assert matches[0]["longest_match"]["prefix"] == "10.1.1.0/24"
+    within = lookup(operation="within", prefix="10.1.0.0/16")
+    assert [p["prefix"] for p in within["data"]["prefixes"]] == ["10.1.1.0/24", "10.1.2.0/24"]
+    free = lookup(operation="free", prefix="10.1.0.0/16", prefix_length=24, count=2)
+    assert free["data"]["free prefixes"] == ["10.1.0.0/24", "10.1.3.0/24"]
+    # Only scoped prefix queries went out; the bulk index load never started
+    assert set(client.queries) == {netbox_prefix_lookup.PREFIX_LOOKUP_QUERY}
+    assert not netbox_prefix_trie.get_prefix_index().loaded
@@ -0,0 +1,73 @@
+import asyncio
+
+from netbox_tools.netbox_client import NetboxGraphQLClient
+from netbox_tools.netbox_device_details import build_device_query
+from netbox_tools.netbox_query_registry import QueryRegistry, get_query_registry
+
+
+class PersistedQueryServer(NetboxGraphQLClient):
+    def __init__(self):
+        super().__init__("http://netbox.invalid/graphql/", "token")
+        self.payloads = []
+        self.known = {}
+
+    async def _post(self, payload, timings=None):
+        self.payloads.append(payload)
+        if "extensions" not in payload:
+            return {"data": {"site_list": []}}
+        query_hash = payload["extensions"]["persistedQuery"]["sha256Hash"]
+        if "query" in payload:
+            self.known[query_hash] = payload["query"]
+        elif query_hash not in self.known:
+            return {"errors": [{"message": "PersistedQueryNotFound"}]}
+        return {"data": {"site_list": []}}
+
+
+def test_persisted_queries_send_hash_after_first_miss(monkeypatch):
+    monkeypatch.setenv("NETBOX_PERSISTED_QUERIES", "true")
+    client = PersistedQueryServer()
+    query = "query Sites {\n    site_list {\n        name\n    }\n}"
+    get_query_registry().document(query)
+
+    async def twice():
+        await client.send_query(query)
+        return await client.send_query(query)
+
+    assert asyncio.run(twice()) == {"data": {"site_list": []}}
+    assert ["query" in payload for payload in client.payloads] == [False, True, False]
+    assert client.payloads[1]["query"] == "query Sites{site_list{name}}"
+    client.close()
+
+
+def test_ad_hoc_documents_are_sent_in_full_and_not_registered(monkeypatch):
+    monkeypatch.setenv("NETBOX_PERSISTED_QUERIES", "true")
+    client = PersistedQueryServer()
+    query = "query Merged { q0: site_list { name } q1: site_list { slug } }"
+    size = len(get_query_registry())
+
+    asyncio.run(client.send_query(query))
+    assert len(client.payloads) == 1 and "extensions" not in client.payloads[0]
+    assert get_query_registry().registered(query) is None and len(get_query_registry()) == size
+    client.close()
+
+
+def test_registry_memoizes_by_shape_and_evicts():
+    registry = QueryRegistry(max_entries=2)
+    builds = []
+    build = lambda: builds.append(1) or "query A { a }"
+    first = registry.shaped(("a",), build)
+    assert registry.shaped(("a",), build) is first and len(builds) == 1
+    registry.document("query B { b }")
+    registry.document("query C { c }")
+    assert len(registry) == 2
+    assert registry.registered("query A { a }") is None
+    registry.shaped(("a",), build)
+    assert len(builds) == 2 and registry.registered("query A { a }") is not None
+
+
+def test_device_query_text_is_shared_per_field_set():
+    query_a, variables_a = build_device_query("core", ["name", "role"])
+    query_b, variables_b = build_device_query("edge", ["name", "role"])
+    assert query_a is query_b
+    assert variables_a["device_list_filters_name_i_contains"] == "core"
+    assert get_query_registry().document(query_a).sha256
@@ -0,0 +1,65 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from netbox_tools import netbox_cache
+from netbox_tools.netbox_cache import QueryCache
+from netbox_tools.netbox_client import NetboxGraphQLClient
+from netbox_tools.netbox_resilience import (
+    CircuitBreaker, CircuitOpenError, NetboxResilience, NetboxUnavailableError, TokenBucket,
+)
+
+
+class FlakyClient(NetboxGraphQLClient):
+    def __init__(self, failures, **resilience):
+        super().__init__("http://netbox.invalid/graphql/", "token",
+                         resilience=NetboxResilience(base_delay=0, **resilience))
+        self.failures = failures
+        self.posts = 0
+
+    async def _post(self, payload, timings=None):
+        self.posts += 1
+        if self.posts <= self.failures:
+            raise aiohttp.ClientResponseError(None, (), status=503, message="Service Unavailable")
+        return {"data": {"site_list": [{"name": "mel"}]}}
+
+
+QUERY = "query { site_list { name } }"
+
+
+def test_retries_then_succeeds():
+    client = FlakyClient(failures=2)
+    try:
+        assert asyncio.run(client.send_query(QUERY)) == {"data": {"site_list": [{"name": "mel"}]}}
+        assert client.posts == 3
+    finally:
+        client.close()
+
+
+def test_breaker_opens_and_stale_cache_is_served(monkeypatch):
+    cache = QueryCache(max_bytes=1024, max_stale=60)
+    monkeypatch.setattr(netbox_cache, "_query_cache", cache)
+    client = FlakyClient(failures=0, max_retries=0, breaker=CircuitBreaker(threshold=1, reset_timeout=60))
+    try:
+        first = asyncio.run(client.execute_query(QUERY, cache_ttl=0.001))
+        asyncio.run(asyncio.sleep(0.01))
+        client.failures = client.posts + 100
+        # Retries exhausted: the expired entry is served instead of an error, and the breaker opens
+        assert asyncio.run(client.execute_query(QUERY, cache_ttl=0.001)) == first
+        assert client.resilience.breaker.state == "open"
+        posts = client.posts
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(client.send_query(QUERY))
+        assert client.posts == posts
+        with pytest.raises(NetboxUnavailableError):
+            asyncio.run(client.execute_query("query { device_list { name } }", cache_ttl=1))
+    finally:
+        client.close()
+
+
+def test_token_bucket_spaces_out_requests():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
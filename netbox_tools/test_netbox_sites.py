@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from netbox_tools import netbox_cache, netbox_sites
+from netbox_tools.netbox_cache import QueryCache, get_result_store, store_result
+from netbox_tools.netbox_client import collect_list
+
+SUMMARY = {
+    "name": "Melbourne",
+    "status": "ACTIVE",
+    "locations": [{"id": "1"}, {"id": "2"}],
+    "racks": [{"id": "1"}, {"id": "2"}, {"id": "3"}],
+    "devices": [{"id": str(i)} for i in range(4)],
+    "contacts": [{"id": "1"}],
+}
+
+SECTIONS = {
+    "device_list": [{"name": "mel-fw1", "description": "", "rack": {"name": "R7"}, "location": {"name": "Level 3"}},
+                    {"name": "mel-pdu", "description": "", "rack": None, "location": {"name": "Level 3"}}],
+    "rack_list": [{"name": "R7", "location": {"name": "Level 3"}, "devices": [{"name": "mel-fw1"}]}],
+    "location_list": [{"name": "Level 3", "facility": "", "tenant": None, "devices": [{"id": "3"}, {"id": "4"}]}],
+}
+
+
+class FakeNetboxClient:
+    def __init__(self):
+        self.queries = []
+
+    async def execute_query(self, query, variables=None, cache_ttl=None):
+        self.queries.append((query, variables))
+        if query == netbox_sites.SITE_CONTACTS_QUERY:
+            return {"data": {"site_list": [{"contacts": [{"contact": {"name": "NOC", "phone": "123"}}]}]}}
+        return {"data": {"site_list": [SUMMARY]}}
+
+    async def fetch_list(self, query, variables, list_field, max_items, **kwargs):
+        self.queries.append((query, variables))
+        return collect_list(SECTIONS[list_field], max_items)
+
+
+def test_summary_counts_come_from_the_shallow_query_and_expand_fetches_one_section(monkeypatch):
+    client = FakeNetboxClient()
+    monkeypatch.setattr(netbox_sites, "get_netbox_client", lambda: client)
+
+    summary = asyncio.run(netbox_sites.netbox_sites({"site_name": "Mel"}))["data"]["sites"][0]
+    assert client.queries[-1][0] == netbox_sites.SITE_SUMMARY_QUERY
+    assert summary["counts"] == {"locations": 2, "devices": 4, "racks": 3, "contacts": 1}
+    assert not {"locations", "racks", "devices", "contacts"} & set(summary)
+
+    expand = lambda **arguments: asyncio.run(netbox_sites.netbox_site_expand({"handle": summary["handle"],
+                                                                              **arguments}))
+    devices = expand(section="devices", location_regex="level 3", max_results=1)
+    assert client.queries[-1] == (netbox_sites.SITE_DEVICES_QUERY, {"site": "Melbourne", "locationRegex": "level 3"})
+    assert devices["data"]["devices"] == [{"name": "mel-fw1", "description": "", "rack": {"name": "R7"},
+                                           "location": "Level 3"}]
+    assert devices["pagination"] == {"returned": 1, "truncated": True, "total": 2}
+    assert expand(section="racks")["data"]["racks"] == [{"name": "R7", "location": "Level 3", "devices": ["mel-fw1"]}]
+    assert client.queries[-1][1] == {"site": "Melbourne", "locationRegex": None}
+    assert expand(section="locations")["data"]["locations"][0]["device_count"] == 2
+    assert expand(section="contacts")["data"]["contacts"] == [{"name": "NOC", "phone": "123"}]
+
+    asyncio.run(netbox_sites.netbox_sites({"site_name": "Mel", "detail": "full"}))
+    assert client.queries[-1][0] == netbox_sites.SITE_LIST_QUERY
+
+
+def test_full_sites_from_the_mirror_summarize_the_same_way():
+    site = {"name": "Melbourne", "contacts": [], "locations": [
+        {"name": "Level 1", "devices": [{"name": "mel-sw1", "rack": {"name": "R1"}},
+                                        {"name": "mel-sw2", "rack": {"name": "R1"}}]},
+        {"name": "Level 3", "devices": [{"name": "mel-pdu", "rack": None}]},
+    ]}
+    summary = netbox_sites.summarize_site(site)
+    assert summary["counts"] == {"locations": 2, "devices": 3, "racks": 1, "contacts": 0}
+    assert get_result_store().get(summary["handle"]) == {"name": "Melbourne"}
+
+
+def test_expired_handle_asks_for_a_fresh_one():
+    get_result_store().set("site-gone", {"name": "Melbourne"}, 0)
+    result = asyncio.run(netbox_sites.netbox_site_expand({"handle": "site-gone", "section": "devices"}))
+    assert "expired handle" in result["error"]
+
+
+def test_store_result_refuses_values_larger_than_the_store(monkeypatch):
+    monkeypatch.setattr(netbox_cache, "_result_store", QueryCache(max_bytes=100, max_stale=0))
+    with pytest.raises(ValueError, match="NETBOX_RESULT_STORE_MAX_BYTES"):
+        store_result({"rows": "x" * 200})
+    assert netbox_cache.load_result(store_result({"rows": "x"})) == {"rows": "x"}
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import pytest
+
+from benchmarks.run_benchmarks import SCENARIOS
+from netbox_tools.netbox_tool_registry import (
+    TOOL_REGISTRY, ToolArgumentsError, ToolRegistry, ToolSchemaError, get_tool,
+)
+
+
+def test_every_tool_has_a_schema_matching_its_arguments():
+    assert {spec.name for spec in TOOL_REGISTRY} == set(SCENARIOS)
+    for name, arguments in SCENARIOS.items():
+        assert get_tool(name).parse_arguments(arguments) == arguments
+
+
+def test_bad_arguments_fail_before_the_handler_runs():
+    calls = []
+
+    async def handler(arguments):
+        calls.append(arguments)
+        return {}
+
+    spec = get_tool("netbox_device_details")
+    original = spec.handler
+    spec.handler = handler
+    try:
+        with pytest.raises(ToolArgumentsError, match="device_name_contains"):
+            asyncio.run(spec({"device_name": "core"}))
+        with pytest.raises(ToolArgumentsError, match="max_results"):
+            asyncio.run(spec({"device_name_contains": "core", "max_results": "lots"}))
+        # Assistants configured with the old schema still send device_name_regex
+        asyncio.run(spec({"device_name_regex": "core", "max_results": "5"}))
+        # Values outside an enum reach the handler, which normalises or reports them
+        asyncio.run(spec({"device_name_contains": "core", "detail_level": "FULL", "fields": ["name", "bogus"]}))
+    finally:
+        spec.handler = original
+    assert calls == [{"device_name_contains": "core", "max_results": 5},
+                     {"device_name_contains": "core", "detail_level": "FULL", "fields": ["name", "bogus"]}]
+
+
+def test_schema_drift_is_caught_at_registration(tmp_path):
+    (tmp_path / "netbox_sites").write_text(json.dumps({
+        "name": "netbox_sites",
+        "parameters": {"type": "object", "properties": {"site": {"type": "string"}}, "required": ["site_name"]},
+    }))
+    with pytest.raises(ToolSchemaError, match="site_name"):
+        ToolRegistry(str(tmp_path)).register("netbox_sites", lambda arguments: None)
+    with pytest.raises(ToolSchemaError):
+        ToolRegistry(str(tmp_path)).register("netbox_prefixes", lambda arguments: None)
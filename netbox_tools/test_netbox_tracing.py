@@ -0,0 +1,47 @@
+import asyncio
+import json
+import time
+
+from netbox_tools.netbox_client import NetboxGraphQLClient
+from netbox_tools.netbox_tracing import start_trace, span
+
+
+class TimedClient(NetboxGraphQLClient):
+    def __init__(self):
+        super().__init__("http://netbox.invalid/graphql/", "token")
+
+    async def _post(self, payload, timings=None):
+        now = time.time_ns()
+        timings.append(("netbox.network", now, now + 1000, {"bytes": 10}))
+        return {"data": {}}
+
+
+def test_spans_nest_across_tasks_and_client_loop(tmp_path, monkeypatch):
+    monkeypatch.setenv("NETBOX_TRACE_FILE", str(tmp_path / "trace.jsonl"))
+    client = TimedClient()
+
+    async def tool(name):
+        with span("tool.call", tool=name):
+            await client.send_query(f"query {name} {{ site_list {{ name }} }}")
+
+    async def run_tools():
+        await asyncio.wait_for(asyncio.gather(tool("a"), tool("b")), 5)
+
+    with start_trace("chat.turn") as trace:
+        with span("tools.run"):
+            asyncio.run(run_tools())
+    client.close()
+
+    rows = trace.waterfall()
+    assert rows[0]["name"] == "chat.turn" and rows[0]["depth"] == 0
+    depths = {(row["name"], row["depth"]) for row in rows}
+    assert {("tools.run", 1), ("tool.call", 2), ("netbox.request", 3), ("netbox.network", 4)} <= depths
+
+    lines = [json.loads(line) for line in open(tmp_path / "trace.jsonl")]
+    assert len(lines) == len(trace.spans)
+    assert {line["traceId"] for line in lines} == {trace.trace_id}
+
+
+def test_span_is_noop_outside_a_trace():
+    with span("orphan") as orphan:
+        assert orphan is None
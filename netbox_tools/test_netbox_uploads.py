@@ -0,0 +1,56 @@
+import time
+from types import SimpleNamespace
+
+from netbox_tools import netbox_uploads
+from netbox_tools.netbox_uploads import UploadJob, UploadManifest, get_upload_job, run_upload, start_upload
+
+
+class FakeOpenAI:
+    def __init__(self):
+        self.created = []
+        self.batches = []
+        self.files = SimpleNamespace(create=self.create_file)
+        self.vector_stores = SimpleNamespace(file_batches=SimpleNamespace(create_and_poll=self.create_batch))
+
+    def create_file(self, file, purpose):
+        self.created.append(file[0])
+        return SimpleNamespace(id=f"file-{file[0]}")
+
+    def create_batch(self, vector_store_id, file_ids):
+        self.batches.append(sorted(file_ids))
+        return SimpleNamespace(id="batch", status="completed", file_counts=SimpleNamespace(completed=len(file_ids)))
+
+
+def test_unchanged_files_are_skipped_and_batches_are_chunked(tmp_path, monkeypatch):
+    monkeypatch.setenv("NETBOX_UPLOAD_BATCH_SIZE", "2")
+    manifest = UploadManifest(str(tmp_path / "manifest.json"))
+    client = FakeOpenAI()
+    files = [("a.md", b"a"), ("b.md", b"b"), ("c.md", b"c"), ("copy-of-a.md", b"a")]
+
+    job = UploadJob("vs_1", [name for name, _ in files])
+    run_upload(client, job, files, manifest)
+    assert job.snapshot()["status"] == "completed"
+    assert sorted(client.created) == ["a.md", "b.md", "c.md"]
+    assert sorted(len(batch) for batch in client.batches) == [1, 2]
+    assert job.snapshot()["skipped"] == 1 and job.snapshot()["indexed"] == 3
+
+    # A new process reads the manifest and only uploads the changed file
+    client = FakeOpenAI()
+    job = UploadJob("vs_1", ["a.md", "b.md"])
+    run_upload(client, job, [("a.md", b"a"), ("b.md", b"b2")], UploadManifest(str(tmp_path / "manifest.json")))
+    assert client.created == ["b.md"]
+    assert job.snapshot()["skipped"] == 1
+
+
+def test_finished_jobs_are_pruned_after_their_ttl(monkeypatch):
+    monkeypatch.setenv("NETBOX_UPLOAD_JOB_TTL", "60")
+    monkeypatch.setattr(netbox_uploads, "_jobs", {})
+    monkeypatch.setattr(netbox_uploads, "run_upload", lambda client, job, files, manifest: None)
+    old, recent, running = UploadJob("vs_1", []), UploadJob("vs_1", []), UploadJob("vs_1", [])
+    old.finished_at, recent.finished_at = time.time() - 120, time.time() - 30
+    netbox_uploads._jobs.update({job.id: job for job in (old, recent, running)})
+
+    job = start_upload(FakeOpenAI(), "vs_1", [])
+    assert get_upload_job(old.id) is None
+    assert get_upload_job(recent.id) is recent and get_upload_job(running.id) is running
+    assert get_upload_job(job.id) is job